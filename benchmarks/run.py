@@ -0,0 +1,158 @@
+"""
+Benchmarks of parsing, loading from the parse cache, label lookup, writing and round-tripping msbt files of different sizes.
+
+    python -m benchmarks.run --sizes 1000 10000 50000 --output results.json
+    python -m benchmarks.run --compare results.json
+
+Every round-trip is checked to be byte-identical to the generated file, so a speedup can't hide a corrupted output.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pymsbt
+from pymsbt.cache import ParseCache
+from pymsbt.msbt import MSBTFile
+from pymsbt.msbt_write import MSBTWriter
+from pymsbt.classes import TextComponent
+
+from .synthetic import SyntheticMSBT
+
+def best_time(function, repeat):
+    """Returns the fastest of repeat runs of function in seconds"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def peak_memory(function):
+    """Returns the peak amount of memory allocated by function in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def check_round_trip(filepath, output, lazy):
+    """Raises an AssertionError if reading and writing filepath doesn't give back the same bytes"""
+    with open(filepath, 'rb') as f:
+        original = f.read()
+    for incremental in (True, False):
+        MSBTWriter(MSBTFile(filepath, lazy=lazy), output, incremental=incremental)
+        with open(output, 'rb') as f:
+            if f.read() != original:
+                raise AssertionError(f"round-trip of {filepath} (lazy={lazy}, incremental={incremental}) is not byte-identical")
+
+def bench_size(directory, label_count, args):
+    """Runs every benchmark on a generated file with label_count labels and returns the results"""
+    synthetic = SyntheticMSBT(label_count, mean_length=args.mean_length, tag_density=args.tag_density, seed=args.seed)
+    filepath = os.path.join(directory, f'synthetic_{label_count}.msbt')
+    output = os.path.join(directory, f'output_{label_count}.msbt')
+    size = synthetic.write(filepath)
+    megabytes = size / (1024 * 1024)
+
+    check_round_trip(filepath, output, lazy=False)
+    check_round_trip(filepath, output, lazy=True)
+
+    msbt = MSBTFile(filepath)
+    labels = [label.data for label in msbt.LBL1.labels]
+    rng = random.Random(args.seed)
+    lookups = [rng.choice(labels) for _ in range(args.lookups)]
+
+    results = {'labels': label_count, 'bytes': size}
+    results['parse_seconds'] = best_time(lambda: MSBTFile(filepath), args.repeat)
+    results['parse_lazy_seconds'] = best_time(lambda: MSBTFile(filepath, lazy=True), args.repeat)
+
+    lazy = MSBTFile(filepath, lazy=True)
+    results['lookup_seconds'] = best_time(lambda: [lazy.get_text_index(label) for label in lookups], args.repeat) / len(lookups)
+    results['lazy_lookup_seconds'] = best_time(lambda: [MSBTFile(filepath, lazy=True).get_text(label) for label in lookups[:100]], args.repeat) / 100
+
+    # only texts that were never decoded are copied, so the incremental write is measured on the lazy file
+    results['write_seconds'] = best_time(lambda: MSBTWriter(lazy, output), args.repeat)
+    results['write_full_seconds'] = best_time(lambda: MSBTWriter(msbt, output, incremental=False), args.repeat)
+
+    def round_trip():
+        # opened lazily like files that are edited and written, so the other texts are copied
+        edited = MSBTFile(filepath, lazy=True)
+        edited.set_text(labels[0], [TextComponent('benchmark')])
+        MSBTWriter(edited, output)
+    results['round_trip_seconds'] = best_time(round_trip, args.repeat)
+
+    # warm loads restore the parsed sections from the cache instead of parsing the file
+    cache = ParseCache(os.path.join(directory, f'cache_{label_count}'), max_size=None)
+    cache.load(filepath)
+    results['cache_load_seconds'] = best_time(lambda: cache.load(filepath), args.repeat)
+    results['cache_load_lazy_seconds'] = best_time(lambda: cache.load(filepath, lazy=True), args.repeat)
+
+    results['parse_mb_per_second'] = megabytes / results['parse_seconds']
+    results['write_mb_per_second'] = megabytes / results['write_full_seconds']
+    results['parse_peak_bytes'] = peak_memory(lambda: MSBTFile(filepath))
+    results['parse_lazy_peak_bytes'] = peak_memory(lambda: MSBTFile(filepath, lazy=True))
+    return results
+
+def compare(results, baseline):
+    """Prints the ratio of every timing in results to the same timing in baseline"""
+    baseline_sizes = {result['labels']: result for result in baseline['results']}
+    for result in results['results']:
+        base = baseline_sizes.get(result['labels'])
+        if base is None:
+            continue
+        print(f"{result['labels']} labels:")
+        for key, value in result.items():
+            if key.endswith('_seconds') and base.get(key):
+                print(f"    {key}: {value:.6f}s vs {base[key]:.6f}s ({base[key] / value:.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of pymsbt on synthetic msbt files')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000], help='label counts of the generated files')
+    parser.add_argument('--mean-length', type=int, default=40, help='mean text length in characters')
+    parser.add_argument('--tag-density', type=float, default=0.3, help='chance of a text command after each run of text')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark, the fastest is kept')
+    parser.add_argument('--lookups', type=int, default=1000, help='label lookups per lookup benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='path to save the results to as json')
+    parser.add_argument('--compare', help='path of previously saved results to compare with')
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': {
+            'pymsbt': pymsbt.__version__,
+            'python': sys.version,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'mean_length': args.mean_length,
+            'tag_density': args.tag_density,
+            'seed': args.seed,
+        },
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for label_count in args.sizes:
+            result = bench_size(directory, label_count, args)
+            results['results'].append(result)
+            print(f"{label_count} labels ({result['bytes']} bytes): parse {result['parse_seconds']:.4f}s, "
+                  f"lazy parse {result['parse_lazy_seconds']:.4f}s, cached parse {result['cache_load_seconds']:.4f}s, write {result['write_full_seconds']:.4f}s, "
+                  f"round-trip {result['round_trip_seconds']:.4f}s, peak {result['parse_peak_bytes'] / 1024 / 1024:.1f}MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
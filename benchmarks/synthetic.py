@@ -0,0 +1,130 @@
+"""
+Deterministic generator of synthetic msbt files for benchmarks.
+
+The files are built directly from the format description rather than with MSBTWriter,
+so that they can be used to check that the library reads and writes them back unchanged.
+"""
+import random
+import struct
+
+from pymsbt.classes import label_hash
+from pymsbt.codec import UTF8, UTF16, UTF32
+
+# text encoding name and code unit format for each encoding byte
+ENCODINGS = {
+    UTF8: ('utf-8', 'B'),
+    UTF16: ('utf-16', 'H'),
+    UTF32: ('utf-32', 'I'),
+}
+
+# characters texts are made of, weighted towards ascii like most game text
+ALPHABETS = [
+    (0.70, 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .,!?\'\n'),
+    (0.15, 'àáâäçèéêëìíîïñòóôöùúûüßÀÉÖÜ¡¿'),
+    (0.14, 'あいうえおかきくけこさしすせそアイウエオ漢字日本語『』「」、。'),
+    (0.01, '😀🗡🛡'),
+]
+
+def _align(data):
+    return data + b'\xAB' * (-len(data) % 16)
+
+def _section(endian, signature, body):
+    return _align(struct.pack(endian + '4sI8x', signature, len(body)) + body)
+
+class SyntheticMSBT:
+    """
+    Settings of a generated msbt file.
+
+        label_count: The amount of labels and texts
+        mean_length: The mean length of a text in characters, lengths follow a log-normal distribution
+        length_sigma: The sigma of the log-normal length distribution
+        tag_density: The chance of a text command after each run of text
+        extra_sections: Signatures of opaque sections with 4 bytes per entry to add, such as ATR1 and TSY1
+        bucket_count: The amount of LBL1 hash buckets
+        big_endian: Generate a big endian file like on the Wii U
+        encoding: The text encoding, UTF8, UTF16 or UTF32 from pymsbt.codec
+        seed: The seed of the random generator, the same settings always generate the same file
+    """
+    def __init__(self, label_count=1000, mean_length=40, length_sigma=0.8, tag_density=0.3, extra_sections=('ATR1', 'TSY1'), bucket_count=101,
+                 big_endian=False, encoding=UTF16, seed=0):
+        self.label_count = label_count
+        self.mean_length = mean_length
+        self.length_sigma = length_sigma
+        self.tag_density = tag_density
+        self.extra_sections = extra_sections
+        self.bucket_count = bucket_count
+        self.big_endian = big_endian
+        self.encoding = encoding
+        self.seed = seed
+
+        self.endian = '>' if big_endian else '<'
+        name, unit = ENCODINGS[encoding]
+        self.text_encoding = name if encoding == UTF8 else name + ('-be' if big_endian else '-le')
+        self.command = struct.Struct(self.endian + unit + 'HHH')
+        self.terminator = b'\x00' * struct.calcsize(unit)
+
+    def _text(self, rng):
+        """Returns the encoded bytes of a random text, including the terminator"""
+        length = int(rng.lognormvariate(0, self.length_sigma) * self.mean_length)
+        weights = [weight for weight, _ in ALPHABETS]
+        parts = []
+        while length > 0:
+            run_length = min(length, rng.randint(1, 24))
+            alphabet = rng.choices(ALPHABETS, weights)[0][1]
+            parts.append(''.join(rng.choice(alphabet) for _ in range(run_length)).encode(self.text_encoding))
+            length -= run_length
+
+            if rng.random() < self.tag_density:
+                if rng.random() < 0.8:
+                    payload = rng.randbytes(rng.choice((0, 2, 4, 8)))
+                    parts.append(self.command.pack(0x0E, rng.randint(0, 4), rng.randint(0, 12), len(payload)) + payload)
+                else:
+                    parts.append(self.command.pack(0x0F, rng.randint(0, 4), rng.randint(0, 12), 0))
+        parts.append(self.terminator)
+        return b''.join(parts)
+
+    def generate(self):
+        """Returns the bytes of the generated file"""
+        rng = random.Random(self.seed)
+        labels = [f'{rng.choice(("Item", "Npc", "Talk", "Quest", "Ui"))}_{i:06d}_{rng.randrange(16 ** 4):04x}' for i in range(self.label_count)]
+
+        # labels
+        buckets = [[] for _ in range(self.bucket_count)]
+        for index, label in enumerate(labels):
+            buckets[label_hash(label, self.bucket_count)].append((label, index))
+        endian = self.endian
+        table = bytearray(struct.pack(endian + 'I', self.bucket_count))
+        strings = bytearray()
+        for bucket in buckets:
+            table += struct.pack(endian + 'II', len(bucket), 4 + 8 * self.bucket_count + len(strings))
+            for label, index in bucket:
+                strings += bytes([len(label)]) + label.encode('ascii') + struct.pack(endian + 'I', index)
+        sections = [_section(endian, b'LBL1', bytes(table + strings))]
+
+        # opaque sections with a 4 byte record per entry, ATR1 starts with the record count and size
+        for signature in self.extra_sections:
+            records = b''.join(struct.pack(endian + 'I', rng.getrandbits(32)) for _ in range(self.label_count))
+            if signature == 'ATR1':
+                records = struct.pack(endian + 'II', self.label_count, 4) + records
+            sections.append(_section(endian, signature.encode('ascii'), records))
+
+        # texts
+        texts = [self._text(rng) for _ in range(self.label_count)]
+        offsets = bytearray(struct.pack(endian + 'I', self.label_count))
+        text_offset = 4 + 4 * self.label_count
+        for text in texts:
+            offsets += struct.pack(endian + 'I', text_offset)
+            text_offset += len(text)
+        sections.append(_section(endian, b'TXT2', bytes(offsets) + b''.join(texts)))
+
+        body = b''.join(sections)
+        bom = b'\xFE\xFF' if self.big_endian else b'\xFF\xFE'
+        header = struct.pack(endian + '8s2sHBBHHI10x', b'MsgStdBn', bom, 0, self.encoding, 3, len(sections), 0, 0x20 + len(body))
+        return header + body
+
+    def write(self, filepath):
+        """Writes the generated file to filepath and returns its size"""
+        data = self.generate()
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        return len(data)
@@ -0,0 +1,6 @@
+import logging
+
+__version__ = '1.0.2'
+
+# the library only logs debug messages, which are silent unless the application configures logging
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,113 @@
+import argparse
+import importlib
+import re
+import sys
+
+from .batch import MSBTBatch
+from .build import MSBTBuild, export_sources
+from .search import SearchIndex
+
+def load_function(spec):
+    """Imports a function from a 'module:function' string"""
+    module_name, _, function_name = spec.partition(':')
+    if not function_name:
+        raise argparse.ArgumentTypeError(f"expected 'module:function', got '{spec}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def batch_command(args):
+    batch = MSBTBatch(args.source, args.transform, args.output, args.workers, args.max_in_flight, args.lazy)
+    for result in batch:
+        if result.ok:
+            if not args.quiet:
+                print(f"{result.path}: ok ({result.seconds:.3f}s)")
+        else:
+            print(f"{result.path}: {result.error}", file=sys.stderr)
+    print(f"Processed {batch.stats.files} files ({batch.stats.failed} failed, {batch.stats.entries} texts) in {batch.stats.seconds:.2f}s")
+    return 1 if batch.stats.failed else 0
+
+def index_command(args):
+    with SearchIndex(args.index) as index:
+        stats = index.update(args.source)
+    print(f"Indexed {stats.added} new and {stats.updated} changed files ({stats.entries} texts), removed {stats.removed}, "
+          f"{stats.unchanged} unchanged, {stats.failed} failed in {stats.seconds:.2f}s")
+    return 1 if stats.failed else 0
+
+def search_command(args):
+    with SearchIndex(args.index) as index:
+        hits = index.search(args.pattern, re.IGNORECASE if args.ignore_case else 0, args.limit)
+    for hit in hits:
+        print(f"{hit.path}: {hit.label}: {hit.text!r}")
+    return 0 if hits else 1
+
+def build_command(args):
+    build = MSBTBuild(args.source, args.output, args.manifest, args.workers)
+
+    def report(stats):
+        for result in build.results:
+            if not result.ok:
+                print(f"{result.source}: {result.error}", file=sys.stderr)
+        print(f"Built {stats.built} files, {stats.unchanged} unchanged, removed {stats.removed}, {stats.failed} failed in {stats.seconds:.2f}s")
+
+    stats = build.update(args.force)
+    report(stats)
+    if not args.watch:
+        return 1 if stats.failed else 0
+    print(f"Watching {args.source} for changes, press Ctrl+C to stop")
+    try:
+        build.watch(args.interval, report)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def export_command(args):
+    count = export_sources(args.source, args.output, not args.no_base)
+    print(f"Exported {count} files to {args.output}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pymsbt', description='Tools for reading and editing .msbt files')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help='run a transform over every msbt file in a directory or glob')
+    batch.add_argument('source', help='directory or glob pattern of msbt files')
+    batch.add_argument('-t', '--transform', type=load_function, required=True, help="function that edits a MSBTFile in place, as 'module:function'")
+    batch.add_argument('-o', '--output', help='directory to write the transformed files to, files are not written if omitted')
+    batch.add_argument('-j', '--workers', type=int, help='number of worker processes, defaults to the number of cores')
+    batch.add_argument('--max-in-flight', type=int, help='maximum number of files in flight at once')
+    batch.add_argument('--lazy', action='store_true', help='open files in lazy mode')
+    batch.add_argument('-q', '--quiet', action='store_true', help='only report failed files')
+    batch.set_defaults(func=batch_command)
+
+    index = commands.add_parser('index', help='add the msbt files in a directory or glob to a search index, only reading changed files')
+    index.add_argument('source', help='directory or glob pattern of msbt files')
+    index.add_argument('--index', default='msbt_index.sqlite', help='path of the index database')
+    index.set_defaults(func=index_command)
+
+    search = commands.add_parser('search', help='find the texts that match a regex in a search index')
+    search.add_argument('pattern', help='regex to search for')
+    search.add_argument('--index', default='msbt_index.sqlite', help='path of the index database')
+    search.add_argument('-i', '--ignore-case', action='store_true', help='match case-insensitively')
+    search.add_argument('-n', '--limit', type=int, help='maximum number of results')
+    search.set_defaults(func=search_command)
+
+    build = commands.add_parser('build', help='compile a directory of text sources to msbt files, only rebuilding changed ones')
+    build.add_argument('source', help='directory of text sources (.msbt.txt)')
+    build.add_argument('output', help='directory to write the msbt files to')
+    build.add_argument('--manifest', help='path of the dependency manifest, defaults to a file in the output directory')
+    build.add_argument('-j', '--workers', type=int, help='number of worker processes, defaults to the number of cores')
+    build.add_argument('-f', '--force', action='store_true', help='build every file, ignoring the manifest')
+    build.add_argument('-w', '--watch', action='store_true', help='keep building whenever a source changes')
+    build.add_argument('--interval', type=float, default=1.0, help='seconds between checks in watch mode')
+    build.set_defaults(func=build_command)
+
+    export = commands.add_parser('export', help='write a text source for every msbt file in a directory or glob')
+    export.add_argument('source', help='directory or glob pattern of msbt files')
+    export.add_argument('output', help='directory to write the text sources to')
+    export.add_argument('--no-base', action='store_true', help="don't use the msbt files as the base of the sources, attributes and other sections are lost")
+    export.set_defaults(func=export_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import glob
+import os
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .msbt import MSBTFile
+from .msbt_write import MSBTWriter
+
+def find_msbt_files(source):
+    """
+    Returns a sorted list of (path, relative path) pairs for the msbt files in source.
+
+        source: A directory that is searched recursively, or a glob pattern such as "./msbt/**/*.msbt"
+    """
+    if os.path.isdir(source):
+        files = []
+        for root, dirs, filenames in os.walk(source):
+            dirs.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith('.msbt'):
+                    path = os.path.join(root, filename)
+                    files.append((path, os.path.relpath(path, source)))
+        return files
+
+    # relative paths of glob matches start after the part of the pattern without wildcards
+    base = source
+    while glob.has_magic(base):
+        base = os.path.dirname(base)
+    paths = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    return [(path, os.path.relpath(path, base or '.')) for path in paths]
+
+class FileResult:
+    """
+    The result of processing a single file in a batch.
+
+        path: The path of the input file
+        output: The path the file was written to, or None if it wasn't written
+        value: The value returned by the transform
+        error: A short description of the error if processing failed, otherwise None
+        traceback: The formatted traceback if processing failed
+        entries: The number of texts in the file
+        bytes_read, bytes_written: The size of the input and output files
+        seconds: The time spent processing the file
+    """
+    def __init__(self, path, output=None):
+        self.path = path
+        self.output = output
+        self.value = None
+        self.error = None
+        self.traceback = None
+        self.entries = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        status = 'ok' if self.ok else f'error: {self.error}'
+        return f"({self.path}: {status}, entries: {self.entries}, seconds: {self.seconds:.3f})"
+    def __repr__(self):
+        return self.__str__()
+
+class BatchStats:
+    """Aggregate statistics of a batch, updated as results come in"""
+    def __init__(self):
+        self.files = 0
+        self.failed = 0
+        self.entries = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.file_seconds = 0.0 # time spent in workers, summed over all files
+        self.seconds = 0.0 # wall clock time of the whole batch
+
+    def add(self, result):
+        self.files += 1
+        if not result.ok:
+            self.failed += 1
+        self.entries += result.entries
+        self.bytes_read += result.bytes_read
+        self.bytes_written += result.bytes_written
+        self.file_seconds += result.seconds
+
+    def __str__(self):
+        return (f"(files: {self.files}, failed: {self.failed}, entries: {self.entries}, bytes_read: {self.bytes_read}, "
+                f"bytes_written: {self.bytes_written}, seconds: {self.seconds:.3f})")
+    def __repr__(self):
+        return self.__str__()
+
+def process_file(path, transform, output=None, lazy=False):
+    """
+    Parses an msbt file, runs transform on it and writes it to output if given. Errors are stored in the returned FileResult.
+
+        transform: A function that takes a MSBTFile and edits it in place, its return value is stored in FileResult.value
+        lazy: Open the file in lazy mode. Files that are written are always opened in lazy mode, so the texts that the
+            transform doesn't access are copied from the file instead of being encoded again.
+    """
+    result = FileResult(path, output)
+    start = time.perf_counter()
+    try:
+        msbt = MSBTFile(path, lazy=lazy or output is not None)
+        result.bytes_read = len(msbt.data)
+        result.entries = msbt.TXT2.offset_count if msbt.TXT2 else 0
+
+        result.value = transform(msbt)
+
+        if output is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            result.bytes_written = len(MSBTWriter(msbt, output).buffer)
+    except Exception as e:
+        result.output = None
+        result.error = f"{type(e).__name__}: {e}"
+        result.traceback = traceback.format_exc()
+    result.seconds = time.perf_counter() - start
+    return result
+
+def _broken(future):
+    """Whether a future failed because its pool broke, waiting for it to finish"""
+    return not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+
+class MSBTBatch:
+    """
+    Runs a transform over every msbt file in a directory tree on a pool of worker processes.
+
+        source: A directory or glob pattern of msbt files, see find_msbt_files
+        transform: A function that takes a MSBTFile and edits it in place. It must be picklable (defined at module level) when using more than one worker.
+        output (optional): A directory that the transformed files are written to with the same relative paths, files aren't written if not given.
+        workers (optional): The number of worker processes, defaults to the number of cores. With 1 worker files are processed in this process.
+        max_in_flight (optional): The maximum number of files being processed or waiting to be collected at once, defaults to twice the number of workers.
+        lazy: Open files in lazy mode, files are always opened in lazy mode when output is given, see process_file
+
+    Iterating over a MSBTBatch processes the files and yields a FileResult for each file in order, stats holds the aggregate statistics.
+    """
+    def __init__(self, source, transform, output=None, workers=None, max_in_flight=None, lazy=False):
+        self.files = find_msbt_files(source)
+        self.transform = transform
+        self.output = output
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.lazy = lazy
+        self.stats = BatchStats()
+
+    def _jobs(self):
+        for path, relpath in self.files:
+            output = os.path.join(self.output, relpath) if self.output is not None else None
+            yield path, self.transform, output, self.lazy
+
+    def __iter__(self):
+        start = time.perf_counter()
+        try:
+            for result in self._results():
+                self.stats.add(result)
+                yield result
+        finally:
+            self.stats.seconds = time.perf_counter() - start
+
+    def _results(self):
+        if self.workers == 1:
+            for job in self._jobs():
+                yield process_file(*job)
+            return
+
+        executor = ProcessPoolExecutor(self.workers)
+        # only keep a limited amount of files in flight, results are collected in order
+        pending = deque()
+        try:
+            for job in self._jobs():
+                if len(pending) >= self.max_in_flight:
+                    executor, result = self._collect_next(executor, pending)
+                    yield result
+                try:
+                    future = executor.submit(process_file, *job)
+                except BrokenProcessPool:
+                    executor = self._restart(executor, pending)
+                    future = executor.submit(process_file, *job)
+                pending.append((future, job))
+            while pending:
+                executor, result = self._collect_next(executor, pending)
+                yield result
+        finally:
+            # don't start files that were never collected if iteration stopped early
+            for future, _ in pending:
+                future.cancel()
+            executor.shutdown()
+
+    def _collect_next(self, executor, pending):
+        """Returns the pool to use from then on and the FileResult of the oldest file in flight"""
+        future, _ = pending[0]
+        if _broken(future):
+            executor = self._restart(executor, pending)
+        return executor, self._collect(*pending.popleft())
+
+    def _restart(self, executor, pending):
+        """
+        Replaces a broken pool and returns the new one.
+
+        When a worker dies, such as from running out of memory, every file in flight on the pool fails with it. Those files
+        are run again one at a time, so only the files that break the pool on their own are reported as failed.
+        """
+        executor.shutdown()
+        executor = ProcessPoolExecutor(self.workers)
+        for i, (future, job) in enumerate(pending):
+            if not _broken(future):
+                continue
+            retry = executor.submit(process_file, *job)
+            if _broken(retry):
+                executor.shutdown()
+                executor = ProcessPoolExecutor(self.workers)
+                # resolve the failure so it isn't run again if the pool breaks later
+                result = self._collect(retry, job)
+                retry = Future()
+                retry.set_result(result)
+            pending[i] = (retry, job)
+        return executor
+
+    @staticmethod
+    def _collect(future, job):
+        """Returns the FileResult of a job, failures to get it back from the worker are stored in it like errors of the transform"""
+        try:
+            return future.result()
+        except Exception as e:
+            # such as a return value that can't be pickled, or a worker that died
+            result = FileResult(job[0])
+            result.error = f"{type(e).__name__}: {e}"
+            result.traceback = traceback.format_exc()
+            return result
+
+    def run(self):
+        """Processes every file and returns the list of results"""
+        return list(self)
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from . import __version__
+from .batch import find_msbt_files
+from .msbt import MSBTFile
+from .msbt_write import MSBTWriter, _write_atomic
+from .textfile import SOURCE_SUFFIX, TextSource, write_text_file
+
+# name of the dependency manifest in the output directory
+MANIFEST_NAME = '.pymsbt-build.json'
+
+# bump when the layout of the manifest changes
+MANIFEST_FORMAT = 1
+
+def find_sources(directory):
+    """Returns a sorted list of (path, relative path) pairs for the text sources in a directory tree"""
+    sources = []
+    for root, dirs, filenames in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(SOURCE_SUFFIX):
+                path = os.path.join(root, filename)
+                sources.append((path, os.path.relpath(path, directory)))
+    return sources
+
+def _output_path(relpath):
+    return relpath[:-len(SOURCE_SUFFIX)] + '.msbt'
+
+def _check_dependency(path, fingerprint):
+    """Returns the current fingerprint of a dependency, only hashing it if its modification time or size changed"""
+    try:
+        stat = os.stat(path)
+        if [stat.st_mtime_ns, stat.st_size] == fingerprint[:2]:
+            return fingerprint
+        return _read_dependency(path)[1]
+    except OSError:
+        return [None, None, None] # deleted
+
+def _read_dependency(path):
+    """Returns the contents of a file and its [mtime, size, hash] fingerprint, stat before reading so a change in between is noticed next time"""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, [stat.st_mtime_ns, stat.st_size, hashlib.sha256(data).hexdigest()]
+
+class BuildResult:
+    """
+    The result of building a single output.
+
+        source: The path of the text source
+        output: The path of the msbt file
+        dependencies: A map between the paths the output was built from and their [mtime, size, hash] fingerprints
+        error: A short description of the error if the build failed, otherwise None
+        traceback: The formatted traceback if the build failed
+        entries: The number of entries in the source
+        bytes_written: The size of the output
+        seconds: The time spent building the output
+    """
+    def __init__(self, source, output):
+        self.source = source
+        self.output = output
+        self.dependencies = {}
+        self.error = None
+        self.traceback = None
+        self.entries = 0
+        self.bytes_written = 0
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        status = 'ok' if self.ok else f'error: {self.error}'
+        return f"({self.output}: {status}, entries: {self.entries}, seconds: {self.seconds:.3f})"
+    def __repr__(self):
+        return self.__str__()
+
+class BuildStats:
+    """Statistics of an update of a MSBTBuild"""
+    def __init__(self):
+        self.built = 0
+        self.unchanged = 0
+        self.removed = 0 # outputs whose source was deleted
+        self.failed = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"(built: {self.built}, unchanged: {self.unchanged}, removed: {self.removed}, failed: {self.failed}, "
+                f"seconds: {self.seconds:.3f})")
+    def __repr__(self):
+        return self.__str__()
+
+def build_file(source, output):
+    """Builds a text source to a msbt file, applying it to its base file if it has one. Errors are stored in the returned BuildResult."""
+    result = BuildResult(source, output)
+    start = time.perf_counter()
+    try:
+        data, result.dependencies[source] = _read_dependency(source)
+        text_source = TextSource.from_bytes(data, source)
+        result.entries = len(text_source.entries)
+
+        base = None
+        if text_source.base is not None:
+            base_path = os.path.normpath(os.path.join(os.path.dirname(source), text_source.base))
+            data, result.dependencies[base_path] = _read_dependency(base_path)
+            base = MSBTFile.from_bytes(data, lazy=True, filepath=base_path)
+
+        msbt = text_source.to_msbt(base)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        result.bytes_written = len(MSBTWriter(msbt, output).buffer)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        result.traceback = traceback.format_exc()
+    result.seconds = time.perf_counter() - start
+    return result
+
+class MSBTBuild:
+    """
+    Compiles a directory tree of text sources to msbt files, only rebuilding the outputs whose sources changed.
+
+        source: A directory of text sources, files ending in SOURCE_SUFFIX, see pymsbt.textfile
+        output: The directory the msbt files are written to, with the same relative paths
+        manifest (optional): The path of the dependency manifest, defaults to MANIFEST_NAME in the output directory
+        workers (optional): The number of worker processes, defaults to the number of cores. With 1 worker outputs are built in this process.
+
+    The manifest records the fingerprint of every file an output was built from: its source and the base msbt file
+    the source refers to. A dependency is only hashed again when its modification time or size changed, so checking
+    an up to date tree only costs a stat per file. Outputs that were changed or deleted since they were built are
+    built again, and the outputs of deleted sources are removed.
+    """
+    def __init__(self, source, output, manifest=None, workers=None):
+        self.source = source
+        self.output = output
+        self.manifest_path = manifest or os.path.join(output, MANIFEST_NAME)
+        self.workers = workers or os.cpu_count() or 1
+        self.results = [] # the BuildResults of the last update
+        self.records = self._load_manifest()
+        self._changed = False # whether the records changed since the manifest was saved
+
+    def _load_manifest(self):
+        """Returns the records of the manifest by output path, an unreadable or outdated manifest rebuilds everything"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('format') != MANIFEST_FORMAT or manifest.get('version') != __version__:
+            return {}
+        # dependency paths are stored relative to the manifest, so the tree can be moved
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        records = {}
+        for output, record in manifest['outputs'].items():
+            record['dependencies'] = {os.path.normpath(os.path.join(directory, path)): fingerprint
+                                      for path, fingerprint in record['dependencies'].items()}
+            records[output] = record
+        return records
+
+    def _save_manifest(self):
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        outputs = {}
+        for output, record in sorted(self.records.items()):
+            dependencies = {os.path.relpath(path, directory): fingerprint for path, fingerprint in record['dependencies'].items()}
+            outputs[output] = dict(record, dependencies=dependencies)
+        manifest = {'format': MANIFEST_FORMAT, 'version': __version__, 'outputs': outputs}
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(self.manifest_path, json.dumps(manifest, indent=1).encode('utf-8'))
+
+    def _is_current(self, output, record, checked):
+        """Whether an output is up to date with its record, checked caches the state of dependencies shared by several outputs"""
+        for path, fingerprint in record['dependencies'].items():
+            current = checked.get(path)
+            if current is None:
+                current = checked[path] = _check_dependency(path, fingerprint)
+            if current[2] != fingerprint[2]:
+                return False
+            if current[:2] != fingerprint[:2]:
+                # touched but not changed, remember the new modification time so it isn't hashed again
+                fingerprint[:2] = current[:2]
+                self._changed = True
+
+        try:
+            stat = os.stat(os.path.join(self.output, output))
+        except OSError:
+            return False
+        return [stat.st_mtime_ns, stat.st_size] == record['output']
+
+    def stale(self, sources=None):
+        """Returns the (source, relative output path) pairs of the outputs that need to be built"""
+        checked = {}
+        jobs = []
+        for path, relpath in sources if sources is not None else find_sources(self.source):
+            output = _output_path(relpath)
+            record = self.records.get(output)
+            if record is None or record['source'] != relpath or not self._is_current(output, record, checked):
+                jobs.append((path, output))
+        return jobs
+
+    def update(self, force=False):
+        """
+        Builds the outputs whose dependencies changed and returns the BuildStats of the update.
+
+            force: Build every output, ignoring the manifest
+
+        The BuildResults of the outputs that were built are stored in results. Failed outputs are built again on the next update.
+        """
+        stats = BuildStats()
+        start = time.perf_counter()
+        sources = find_sources(self.source)
+        outputs = {_output_path(relpath): relpath for _, relpath in sources}
+        jobs = [(path, _output_path(relpath)) for path, relpath in sources] if force else self.stale(sources)
+        stats.unchanged = len(sources) - len(jobs)
+
+        self.results = []
+        try:
+            for result, output in zip(self._build(jobs), (output for _, output in jobs)):
+                self.results.append(result)
+                self._changed = True
+                if result.ok:
+                    stat = os.stat(result.output)
+                    self.records[output] = {
+                        'source': outputs[output],
+                        'output': [stat.st_mtime_ns, stat.st_size],
+                        'dependencies': result.dependencies,
+                    }
+                    stats.built += 1
+                else:
+                    self.records.pop(output, None)
+                    stats.failed += 1
+
+            # remove the outputs of deleted sources
+            for output in [output for output in self.records if output not in outputs]:
+                try:
+                    os.remove(os.path.join(self.output, output))
+                except FileNotFoundError:
+                    pass
+                del self.records[output]
+                self._changed = True
+                stats.removed += 1
+        finally:
+            # outputs that were built before an interruption don't have to be built again
+            if self._changed or not os.path.exists(self.manifest_path):
+                self._save_manifest()
+                self._changed = False
+            stats.seconds = time.perf_counter() - start
+        return stats
+
+    def _build(self, jobs):
+        jobs = [(os.path.abspath(source), os.path.join(self.output, output)) for source, output in jobs]
+        if self.workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                yield build_file(*job)
+            return
+
+        with ProcessPoolExecutor(min(self.workers, len(jobs))) as executor:
+            yield from executor.map(build_file, *zip(*jobs), chunksize=max(1, len(jobs) // (self.workers * 8)))
+
+    def watch(self, interval=1.0, callback=None):
+        """
+        Updates the outputs whenever a source changes, until interrupted with KeyboardInterrupt.
+
+            interval: The time between checks in seconds
+            callback (optional): A function that receives the BuildStats of every update that built or removed outputs
+
+        Sources are polled, so no platform specific file watching is needed.
+        """
+        while True:
+            stats = self.update()
+            if callback is not None and (stats.built or stats.failed or stats.removed):
+                callback(stats)
+            time.sleep(interval)
+
+def export_sources(source, output, with_base=True):
+    """
+    Writes a text source for every msbt file in source to the output directory, returning the amount of files.
+
+        source: A directory or glob pattern of msbt files, see find_msbt_files
+        output: The directory the sources are written to, with the same relative paths and SOURCE_SUFFIX
+        with_base: Refer to the msbt files as the base of the sources, so their attributes and other sections are kept
+    """
+    files = find_msbt_files(source)
+    for path, relpath in files:
+        target = os.path.join(output, os.path.splitext(relpath)[0] + SOURCE_SUFFIX)
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        base = os.path.relpath(path, os.path.dirname(os.path.abspath(target))) if with_base else None
+        write_text_file(MSBTFile(path, lazy=True), target, base)
+    return len(files)
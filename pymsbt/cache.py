@@ -0,0 +1,151 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from . import __version__
+from .msbt import MSBTFile
+
+# bump when the cached section states change
+CACHE_FORMAT = 2
+
+# eviction removes entries until the cache is this fraction of max_size, so the next writes don't have to scan the directory again
+EVICT_RATIO = 0.9
+
+class _StateUnpickler(pickle.Unpickler):
+    """Loads cache entries, which only hold builtin types, refusing every class and function so that loading can't run code"""
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Cache entries can't refer to {module}.{name}")
+
+class ParseCache:
+    """
+    An on-disk cache of parsed msbt files, keyed by the hash of the file contents and the library version.
+
+        directory: The directory the cache is stored in, it's created if it doesn't exist
+        max_size (optional): The maximum total size of the cache in bytes, the least recently used entries are removed when it's exceeded
+
+    The cache can be shared between processes: entries are written to a temporary file and renamed into place,
+    and entries that disappear or can't be read are treated as misses. Entries are pickled, and are loaded without
+    allowing any class or function so a tampered entry can't run code, but it can still hand out wrong texts:
+    only use a directory that untrusted users can't write to. It's created readable by its owner only.
+    """
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None # estimate of the total size of the entries, only scanned again when it exceeds max_size
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _entry_path(self, data):
+        key = hashlib.sha256(data)
+        key.update(f'{__version__}/{CACHE_FORMAT}'.encode('ascii'))
+        return os.path.join(self.directory, key.hexdigest() + '.cache')
+
+    def load(self, filepath, lazy=False, attribute_layout=None):
+        """
+        Returns a MSBTFile for filepath, restoring its LBL1 and TXT2 sections from the cache if it was cached before.
+
+            lazy: Open the file in lazy mode. Restored labels and texts are then only created when accessed, making warm loads about as fast as reading the file.
+            attribute_layout (optional): See MSBTFile
+        """
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        entry_path = self._entry_path(data)
+
+        cached = self._read_entry(entry_path)
+        if cached is not None:
+            self.hits += 1
+            return MSBTFile._from_data(filepath, data, lazy, cached, attribute_layout)
+
+        self.misses += 1
+        msbt = MSBTFile._from_data(filepath, data, lazy, attribute_layout=attribute_layout)
+        cached = {}
+        if msbt.LBL1 is not None:
+            cached['LBL1'] = msbt.LBL1.get_state()
+        if msbt.TXT2 is not None:
+            cached['TXT2'] = msbt.TXT2.get_state()
+        self._write_entry(entry_path, cached)
+        return msbt
+
+    def _read_entry(self, entry_path):
+        try:
+            with open(entry_path, 'rb') as f:
+                cached = _StateUnpickler(f).load()
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # unreadable entries are removed and parsed again
+            self._remove(entry_path)
+            return None
+
+        # mark the entry as recently used
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return cached
+
+    def _write_entry(self, entry_path, cached):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        if self.max_size is None:
+            return
+        if self._size is None:
+            self._size = self.size() # includes the new entry
+        else:
+            self._size += size
+        if self._size > self.max_size:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """Returns (mtime, size, path) for every cache entry"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.cache'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue # removed by another process
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """Returns the total size of the cache entries in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Removes the least recently used entries once the cache exceeds max_size, until it's below EVICT_RATIO of max_size"""
+        if self.max_size is None:
+            return
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_size:
+            target = self.max_size * EVICT_RATIO
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= target:
+                    break
+        self._size = total
+
+    def clear(self):
+        """Removes every cache entry"""
+        for _, _, path in self._entries():
+            self._remove(path)
+        self._size = 0
@@ -1,4 +1,21 @@
+import logging
 import struct
+import threading
+from collections.abc import MutableSequence
+
+from .codec import DEFAULT_CODEC, get_codec
+
+logger = logging.getLogger(__name__)
+
+# amount of LBL1 hash buckets used by Nintendo's tools
+DEFAULT_BUCKET_COUNT = 101
+
+def label_hash(label, bucket_count):
+    """Returns the index of the LBL1 hash bucket that a label is stored in"""
+    hash = 0
+    for char in label:
+        hash = (hash * 0x492 + ord(char)) & 0xFFFFFFFF
+    return hash % bucket_count
 
 def formatList(texts):
     string = """"""
@@ -12,25 +29,28 @@ class MSBTHeader:
     def __init__(self, data):
 
         # get the msbt file header
-        self.magic = data[0:8].decode('ascii')
-        self.byte_order = struct.unpack("<H", data[0x8:0x0A])[0]
-        self.version = struct.unpack("<H", data[0x0C:0x0E])[0]
-        self.section_count = struct.unpack("<H", data[0x0E:0x10])[0]
-        self.file_size = struct.unpack("<I", data[0x12:0x16])[0]
+        self.magic = str(data[0:8], 'ascii')
 
         # magic must be MsgStdBn
         if self.magic != "MsgStdBn":
             raise ValueError(f"Invalid MSBT file magic: {self.magic}")
+
+        # the byte order mark decides how the rest of the file is read
+        self.byte_order = int.from_bytes(data[0x8:0x0A], 'little')
+        self.encoding = data[0x0C]
+        self.codec = get_codec(self.byte_order, self.encoding)
+
+        _, _, _, _, self.version, self.section_count, _, self.file_size = self.codec.header.unpack_from(data, 0)
         
-        print(f"MSBT Header: Magic={self.magic}, Byte order={self.byte_order} Version={self.version}, SectionCount={self.section_count}, FileSize={self.file_size}")
+        logger.debug("MSBT Header: Magic=%s, Byte order=%s Encoding=%s Version=%s, SectionCount=%s, FileSize=%s", self.magic, self.byte_order, self.encoding, self.version, self.section_count, self.file_size)
 
     def __str__(self):
-        return (f"({self.magic}: byte_order: {self.byte_order}, version: {self.version}, section_count: {self.section_count}, file_size: {self.file_size})")
+        return (f"({self.magic}: byte_order: {self.byte_order}, encoding: {self.encoding}, version: {self.version}, section_count: {self.section_count}, file_size: {self.file_size})")
 
 class MSBTSection:
     # msbt section header containing signature (magic) and table size
-    def __init__(self, data, offset):
-        self.encoded_signature, self.table_size = struct.unpack_from("<4sI", data, offset)
+    def __init__(self, data, offset, codec=DEFAULT_CODEC):
+        self.encoded_signature, self.table_size = codec.section_header.unpack_from(data, offset)
         self.signature = self.encoded_signature.decode('ascii')
         self.bytes = None
 
@@ -43,30 +63,69 @@ class MSBTSection:
         return self.__str__()
 
 class LBL1Section:
-    def __init__(self, data, section_offset, table_size):
+    def __init__(self, data, section_offset, table_size, lazy=False, codec=DEFAULT_CODEC):
         self.magic = 'LBL1'
+        self.data = data
+        self.codec = codec
+        self.section_offset = section_offset
         self.offset_count = 0
         self.offset_table = []
-        self.labels = []
+        self.index = None
+        self.rehash_pending = False # set when labels were added or removed, the hash table is rebuilt before writing
+        self._labels = None
+        self._removed = set()
+        self._bucket_starts = None
+        self._cached_labels = None
 
         # starts after the section header
         offset = section_offset + 16
 
         # get number of entries in the offset table
-        self.offset_count, = struct.unpack_from("<I", data, offset)
+        self.offset_count, = codec.u32.unpack_from(data, offset)
 
         offset += 4
 
         for i in range(self.offset_count):
             # 4byte string count and 4byte string offset
-            str_count, str_offset = struct.unpack_from("<II", data, offset)
+            str_count, str_offset = codec.u32_pair.unpack_from(data, offset)
             offset += 8
 
             self.offset_table.append((str_count, str_offset))
             #print(f"Label {i}: StringCount={str_count}, StringOffset={str_offset}")
-            
+
+        # in lazy mode the label strings are only parsed once they are first accessed
+        if not lazy:
+            self._parse_labels()
+
+    @property
+    def labels(self):
+        if self._labels is None:
+            self._parse_labels()
+        if self._removed:
+            # removed labels are dropped in one pass the next time the labels are needed
+            self._labels = [label for label in self._labels if label.data not in self._removed]
+            self._removed.clear()
+        return self._labels
+
+    @labels.setter
+    def labels(self, labels):
+        self._labels = labels
+        self._removed.clear()
+        self._bucket_starts = None
+        self.index = None
+        self.rehash_pending = True
+
+    def _parse_labels(self):
+        self._bucket_starts = None
+        if self._cached_labels is not None:
+            # restored from a cached state
+            self._labels = [MSBTLabel(label, len(label), string_index) for label, string_index in self._cached_labels]
+            return
+
+        self._labels = []
+        for str_count, str_offset in self.offset_table:
             # parse actual strings
-            self.parse_label_strings(data, section_offset + 16 + str_offset, str_count)
+            self.parse_label_strings(self.data, self.section_offset + 16 + str_offset, str_count)
 
     def parse_label_strings(self, data, label_offset, string_count):
         offset = label_offset
@@ -77,78 +136,686 @@ class LBL1Section:
             offset += 1
             
             # read the label string
-            label = data[offset:offset + str_len].decode('ascii')
+            label = str(data[offset:offset + str_len], 'ascii')
             offset += str_len
 
-            index = data[offset:offset + 4]
+            index, = self.codec.u32.unpack_from(data, offset)
             offset += 4
 
             # create new MSBTLabel and add to list
-            self.labels.append(MSBTLabel(label, str_len, index))
+            self._labels.append(MSBTLabel(label, str_len, index))
+
+    def get_state(self):
+        """Returns the parsed section as plain python objects, which can be restored with from_state"""
+        return (self.offset_count, self.offset_table, [(label.data, label.string_index) for label in self.labels])
+
+    @classmethod
+    def from_state(cls, data, section_offset, state, codec=DEFAULT_CODEC):
+        """Creates a LBL1Section from a state returned by get_state without parsing the section"""
+        section = cls.__new__(cls)
+        section.magic = 'LBL1'
+        section.data = data
+        section.codec = codec
+        section.section_offset = section_offset
+        section.index = None
+        section.rehash_pending = False
+        section._bucket_starts = None
+        section.offset_count, section.offset_table, section._cached_labels = state
+        section._labels = None
+        section._removed = set()
+        return section
+
+    def build_index(self):
+        """Builds a dict between every label and its text index, used by find_label from then on"""
+        self.index = {label.data: label.string_index for label in self.labels}
+        return self.index
+
+    def add_label(self, label, string_index):
+        """Adds a label for the text at string_index, raising a ValueError if it already exists"""
+        length = len(label.encode('ascii'))
+        if not 0 < length < 256:
+            raise ValueError(f"Labels must be 1 to 255 characters long: {label!r}")
+        index = self.index if self.index is not None else self.build_index()
+        if label in index:
+            raise ValueError(f"Label already exists: {label}")
+
+        labels = self.labels # drops removed labels first, in case the label was removed before
+        labels.append(MSBTLabel(label, length, string_index))
+        index[label] = string_index
+        self.rehash_pending = True
+
+    def remove_label(self, label):
+        """Removes a label and returns the index of its text, raising a KeyError if it doesn't exist"""
+        index = self.index if self.index is not None else self.build_index()
+        string_index = index.pop(label)
+        self._removed.add(label)
+        self.rehash_pending = True
+        return string_index
+
+    def rehash(self, bucket_count=None):
+        """
+        Rebuilds the hash table, grouping the labels by bucket. Done automatically before writing after labels were added or removed.
+
+            bucket_count (optional): The new amount of buckets, defaults to the current amount.
+                More buckets keep the lookup chains short in files with a lot of labels.
+        """
+        self._labels, self.offset_table = self.hashed_layout(bucket_count)
+        self.offset_count = len(self.offset_table)
+        self._bucket_starts = None
+        self.rehash_pending = False
+
+    def hashed_layout(self, bucket_count=None):
+        """Returns the labels grouped by bucket and the new offset table, like rehash but without changing the section"""
+        if bucket_count is None:
+            bucket_count = self.offset_count or DEFAULT_BUCKET_COUNT
+        if bucket_count < 1:
+            raise ValueError("bucket_count must be at least 1")
+
+        buckets = [[] for _ in range(bucket_count)]
+        for label in self.labels:
+            buckets[label_hash(label.data, bucket_count)].append(label)
+
+        offset_table = []
+        str_offset = 4 + 8 * bucket_count
+        for bucket in buckets:
+            offset_table.append((len(bucket), str_offset))
+            str_offset += sum(5 + len(label.data) for label in bucket)
+        return [label for bucket in buckets for label in bucket], offset_table
+
+    def find_label(self, label):
+        """
+        Returns the text index of a label, or None if the label doesn't exist.
+
+            Only the hash bucket the label belongs in is searched, straight from the file data if the labels haven't been parsed yet.
+        """
+        if self.index is not None:
+            return self.index.get(label)
+        if self.rehash_pending:
+            self.rehash()
+        if self.offset_count == 0:
+            return None
+
+        bucket = label_hash(label, self.offset_count)
+        str_count, str_offset = self.offset_table[bucket]
+
+        if self._labels is not None:
+            # labels are stored grouped by bucket, in the order of the offset table
+            if self._bucket_starts is None:
+                self._bucket_starts = []
+                start = 0
+                for count, _ in self.offset_table:
+                    self._bucket_starts.append(start)
+                    start += count
+
+            start = self._bucket_starts[bucket]
+            for label_obj in self._labels[start:start + str_count]:
+                if label_obj.data == label:
+                    return label_obj.string_index
+            return None
+
+        try:
+            encoded = label.encode('ascii')
+        except UnicodeEncodeError:
+            return None
+
+        data = self.data
+        offset = self.section_offset + 16 + str_offset
+        for _ in range(str_count):
+            str_len = data[offset]
+            if str_len == len(encoded) and data[offset + 1:offset + 1 + str_len] == encoded:
+                return self.codec.u32.unpack_from(data, offset + 1 + str_len)[0]
+            offset += 5 + str_len
+        return None
 
     def __str__(self):
         return (f"""(magic: {self.magic} offset_count: {self.offset_count},
     labels: {formatList(self.labels)}""")
 
+def parse_text_string(data, text_offset, codec=DEFAULT_CODEC):
+    """Decodes the text string at text_offset and returns it as a list of components"""
+    # text and text commands are represented as components with 'type' and 'data'
+    components = []
+    offset = text_offset
+    text_run = codec.text_run
+    unit_size = codec.unit_size
+    low_byte = codec.low_byte
+
+    while True:
+        # find the end of the plain text run, which is the next tag header or the terminator
+        end = text_run.match(data, offset).end()
+        if end > offset:
+            components.append(TextComponent(type='text', data=codec.decode(data[offset:end])))
+
+        if end + unit_size > len(data):
+            raise ValueError(f"Unterminated text string at offset {text_offset}")
+
+        # text command parsing
+        unit = data[end + low_byte]
+        if unit == 0x0E or unit == 0x0F: #0x0E and 0x0F are tag headers
+            text_command = TextCommand(data, end, codec)
+            components.append(TextComponent(type='command', data=text_command))
+            offset = text_command.end_offset
+            continue
+
+        # end text parsing
+        break
+
+    return components
+
+def parse_text_runs(data, text_offset, codec=DEFAULT_CODEC):
+    """Yields the plain text runs of the text string at text_offset, skipping over text commands without decoding them"""
+    offset = text_offset
+    while True:
+        end = codec.text_run.match(data, offset).end()
+        if end > offset:
+            yield codec.decode(data[offset:end])
+
+        offset = _skip_text_command(data, end, text_offset, codec)
+        if offset is None:
+            break
+
+def find_text_end(data, text_offset, codec=DEFAULT_CODEC):
+    """Returns the offset right after the terminator of the text string at text_offset, without decoding it"""
+    offset = text_offset
+    while True:
+        end = codec.text_run.match(data, offset).end()
+        next_offset = _skip_text_command(data, end, text_offset, codec)
+        if next_offset is None:
+            return end + codec.unit_size
+        offset = next_offset
+
+def _skip_text_command(data, offset, text_offset, codec):
+    """Returns the offset after the text command at offset, or None if offset is the terminator"""
+    if offset + codec.unit_size > len(data):
+        raise ValueError(f"Unterminated text string at offset {text_offset}")
+
+    unit = data[offset + codec.low_byte]
+    if unit == 0x0E or unit == 0x0F:
+        # skip the tag header and its data, the data size is the last field of the header
+        header_size = codec.command.size
+        return offset + header_size + codec.u16.unpack_from(data, offset + header_size - 2)[0]
+    return None
+
 class TXT2Section:
-    def __init__(self, data, section_offset, table_size):
+    def __init__(self, data, section_offset, table_size, lazy=False, codec=DEFAULT_CODEC):
         self.magic = 'TXT2'
+        self.data = data
+        self.codec = codec
+        self.section_offset = section_offset
         self.offset_count = 0
         self.offset_table = []
-        self.texts = []
+        self.raw = {} # encoded texts that replace the texts in the file data, see set_raw
+        self._cached_texts = None
+        self._sequential = None
 
         # start after the 16-byte header
         offset = section_offset + 16
-        self.offset_count, = struct.unpack_from("<I", data, offset)
+        self.offset_count, = codec.u32.unpack_from(data, offset)
         offset += 4  # Move past the text count
         
-        # read each string in the text section
+        # read the offset of each string in the text section
         for i in range(self.offset_count):
-            text_offset, = struct.unpack_from("<I", data, offset)
+            text_offset, = codec.u32.unpack_from(data, offset)
             self.offset_table.append(text_offset)
             offset += 4
-            self.parse_text_string(data, section_offset + 16 + text_offset)
+
+        # in lazy mode the strings are only decoded once they are first accessed
+        self.texts = TextList(self)
+        if not lazy:
+            for i in range(self.offset_count):
+                self.get_text(i)
+
+    def get_state(self):
+        """Returns the parsed section as plain python objects, which can be restored with from_state"""
+        texts = []
+        for components in self.texts:
+            texts.append([component.data if component.type == 'text' else component.data.get_state() for component in components])
+        return (self.offset_count, self.offset_table, texts)
+
+    @classmethod
+    def from_state(cls, data, section_offset, state, codec=DEFAULT_CODEC):
+        """Creates a TXT2Section from a state returned by get_state without parsing the section"""
+        section = cls.__new__(cls)
+        section.magic = 'TXT2'
+        section.data = data
+        section.codec = codec
+        section.section_offset = section_offset
+        section.offset_count, section.offset_table, section._cached_texts = state
+        section.raw = {}
+        section._sequential = None
+        section.texts = TextList(section)
+        return section
+
+    def get_text(self, index):
+        """Returns the components of the text at index, decoding and memoizing them on first access"""
+        return self.texts[index]
+
+    def matches_raw(self, index):
+        """
+        Returns True if get_raw still returns the bytes of the text at index.
+
+            Texts whose components were never decoded or set can't have been edited in place, every other text may differ from its bytes.
+        """
+        return isinstance(self.texts, TextList) and not self.texts.is_loaded(index)
+
+    def set_raw(self, index, raw):
+        """
+        Replaces the text at index with already encoded bytes, including the terminator, such as a text copied from another file.
+
+            The bytes are written as they are and are only decoded if the text is accessed.
+        """
+        index = range(self.offset_count)[index]
+        if not isinstance(self.texts, TextList):
+            # texts that were replaced with a plain list are always encoded from their components
+            self.texts[index] = parse_text_string(raw, 0, self.codec)
+            return
+        self.raw[index] = bytes(raw)
+        self.texts.reset(index)
+
+    def get_raw(self, index):
+        """Returns a memoryview of the original bytes of the text at index in the file data, including text commands and the terminator"""
+        index = range(self.offset_count)[index]
+        if index in self.raw:
+            return memoryview(self.raw[index])
+        start = self.section_offset + 16 + self.offset_table[index]
+
+        # texts are normally stored one after another, so a text ends where the next one starts
+        if self._is_sequential() and index + 1 < self.offset_count and self.offset_table[index + 1] is not None:
+            end = self.section_offset + 16 + self.offset_table[index + 1]
+        else:
+            end = find_text_end(self.data, start, self.codec)
+        return memoryview(self.data)[start:end]
+
+    def _is_sequential(self):
+        if self._sequential is None:
+            self._sequential = all(a < b for a, b in zip(self.offset_table, self.offset_table[1:]))
+        return self._sequential
+
+    def append(self, text):
+        """Appends a text and returns its index, it's encoded when writing"""
+        self.insert(self.offset_count, text)
+        return self.offset_count - 1
+
+    def insert(self, index, text):
+        """Inserts a text before index, moving the texts after it up by one like list.insert. Labels keep their text indexes."""
+        self._is_sequential() # before the offset table has texts that aren't in the file data
+        if index < self.offset_count:
+            self.raw = {i + 1 if i >= index else i: raw for i, raw in self.raw.items()}
+        self.offset_count += 1
+        self.offset_table.insert(index, None)
+        if self._cached_texts is not None:
+            self._cached_texts.insert(index, None)
+        if isinstance(self.texts, TextList):
+            self.texts.insert_slot(index, text)
+        else:
+            self.texts.insert(index, text)
+
+    def compact(self, keep):
+        """Only keeps the texts at the indexes in keep, in that order"""
+        new_indexes = {old: new for new, old in enumerate(keep)}
+        self.offset_table = [self.offset_table[i] for i in keep]
+        if self._cached_texts is not None:
+            self._cached_texts = [self._cached_texts[i] for i in keep]
+        if isinstance(self.texts, TextList):
+            self.texts.compact(keep)
+        else:
+            self.texts = [self.texts[i] for i in keep]
+        self.raw = {new_indexes[i]: raw for i, raw in self.raw.items() if i in new_indexes}
+        self.offset_count = len(keep)
+        # texts no longer end where the next one starts once a text between them is removed
+        self._sequential = False
+
+    def decode_range(self, start, end):
+        """Decodes the texts from start to end that weren't decoded or set yet, can be called from several threads at once"""
+        self.texts.fill(start, [None if self.texts.is_loaded(index) else self._decode_text(index) for index in range(start, end)])
+
+    @staticmethod
+    def text_from_state(state):
+        """Returns the components of a text from its state, a list of strings and TextCommand states as in get_state"""
+        return [
+            TextComponent(type='text', data=component) if type(component) is str
+            else TextComponent(type='command', data=TextCommand.from_state(component))
+            for component in state
+        ]
+
+    def _decode_text(self, index):
+        if index in self.raw:
+            return parse_text_string(self.raw[index], 0, self.codec)
+        if self._cached_texts is not None:
+            # restored from a cached state
+            return self.text_from_state(self._cached_texts[index])
+        return self.parse_text_string(self.data, self.section_offset + 16 + self.offset_table[index])
     
     def parse_text_string(self, data, text_offset):
-        # text and text commands are represented as components with 'type' and 'data'
-        components = []
-        offset = text_offset
-        text = ""
-
-        while True:
-            # text command parsing
-            if data[offset] == 0x0E or data[offset] == 0xf: #0x0E and 0fx are tag headers
-                text_command = TextCommand(data, offset)
-                if len(text) > 0:
-                    # if there's already data in text variable, create component before adding text command
-                    components.append(TextComponent(type='text', data=text))
-                    text = ""
-                components.append(TextComponent(type='command', data=text_command))
-                offset = text_command.end_offset
-                continue
-
-            char = struct.unpack_from("<H", data, offset)[0]
-            if char == 0x0000:
-                # end text parsing
-                break
-
-            text += chr(char)
-            offset += 2
-        
-        #after parsing finished, create component and add to component list
-        if len(text) > 0:
-            components.append(TextComponent(type='text', data=text))
-        self.texts.append(components)
+        """Decodes the text string at text_offset and returns it as a list of components"""
+        return parse_text_string(data, text_offset, self.codec)
 
     def __str__(self):
         return (f"""(magic: {self.magic}, offset_count: {self.offset_count}, 
     texts: {formatList(self.texts)})""")
 
+class TextList(MutableSequence):
+    """
+    A list of the texts in a TXT2Section that decodes each text the first time it is accessed.
+
+        Texts that are set are stored as is and are never decoded from the file data. Texts that were decoded or set are encoded when writing.
+        Supports everything a list does, inserting and deleting texts moves the texts after them like in a list,
+        but isn't a list instance. Slices are returned as plain lists.
+    """
+    def __init__(self, section):
+        self.section = section
+        self._texts = [None] * section.offset_count
+        self._fill_lock = threading.Lock()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        text = self._texts[index]
+        if text is None:
+            text = self.section._decode_text(index)
+            self._texts[index] = text
+        return text
+
+    def __setitem__(self, index, text):
+        if not isinstance(index, slice):
+            self._texts[index] = text
+            return
+
+        indexes = range(*index.indices(len(self)))
+        texts = list(text)
+        if len(texts) == len(indexes):
+            for i, text in zip(indexes, texts):
+                self[i] = text
+        elif index.step not in (None, 1):
+            raise ValueError(f"attempt to assign sequence of size {len(texts)} to extended slice of size {len(indexes)}")
+        else:
+            # like a list, a slice can be replaced with a different amount of texts
+            del self[index]
+            for offset, text in enumerate(texts):
+                self.insert(indexes.start + offset, text)
+
+    def __delitem__(self, index):
+        deleted = set(range(len(self))[index]) if isinstance(index, slice) else {range(len(self))[index]}
+        if deleted:
+            self.section.compact([i for i in range(len(self)) if i not in deleted])
+
+    def insert(self, index, text):
+        # clamped like list.insert
+        count = len(self)
+        if index < 0:
+            index = max(0, count + index)
+        self.section.insert(min(index, count), text)
+
+    def clear(self):
+        del self[:]
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __iter__(self):
+        for i in range(len(self._texts)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, TextList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def reset(self, index):
+        """Forgets the decoded text at index, so it's decoded again on the next access"""
+        self._texts[index] = None
+
+    def insert_slot(self, index, text):
+        """Inserts a text without updating the section, see TXT2Section.insert"""
+        self._texts.insert(index, text)
+
+    def compact(self, keep):
+        """Only keeps the texts at the indexes in keep without updating the section, see TXT2Section.compact"""
+        self._texts = [self._texts[i] for i in keep]
+
+    def is_loaded(self, index):
+        """Returns True if the text at index has already been decoded or set"""
+        return self._texts[index] is not None
+
+    def fill(self, start, texts):
+        """Stores decoded texts from start on, texts that were decoded or set in the meantime and None values are skipped"""
+        with self._fill_lock:
+            for index, text in enumerate(texts, start):
+                if text is not None and self._texts[index] is None:
+                    self._texts[index] = text
+
+    def __getstate__(self):
+        # locks can't be pickled, the copy gets its own
+        state = self.__dict__.copy()
+        del state['_fill_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._fill_lock = threading.Lock()
+
+    def __str__(self):
+        return str(list(self))
+    def __repr__(self):
+        return self.__str__()
+
+class AttributeLayout:
+    """
+    A description of the fields of an ATR1 attribute record, used for typed access to attributes.
+
+        fields: A list of (name, format) pairs in the order they are stored, format being a struct format character such as 'B', 'H' or 'I'
+        byte_order (optional): The struct byte order character, defaults to the byte order of the file
+
+        layout = AttributeLayout([('speaker', 'B'), ('window', 'B'), ('flags', 'H')])
+    """
+    def __init__(self, fields, byte_order=None):
+        self.names = [name for name, _ in fields]
+        self.formats = [format for _, format in fields]
+        self.byte_order = byte_order
+        self.size = struct.calcsize('<' + ''.join(self.formats))
+        self._compiled = {}
+
+    def compile(self, endian):
+        """
+        Returns the struct of a whole record and a map between field names and their struct and offset for a byte order.
+
+            endian: The struct byte order character of the file, used unless the layout has its own byte order
+        """
+        endian = self.byte_order or endian
+        compiled = self._compiled.get(endian)
+        if compiled is None:
+            # one precompiled struct per field, with its offset in the record
+            fields = {}
+            offset = 0
+            for name, format in zip(self.names, self.formats):
+                field = struct.Struct(endian + format)
+                fields[name] = (field, offset)
+                offset += field.size
+            compiled = self._compiled[endian] = (struct.Struct(endian + ''.join(self.formats)), fields)
+        return compiled
+
+    def __getstate__(self):
+        # structs can't be pickled, they are compiled again when needed
+        return dict(self.__dict__, _compiled={})
+
+    def __str__(self):
+        return f"(fields: {self.names}, size: {self.size})"
+    def __repr__(self):
+        return self.__str__()
+
+class AttributeRecord:
+    """A view of one attribute record in an ATR1Section, with the fields of the section's layout as attributes"""
+    __slots__ = ('section', 'index')
+
+    def __init__(self, section, index):
+        object.__setattr__(self, 'section', section)
+        object.__setattr__(self, 'index', index)
+
+    def _field(self, name):
+        layout = self.section.layout
+        if layout is None:
+            raise AttributeError(name)
+        fields = layout.compile(self.section.codec.endian)[1]
+        if name not in fields:
+            raise AttributeError(name)
+        return fields[name]
+
+    def __getattr__(self, name):
+        field, offset = self._field(name)
+        return field.unpack_from(self.section.records, self.index * self.section.entry_size + offset)[0]
+
+    def __setattr__(self, name, value):
+        field, offset = self._field(name)
+        field.pack_into(self.section.writable_records(), self.index * self.section.entry_size + offset, value)
+
+    @property
+    def raw(self):
+        """A memoryview of the bytes of the record"""
+        return self.section.get_record(self.index)
+
+    def values(self):
+        """Returns a dict of every field of the record"""
+        layout = self.section.layout
+        record = layout.compile(self.section.codec.endian)[0]
+        return dict(zip(layout.names, record.unpack_from(self.section.records, self.index * self.section.entry_size)))
+
+    def __str__(self):
+        if self.section.layout is None:
+            return f"(index: {self.index}, raw: 0x{self.raw.hex()})"
+        return f"(index: {self.index}, {self.values()})"
+    def __repr__(self):
+        return self.__str__()
+
+class ATR1Section:
+    """
+    The attributes of every entry, stored as fixed-size records in the same order as the texts.
+
+        entry_count: The amount of records
+        entry_size: The size of a record in bytes
+        records: A memoryview of all records, sharing memory with the file data until a record is changed
+        layout: An AttributeLayout that enables typed access to the records through get(), None by default
+
+    Nothing is copied when parsing, and the section is written back from the file data as long as no record is changed.
+    """
+    def __init__(self, data, section_offset, table_size, layout=None, codec=DEFAULT_CODEC):
+        self.magic = 'ATR1'
+        self.codec = codec
+        self.table_size = table_size
+        self.layout = layout
+        self.dirty = False
+        self._buffer = None # storage with room for appended records, once records were added or removed
+
+        # starts after the section header
+        start = section_offset + 16
+        self.entry_count, self.entry_size = codec.u32_pair.unpack_from(data, start)
+
+        # the body also holds any data stored after the records, which is kept as is
+        self.body = memoryview(data)[start:start + table_size]
+        self.records = self.body[8:8 + self.entry_count * self.entry_size]
+
+    def writable_records(self):
+        """Returns the records as a writable memoryview, copying the section out of the file data the first time"""
+        if not self.dirty:
+            self.body = memoryview(bytearray(self.body))
+            self.records = self.body[8:8 + self.entry_count * self.entry_size]
+            self.dirty = True
+        return self.records
+
+    @property
+    def resizable(self):
+        """Whether records can be added and removed, which isn't possible when data is stored after the records"""
+        return len(self.body) == 8 + self.entry_count * self.entry_size
+
+    def append_record(self, raw=None):
+        """Appends a record, filled with zeros unless raw is given, and returns its index"""
+        size = self.entry_size
+        raw = bytes(size) if raw is None else bytes(raw)
+        if len(raw) != size:
+            raise ValueError(f"Attribute records are {size} bytes, got {len(raw)}")
+        self._check_resizable()
+
+        end = len(self.body)
+        if self._buffer is None or end + size > len(self._buffer):
+            # grow the storage geometrically, so appending n records copies O(n) bytes in total
+            buffer = bytearray(max(2 * end, end + size))
+            buffer[:end] = self.body
+            self._buffer = buffer
+        self._buffer[end:end + size] = raw
+        self._set_records(self.entry_count + 1)
+        return self.entry_count - 1
+
+    def compact(self, keep):
+        """Only keeps the records at the indexes in keep, in that order"""
+        self._buffer = bytearray(self.compacted_body(keep))
+        self._set_records(len(keep))
+
+    def compacted_body(self, keep):
+        """Returns the body of the section with only the records at the indexes in keep, without changing the section"""
+        self._check_resizable()
+        size = self.entry_size
+        records = self.records
+        return self.codec.u32_pair.pack(len(keep), size) + b''.join(records[i * size:(i + 1) * size] for i in keep)
+
+    def _check_resizable(self):
+        if not self.resizable:
+            raise ValueError("ATR1 sections with data after the records can't be resized")
+
+    def _set_records(self, entry_count):
+        # the views only cover the used part of the storage, views handed out before stay valid but no longer change
+        self.codec.u32_pair.pack_into(self._buffer, 0, entry_count, self.entry_size)
+        self.entry_count = entry_count
+        self.table_size = 8 + entry_count * self.entry_size
+        self.body = memoryview(self._buffer)[:self.table_size]
+        self.records = self.body[8:]
+        self.dirty = True
+
+    def __getstate__(self):
+        # memoryviews can't be pickled, the copy keeps the bytes of the body and views them again
+        state = self.__dict__.copy()
+        del state['records']
+        if self._buffer is not None:
+            state['body'] = None
+        else:
+            state['body'] = bytearray(self.body) if self.dirty else bytes(self.body)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.body = memoryview(self._buffer)[:self.table_size] if self._buffer is not None else memoryview(self.body)
+        self.records = self.body[8:8 + self.entry_count * self.entry_size]
+
+    def get_record(self, index):
+        """Returns a memoryview of the bytes of the record at index"""
+        offset = range(self.entry_count)[index] * self.entry_size
+        return self.records[offset:offset + self.entry_size]
+
+    def get(self, index):
+        """Returns an AttributeRecord for the record at index, whose fields can be read and set through the layout"""
+        if self.layout is not None and self.layout.size > self.entry_size:
+            raise ValueError(f"Attribute layout of {self.layout.size} bytes doesn't fit in records of {self.entry_size} bytes")
+        return AttributeRecord(self, range(self.entry_count)[index])
+
+    def __len__(self):
+        return self.entry_count
+
+    def __getitem__(self, index):
+        return self.get(index)
+
+    def __iter__(self):
+        for i in range(self.entry_count):
+            yield self.get(i)
+
+    def __str__(self):
+        return f"(magic: {self.magic}, entry_count: {self.entry_count}, entry_size: {self.entry_size}, layout: {self.layout})"
+
 class MSBTLabel:
+    __slots__ = ('data', 'length', 'string_index')
+
     def __init__(self, value, length, str_index):
         self.data = value
         self.length = length
-        self.string_index = int.from_bytes(str_index, 'little')
+        self.string_index = str_index if isinstance(str_index, int) else int.from_bytes(str_index, 'little')
 
     def __str__(self):
         return (f"(length: {self.length}, data: {self.data}, string_index: {self.string_index})")
@@ -156,6 +823,8 @@ class MSBTLabel:
         return self.__str__()
 
 class TextComponent:
+    __slots__ = ('type', 'data')
+
     def __init__(self, data, type='text'):
         self.type = type
         self.data = data
@@ -166,30 +835,70 @@ class TextComponent:
         return self.__str__()
 
 class TextCommand:
-    def __init__(self, msbt_data, start_offset):
+    """
+    A text command (tag) in a text, such as a color change or a variable.
+
+        tag: 0x0E, or 0xF for data-less tags
+        group, type: The group and type of the command
+        payload: The raw bytes of the command's data
+
+    magic, data and data_size are views of tag and payload as they were before, as a hex string and '0x...' string.
+    """
+    __slots__ = ('start_offset', 'end_offset', 'tag', 'group', 'type', 'payload')
+
+    def __init__(self, msbt_data, start_offset, codec=DEFAULT_CODEC):
         self.start_offset = start_offset
         offset = start_offset
         
-        unpacked = struct.unpack_from('<HHHH', msbt_data, offset)
+        self.tag, self.group, self.type, data_size = codec.command.unpack_from(msbt_data, offset)
+        offset += codec.command.size
 
-        self.magic = hex(unpacked[0]) #0xe of 0xf for data-less tags
-        self.group = unpacked[1]
-        self.type = unpacked[2]
-        self.data_size = unpacked[3]
-        offset += 8
+        self.payload = bytes(msbt_data[offset:offset + data_size])
+        if len(self.payload) != data_size:
+            raise ValueError(f"Text command at offset {start_offset} is cut off")
 
-        self.data, = struct.unpack_from(f'<{self.data_size}s', msbt_data, offset)
+        offset += data_size
+        self.end_offset = offset # so the text parser would know the offset after the tag
 
-        if self.data: # to deal with empty text commands
-            self.data = '0x' + self.data.hex()
-        else:
-            self.data = None
+    @property
+    def magic(self):
+        return hex(self.tag)
 
-        offset += self.data_size
-        self.end_offset = offset # so the text parser would know the offset after the tag
+    @magic.setter
+    def magic(self, magic):
+        self.tag = int(magic, 16)
+
+    @property
+    def data(self):
+        if self.payload: # to deal with empty text commands
+            return '0x' + self.payload.hex()
+        return None
+
+    @data.setter
+    def data(self, data):
+        self.payload = bytes.fromhex(data.replace('0x', '')) if data else b''
+
+    @property
+    def data_size(self):
+        return len(self.payload)
+
+    @data_size.setter
+    def data_size(self, data_size):
+        self.payload = self.payload[:data_size].ljust(data_size, b'\x00')
+
+    def get_state(self):
+        """Returns the text command as a tuple, which can be restored with from_state"""
+        return (self.tag, self.group, self.type, self.payload, self.start_offset, self.end_offset)
+
+    @classmethod
+    def from_state(cls, state):
+        """Creates a TextCommand from a tuple returned by get_state"""
+        command = cls.__new__(cls)
+        command.tag, command.group, command.type, command.payload, command.start_offset, command.end_offset = state
+        return command
 
     def __str__(self):
         return (f"(type: {self.group}:{self.type}, data: {self.data})")
 
     def __repr__(self): # this needs to be here for print to work if in a list 
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
@@ -0,0 +1,96 @@
+import re
+import struct
+
+# byte order marks, as read in little endian like MSBTHeader.byte_order
+LITTLE_ENDIAN = 0xFEFF
+BIG_ENDIAN = 0xFFFE
+
+# values of the encoding byte in the msbt header
+UTF8 = 0
+UTF16 = 1
+UTF32 = 2
+
+# size of a code unit and the struct format of a code unit for each encoding
+_UNITS = {
+    UTF8: (1, 'B'),
+    UTF16: (2, 'H'),
+    UTF32: (4, 'I'),
+}
+
+def _text_run_pattern(encoding, little_endian):
+    """Returns a regex that matches a run of code units up to the next tag header (0x0E/0x0F) or the terminator"""
+    if encoding == UTF8:
+        return re.compile(rb'[^\x00\x0E\x0F]*')
+    if encoding == UTF16:
+        if little_endian:
+            return re.compile(rb'(?:[^\x00\x0E\x0F].|[\x00\x0E\x0F][^\x00])*', re.DOTALL)
+        return re.compile(rb'(?:[^\x00].|\x00[^\x00\x0E\x0F])*', re.DOTALL)
+    if little_endian:
+        return re.compile(rb'(?:(?![\x00\x0E\x0F]\x00\x00\x00)....)*', re.DOTALL)
+    return re.compile(rb'(?:(?!\x00\x00\x00[\x00\x0E\x0F])....)*', re.DOTALL)
+
+class Codec:
+    """
+    Precompiled structs and text encoding for one byte order and text encoding, shared by the reader and the writer.
+
+        byte_order: LITTLE_ENDIAN or BIG_ENDIAN
+        encoding: UTF8, UTF16 or UTF32, as stored in the header
+    """
+    def __init__(self, byte_order=LITTLE_ENDIAN, encoding=UTF16):
+        if byte_order not in (LITTLE_ENDIAN, BIG_ENDIAN):
+            raise ValueError(f"Invalid MSBT byte order mark: {byte_order:#06x}")
+        if encoding not in _UNITS:
+            raise ValueError(f"Unsupported MSBT text encoding: {encoding}")
+
+        self.byte_order = byte_order
+        self.encoding = encoding
+        little_endian = byte_order == LITTLE_ENDIAN
+        self.endian = '<' if little_endian else '>'
+
+        # structs of the file structure
+        self.u16 = struct.Struct(self.endian + 'H')
+        self.u32 = struct.Struct(self.endian + 'I')
+        self.header = struct.Struct(self.endian + '8s2sHBBHHI10x') # magic, bom, encoding, version, section count, file size
+        self.section_header = struct.Struct(self.endian + '4sI8x') # signature, table size
+        self.u32_pair = struct.Struct(self.endian + 'II') # label string count and offset, attribute count and size
+
+        # texts
+        self.unit_size, unit_format = _UNITS[encoding]
+        if encoding == UTF8:
+            self.text_encoding = 'utf-8'
+        else:
+            self.text_encoding = ('utf-16' if encoding == UTF16 else 'utf-32') + ('-le' if little_endian else '-be')
+        self.terminator = b'\x00' * self.unit_size
+        self.text_run = _text_run_pattern(encoding, little_endian)
+        self.command = struct.Struct(self.endian + unit_format + 'HHH') # tag, group, type, data size
+        # offset of the low byte of a code unit, where 0x0E/0x0F tag headers are told apart from the terminator
+        self.low_byte = 0 if little_endian else self.unit_size - 1
+
+    def decode(self, data):
+        """Decodes text bytes, lone surrogates are kept"""
+        return str(data, self.text_encoding, 'surrogatepass')
+
+    def encode(self, text):
+        """Encodes text to bytes, lone surrogates are kept"""
+        return text.encode(self.text_encoding, 'surrogatepass')
+
+    def __reduce__(self):
+        # the structs and patterns can't be pickled, so unpickling gets the shared codec again
+        return get_codec, (self.byte_order, self.encoding)
+
+    def __str__(self):
+        return f"(byte_order: {self.byte_order:#06x}, encoding: {self.text_encoding})"
+    def __repr__(self):
+        return self.__str__()
+
+_codecs = {}
+
+def get_codec(byte_order=LITTLE_ENDIAN, encoding=UTF16):
+    """Returns the shared Codec for a byte order and encoding"""
+    codec = _codecs.get((byte_order, encoding))
+    if codec is None:
+        codec = _codecs[(byte_order, encoding)] = Codec(byte_order, encoding)
+    return codec
+
+# the codec of files from the Switch, which is also the default when creating files
+DEFAULT_CODEC = get_codec()
@@ -0,0 +1,109 @@
+import hashlib
+
+from .msbt import MSBTFile
+from .msbt_write import encode_text_string
+
+def entry_bytes(msbt, index):
+    """Returns the encoded bytes of the text at index, from the file data unless it was decoded or changed"""
+    txt2 = msbt.TXT2
+    if txt2.matches_raw(index):
+        return txt2.get_raw(index)
+    return encode_text_string(txt2.texts[index], txt2.codec)
+
+def entry_digests(msbt):
+    """Returns a map between the labels of a file and a digest of the encoded bytes of their text"""
+    return {
+        label.data: hashlib.blake2b(entry_bytes(msbt, label.string_index), digest_size=16).digest()
+        for label in msbt.LBL1.labels
+    }
+
+class ChangeSet:
+    """
+    The differences between two versions of a msbt file, by label.
+
+        added: Labels that are only in the new file
+        removed: Labels that are only in the old file
+        changed: Labels whose text is different in the new file
+        unchanged: The amount of labels whose text is the same
+
+    Texts are compared by the hash of their encoded bytes, so texts that only differ in their text commands are changed too.
+    """
+    def __init__(self, added=(), removed=(), changed=(), unchanged=0):
+        self.added = set(added)
+        self.removed = set(removed)
+        self.changed = set(changed)
+        self.unchanged = unchanged
+
+    def to_dict(self):
+        """Returns the change set as a dict of sorted lists, which can be saved as json"""
+        return {'added': sorted(self.added), 'removed': sorted(self.removed), 'changed': sorted(self.changed), 'unchanged': self.unchanged}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a ChangeSet from a dict returned by to_dict"""
+        return cls(data['added'], data['removed'], data['changed'], data['unchanged'])
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f"(added: {len(self.added)}, removed: {len(self.removed)}, changed: {len(self.changed)}, unchanged: {self.unchanged})"
+    def __repr__(self):
+        return self.__str__()
+
+def diff(old, new):
+    """
+    Compares two versions of a msbt file, such as the files of two versions of a game, and returns a ChangeSet.
+
+        old, new: MSBTFiles
+
+    Both files should have the same byte order and text encoding, otherwise every text shows up as changed.
+    No text is decoded, so files opened in lazy mode stay cheap to compare.
+    """
+    old_digests = entry_digests(old)
+    changes = ChangeSet()
+    for label, digest in entry_digests(new).items():
+        old_digest = old_digests.pop(label, None)
+        if old_digest is None:
+            changes.added.add(label)
+        elif old_digest != digest:
+            changes.changed.add(label)
+        else:
+            changes.unchanged += 1
+    changes.removed.update(old_digests)
+    return changes
+
+def port(changes, translation, new, keep_changed=False):
+    """
+    Ports the texts of a translation of an old version of a file to the new version, returning (msbt, labels to translate).
+
+        changes: The ChangeSet between the old and the new version, from diff
+        translation: A MSBTFile of the translated old version
+        new: A MSBTFile of the new version
+        keep_changed: Also keep the translated text of labels whose text changed, instead of the text of the new version
+
+    The returned MSBTFile has the labels, attributes and other sections of the new version. Labels that are unchanged
+    get the text of the translation, copied as encoded bytes without decoding it when both files have the same byte
+    order and encoding. The returned list contains the labels that still need to be translated: added and changed
+    labels, and labels that are missing from the translation.
+    """
+    msbt = MSBTFile.from_bytes(new.to_bytes(), lazy=True, attribute_layout=new.attribute_layout, filepath=new.filepath)
+    same_codec = translation.header.codec is msbt.header.codec
+    translation.build_label_index()
+
+    untranslated = []
+    for label in msbt.LBL1.labels:
+        name = label.data
+        is_new = name in changes.added or name in changes.changed
+        index = translation.LBL1.find_label(name) if not is_new or keep_changed else None
+        if index is None:
+            untranslated.append(name)
+            continue
+        if is_new:
+            untranslated.append(name)
+
+        if same_codec:
+            msbt.TXT2.set_raw(label.string_index, entry_bytes(translation, index))
+        else:
+            msbt.TXT2.texts[label.string_index] = list(translation.TXT2.texts[index])
+    return msbt, untranslated
@@ -0,0 +1,161 @@
+import threading
+import time
+import tracemalloc
+
+# callbacks that receive an Event for every measured step, and the ones that also want allocation stats.
+# registering replaces the tuples under the lock, so measurements can read them from any thread without locking
+_hooks = ()
+_allocation_hooks = ()
+_started_tracemalloc = False
+_lock = threading.Lock()
+
+# the measurements that are currently running in each thread, outermost first
+_local = threading.local()
+
+def _active():
+    active = getattr(_local, 'active', None)
+    if active is None:
+        active = _local.active = []
+    return active
+
+class Event:
+    """
+    A measurement of one step of reading or writing a msbt file, passed to instrumentation hooks.
+
+        operation: 'parse' when reading a file, 'layout' and 'pack' for the two passes of MSBTWriter, 'write' for writing the output file
+        section: The signature of the section, 'header' or 'file' for the whole operation
+        filepath: The path of the file
+        seconds: The time the step took
+        bytes: The amount of bytes read or written, None if not known
+        entries: The amount of labels or texts in the section, None if not known
+        allocated: The net amount of memory allocated during the step, None unless a hook asked for allocation stats
+        peak: The peak amount of memory allocated during the step, None unless a hook asked for allocation stats
+    """
+    __slots__ = ('operation', 'section', 'filepath', 'seconds', 'bytes', 'entries', 'allocated', 'peak')
+
+    def __init__(self, operation, section, filepath=None):
+        self.operation = operation
+        self.section = section
+        self.filepath = filepath
+        self.seconds = 0.0
+        self.bytes = None
+        self.entries = None
+        self.allocated = None
+        self.peak = None
+
+    def __str__(self):
+        return (f"({self.operation} {self.section}: seconds: {self.seconds:.6f}, bytes: {self.bytes}, entries: {self.entries}, "
+                f"allocated: {self.allocated}, peak: {self.peak})")
+    def __repr__(self):
+        return self.__str__()
+
+def add_hook(callback, allocations=False):
+    """
+    Registers a function that is called with an Event for every measured step of reading and writing msbt files.
+
+        allocations: Also measure memory allocations with tracemalloc, which slows down everything while the hook is registered.
+            Allocations are counted for the whole process, so steps that run in other threads at the same time are included.
+
+    Hooks can be added and removed from any thread, and are called in the thread that ran the step.
+    """
+    global _hooks, _allocation_hooks, _started_tracemalloc
+    with _lock:
+        _hooks += (callback,)
+        if allocations:
+            _allocation_hooks += (callback,)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracemalloc = True
+
+def remove_hook(callback):
+    """Unregisters a function registered with add_hook, raising a ValueError if it isn't registered"""
+    global _hooks, _allocation_hooks, _started_tracemalloc
+    with _lock:
+        _hooks = _without(_hooks, callback)
+        if callback in _allocation_hooks:
+            _allocation_hooks = _without(_allocation_hooks, callback)
+            if not _allocation_hooks and _started_tracemalloc:
+                tracemalloc.stop()
+                _started_tracemalloc = False
+
+def _without(hooks, callback):
+    """Returns hooks without the first occurrence of callback"""
+    hooks = list(hooks)
+    hooks.remove(callback)
+    return tuple(hooks)
+
+class instrumented:
+    """
+    A context manager that registers a hook while it's active.
+
+        with instrumented(events.append):
+            msbt = MSBTFile("Attachment.msbt")
+    """
+    def __init__(self, callback, allocations=False):
+        self.callback = callback
+        self.allocations = allocations
+
+    def __enter__(self):
+        add_hook(self.callback, self.allocations)
+        return self.callback
+
+    def __exit__(self, *exc):
+        remove_hook(self.callback)
+        return False
+
+class _Measurement:
+    def __init__(self, operation, section, filepath):
+        self.event = Event(operation, section, filepath)
+
+    def __enter__(self):
+        if _allocation_hooks:
+            # tracemalloc only has one peak, so keep the peak of the outer measurements before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in _active():
+                if hasattr(outer, '_peak'):
+                    outer._peak = max(outer._peak, peak)
+            tracemalloc.reset_peak()
+            self._memory = self._peak = current
+        _active().append(self)
+        self._start = time.perf_counter()
+        return self.event
+
+    def __exit__(self, exc_type, exc, tb):
+        event = self.event
+        event.seconds = time.perf_counter() - self._start
+        _active().remove(self)
+        if _allocation_hooks and hasattr(self, '_memory'):
+            current, peak = tracemalloc.get_traced_memory()
+            event.allocated = current - self._memory
+            event.peak = max(self._peak, peak) - self._memory
+
+        # failed steps aren't reported
+        if exc_type is None:
+            for callback in _hooks:
+                callback(event)
+        return False
+
+class _NullEvent:
+    """Stands in for an Event when nothing is listening, ignoring everything that's set on it"""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+class _NullMeasurement:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NULL_EVENT
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_EVENT = _NullEvent()
+_NULL_MEASUREMENT = _NullMeasurement()
+
+def measure(operation, section, filepath=None):
+    """Returns a context manager that measures a step and reports it to the hooks, or does nothing if there are no hooks"""
+    if not _hooks:
+        return _NULL_MEASUREMENT
+    return _Measurement(operation, section, filepath)
@@ -0,0 +1,60 @@
+import re
+
+# the regex parser is private to the re module and can change between python versions, without it there are no literals
+try:
+    from re import _constants, _parser
+    _REPEATS = (_constants.MAX_REPEAT, _constants.MIN_REPEAT, _constants.POSSESSIVE_REPEAT)
+except (ImportError, AttributeError):
+    _parser = None
+
+def _sequence_literals(parsed, literals, flags):
+    """
+    Appends the literal strings that every match of a parsed regex sequence contains to literals.
+
+        flags: The flags of the whole regex, literals in groups that are case-insensitive when the regex isn't are left out
+    """
+    current = []
+    for op, av in parsed:
+        if op is _constants.LITERAL:
+            current.append(chr(av))
+            continue
+        if current:
+            literals.append(''.join(current))
+            current = []
+        if op is _constants.SUBPATTERN:
+            # inline flags such as (?i:...) can match other cases than the literals, callers only check the flags of the regex
+            _, add_flags, _, subpattern = av
+            if not add_flags & _constants.SRE_FLAG_IGNORECASE or flags & _constants.SRE_FLAG_IGNORECASE:
+                _sequence_literals(subpattern, literals, flags)
+        elif op is _constants.ATOMIC_GROUP:
+            _sequence_literals(av, literals, flags)
+        elif op in _REPEATS and av[0] >= 1:
+            _sequence_literals(av[2], literals, flags)
+        # anything else, such as character classes, alternations and assertions, can't be required
+    if current:
+        literals.append(''.join(current))
+
+def required_literals(pattern, flags=0):
+    """
+    Returns the literal strings that every match of a regex contains, longest first.
+
+        pattern: A regex string or compiled regex
+
+    Used to find candidates for a regex with a substring search before running the regex.
+    Alternations and optional parts don't give any literals, so the result can be empty. It's also empty when the
+    private regex parser of the re module isn't available or parses differently in this python version.
+    """
+    if isinstance(pattern, re.Pattern):
+        pattern, flags = pattern.pattern, pattern.flags
+    if isinstance(pattern, bytes):
+        raise TypeError("required_literals only supports str patterns")
+    if _parser is None:
+        return []
+    literals = []
+    try:
+        parsed = _parser.parse(pattern, flags)
+        # flags at the start of the regex such as (?i) apply to all of it
+        _sequence_literals(parsed, literals, parsed.state.flags)
+    except (AttributeError, TypeError, ValueError):
+        return []
+    return sorted(set(literals), key=len, reverse=True)
@@ -1,8 +1,42 @@
-import struct
+import logging
+import os
+import re
+from collections.abc import MutableMapping
 from .classes import *
+from .codec import LITTLE_ENDIAN, BIG_ENDIAN, UTF16, get_codec
+from .literals import required_literals
+from .msbt_write import MSBTWriter
+from .parallel import decode_texts
+from . import instrument
 
-LITTLE_ENDIAN = 0xFFFE
-BIG_ENDIAN = 0xFEFF
+logger = logging.getLogger(__name__)
+
+# sections with one fixed size entry per text, which are resized along with TXT2 when entries are added or removed
+ENTRY_SECTIONS = {'TSY1': 4}
+
+class WritePlan:
+    """
+    The contents of a MSBTFile as they are written, with added and removed entries applied to a copy of the layout.
+
+        labels: The LBL1 labels in the order of the hash table
+        bucket_counts: The amount of labels in each LBL1 hash bucket
+        text_indexes: A map between the text indexes in the file and in the written file, None if texts aren't renumbered
+        texts: The indexes of the TXT2 texts that are written, in order
+        attributes: The body of the ATR1 section
+        sections: A map between the sections in ENTRY_SECTIONS that are resized and their (table_size, bytes)
+    """
+    def __init__(self, labels=(), bucket_counts=(), text_indexes=None, texts=(), attributes=None, sections=None):
+        self.labels = labels
+        self.bucket_counts = bucket_counts
+        self.text_indexes = text_indexes
+        self.texts = texts
+        self.attributes = attributes
+        self.sections = sections if sections is not None else {}
+
+    def __str__(self):
+        return f"(labels: {len(self.labels)}, buckets: {len(self.bucket_counts)}, texts: {len(self.texts)}, renumbered: {self.text_indexes is not None})"
+    def __repr__(self):
+        return self.__str__()
 
 class MSBTFile:
     """
@@ -16,96 +50,403 @@ class MSBTFile:
         ATR1: The ATR1Section if it exists in the file
 
         text_labels: A map between labels and texts that are found in the file.
+
+    attribute_layout (optional): An AttributeLayout for typed access to the ATR1 attributes, see get_attributes.
+    workers (optional): Decode the texts on this many workers when not in lazy mode, for files with a lot of texts.
+        See pymsbt.parallel.decode_texts, texts are decoded one by one in this thread by default.
+
+    When lazy is True, only the header, the section table and the TXT2 offset table are read up front.
+    Labels and texts are then decoded the first time they are accessed and memoized.
     """
-    def __init__(self, filepath):
+    def __init__(self, filepath, lazy=False, attribute_layout=None, workers=None):
         self.filepath = filepath
+        self.lazy = lazy
+        self.attribute_layout = attribute_layout
+        self.workers = workers
 
         # load file
         with open(filepath, 'rb') as f:
             self.data = f.read()
 
-        # initialize class attributes
-        self.header = MSBTHeader(self.data)
-        self.sections = []
+        self._parse()
 
-        self.LBL1 = None
-        self.TXT2 = None
-        self.ATR1 = None
-        
-        self.text_labels = {}
+    @classmethod
+    def from_bytes(cls, data, lazy=False, attribute_layout=None, filepath=None, workers=None):
+        """
+        Creates a MSBTFile from a bytes-like object such as bytes, a bytearray or a memoryview, without copying it.
 
-        #self.attributes = []
+            filepath (optional): The path the file is written to by MSBTWriter if no other path is given
 
-        # start the process by parsing sections
-        self._parse_sections()
+        The data is read in place, so a bytearray or memoryview must not be changed while the MSBTFile is in use.
+        """
+        if isinstance(data, memoryview) and (data.format != 'B' or data.ndim != 1):
+            data = data.cast('B')
+        return cls._from_data(filepath, data, lazy, attribute_layout=attribute_layout, workers=workers)
 
-        # create label and text map
-        for label in self.LBL1.labels:
-            self.text_labels[label.data] = self.TXT2.texts[label.string_index]
+    @classmethod
+    def from_file(cls, file, lazy=False, attribute_layout=None, workers=None):
+        """
+        Creates a MSBTFile from the rest of the contents of a binary file-like object, such as a socket file or io.BytesIO.
+
+            The name of the file is kept as filepath only if it's the path of an existing file, so a MSBTFile read from
+            a stream such as sys.stdin.buffer isn't written to a file named after it by MSBTWriter.
+        """
+        name = getattr(file, 'name', None)
+        filepath = name if isinstance(name, (str, os.PathLike)) and os.path.isfile(name) else None
+        return cls._from_data(filepath, file.read(), lazy, attribute_layout=attribute_layout, workers=workers)
+
+    @classmethod
+    def new(cls, byte_order=LITTLE_ENDIAN, encoding=UTF16, version=3, bucket_count=DEFAULT_BUCKET_COUNT):
+        """
+        Creates an empty MSBTFile with LBL1 and TXT2 sections, entries can then be added with add_entry.
 
-    def _parse_sections(self):
+            byte_order: LITTLE_ENDIAN or BIG_ENDIAN
+            encoding: UTF8, UTF16 or UTF32 from pymsbt.codec
+            bucket_count: The amount of LBL1 hash buckets
+        """
+        codec = get_codec(byte_order, encoding)
+        labels = codec.u32.pack(bucket_count) + codec.u32_pair.pack(0, 4 + 8 * bucket_count) * bucket_count
+        sections = b''
+        for signature, body in ((b'LBL1', labels), (b'TXT2', codec.u32.pack(0))):
+            sections += codec.section_header.pack(signature, len(body)) + body + b'\xAB' * ((16 - len(body) % 16) % 16)
+        header = codec.header.pack(b'MsgStdBn', byte_order.to_bytes(2, 'little'), 0, encoding, version, 2, 0, 0x20 + len(sections))
+        return cls.from_bytes(header + sections)
+
+    @classmethod
+    def _from_data(cls, filepath, data, lazy=False, cached=None, attribute_layout=None, workers=None):
+        """Creates a MSBTFile from file data that has already been read, see _parse for cached"""
+        msbt = cls.__new__(cls)
+        msbt.filepath = filepath
+        msbt.lazy = lazy
+        msbt.attribute_layout = attribute_layout
+        msbt.workers = workers
+        msbt.data = data
+        msbt._parse(cached)
+        return msbt
+
+    def _parse(self, cached=None):
+        """
+        Parses the file data. Ran automatically upon creation of a MSBTFile class
+
+            cached (optional): A map between section signatures and section states from get_state, used instead of parsing those sections
+        """
+        with instrument.measure('parse', 'file', self.filepath) as event:
+            # initialize class attributes
+            with instrument.measure('parse', 'header', self.filepath) as header_event:
+                self.header = MSBTHeader(self.data)
+                header_event.bytes = 0x20
+            self.sections = []
+
+            self.LBL1 = None
+            self.TXT2 = None
+            self.ATR1 = None
+            
+            self.text_labels = {}
+            self._orphaned = set() # indexes of texts whose label was removed
+            self._entries_changed = False
+
+            # start the process by parsing sections
+            self._parse_sections(cached)
+            if not self.lazy and self.workers is not None and self.TXT2 is not None:
+                decode_texts(self.TXT2, self.workers)
+
+            # create label and text map
+            if self.lazy:
+                self.text_labels = TextLabels(self)
+            else:
+                for label in self.LBL1.labels:
+                    self.text_labels[label.data] = self.TXT2.texts[label.string_index]
+
+            event.bytes = len(self.data)
+            event.entries = self.TXT2.offset_count if self.TXT2 else 0
+
+    def _parse_sections(self, cached=None):
         """Parses the MSBT file's sections such as LBL1 and TXT2. Ran automatically upon creation of a MSBTFile class"""
+        cached = cached or {}
+        codec = self.header.codec
         offset = 0x20 # start after msbt header
 
         for _ in range(self.header.section_count):
             # section header contains signature and table size
-            section = MSBTSection(self.data, offset)
+            section = MSBTSection(self.data, offset, codec)
             next_offset = offset + (section.table_size + 16 + (16 - (section.table_size % 16)) % 16) # store next section offset for later use
 
-            # Labels
-            if section.signature == "LBL1":
-                print("Parsing Labels section...")
-                self.LBL1 = LBL1Section(self.data, offset, section.table_size)
+            with instrument.measure('parse', section.signature, self.filepath) as event:
+                event.bytes = section.table_size
 
-            # Attributes
-            #elif section.signature == "ATR1":
-            #    print("Parsing Attributes section...")
-            #    self.parse_attributes_section(offset, section.table_size)
+                # Labels
+                if section.signature == "LBL1":
+                    if "LBL1" in cached:
+                        self.LBL1 = LBL1Section.from_state(self.data, offset, cached["LBL1"], codec)
+                    else:
+                        logger.debug("Parsing Labels section...")
+                        self.LBL1 = LBL1Section(self.data, offset, section.table_size, self.lazy, codec)
+                    if self.LBL1._labels is not None:
+                        event.entries = len(self.LBL1._labels)
 
-            # Text
-            elif section.signature == "TXT2":
-                print("Parsing Text section...")
-                self.TXT2 = TXT2Section(self.data, offset, section.table_size)
+                # Attributes
+                elif section.signature == "ATR1":
+                    logger.debug("Parsing Attributes section...")
+                    self.ATR1 = ATR1Section(self.data, offset, section.table_size, self.attribute_layout, codec)
+                    event.entries = self.ATR1.entry_count
 
-            else:
-                print(f"Unknown section: {section.signature}")
-                section.storeBytes(self.data, offset, next_offset)
+                # Text
+                elif section.signature == "TXT2":
+                    if "TXT2" in cached:
+                        self.TXT2 = TXT2Section.from_state(self.data, offset, cached["TXT2"], codec)
+                    else:
+                        logger.debug("Parsing Text section...")
+                        # texts are decoded on the workers once every section is parsed
+                        self.TXT2 = TXT2Section(self.data, offset, section.table_size, self.lazy or self.workers is not None, codec)
+                    event.entries = self.TXT2.offset_count
+
+                else:
+                    logger.debug("Unknown section: %s", section.signature)
+                    section.storeBytes(self.data, offset, next_offset)
 
             self.sections.append(section)
             
             # move to next section (aligned to 16 bytes)
             offset = next_offset
     
-    #def parse_attributes_section(self, section_offset, table_size):
-    #    offset = section_offset + 16 # skip ATR1 section header
-    #
-    #    attr_header_data = struct.unpack_from("<II", self.data, offset)
-    #    attr_count, attr_data_size = attr_header_data
-    # 
-    #    offset += 8
-    #    
-    #    for i in range(attr_count):
-    #        # read each attribute entry (4b offset from beginning)
-    #        attr_offset, = struct.unpack_from("<I", self.data, offset)
-    #        print(attr_offset)
-    #        self.attributes.append(attr_offset)
-    #        offset += 4
-
     def get_text_index(self, lbl):
-        """Returns a index in TXT2.texts that corresponds to the label"""
-        label_obj = None
-        for label in self.LBL1.labels:
-            if label.data == lbl:
-                label_obj = label
-                break
-        
-        return label_obj.string_index
+        """Returns a index in TXT2.texts that corresponds to the label, raising a KeyError if the label doesn't exist"""
+        index = self.LBL1.find_label(lbl)
+        if index is None:
+            raise KeyError(lbl)
+        return index
+
+    def build_label_index(self):
+        """Builds a dict index of every label, for files that a lot of lookups are done on. Rebuild it after changing labels."""
+        self.LBL1.build_index()
+
+    def get_text(self, label):
+        """Returns the text in TXT2.texts that corresponds to the label, decoding it if it hasn't been yet."""
+        return self.TXT2.get_text(self.get_text_index(label))
+
+    def get_texts(self, labels):
+        """Returns a list of the texts that correspond to each label in labels."""
+        return [self.TXT2.get_text(self.get_text_index(label)) for label in labels]
     
+    def get_attributes(self, label):
+        """Returns the AttributeRecord in ATR1 that corresponds to the label, fields can be read and set through ATR1.layout"""
+        return self.ATR1.get(self.get_text_index(label))
+
     def set_text(self, label, text):
         """Sets a text value in TXT2.texts that corresponds to the label."""
         index = self.get_text_index(label)
         self.TXT2.texts[index] = text
 
+    def set_texts(self, texts):
+        """Sets the text values in TXT2.texts from a map between labels and texts."""
+        # look up every label first so that nothing is changed if one of them doesn't exist
+        indexes = [(self.get_text_index(label), text) for label, text in texts.items()]
+        for index, text in indexes:
+            self.TXT2.texts[index] = text
+
+    def add_entry(self, label, text, attributes=None):
+        """
+        Adds a new label with a new text and returns the index of the text.
+
+            label: The new label, a ValueError is raised if it already exists
+            text: A list of TextComponents
+            attributes (optional): The raw bytes of the ATR1 record of the entry, filled with zeros if omitted
+
+        The LBL1 hash table is rebuilt when writing, see write_plan.
+        """
+        if self.LBL1 is None or self.TXT2 is None:
+            raise ValueError("Entries can only be added to files with LBL1 and TXT2 sections")
+        if self.LBL1.find_label(label) is not None:
+            raise ValueError(f"Label already exists: {label}")
+        if self.ATR1 is not None and not self.ATR1.resizable:
+            raise ValueError("ATR1 sections with data after the records can't be resized")
+
+        index = self.TXT2.append(text)
+        self.LBL1.add_label(label, index)
+        if self.ATR1 is not None:
+            self.ATR1.append_record(attributes)
+        if isinstance(self.text_labels, dict):
+            self.text_labels[label] = text
+        self._entries_changed = True
+        return index
+
+    def remove_entry(self, label):
+        """
+        Removes a label, raising a KeyError if it doesn't exist.
+
+            The text and attributes of the label are dropped when writing, unless another label still refers to the text.
+        """
+        if self.ATR1 is not None and not self.ATR1.resizable:
+            raise ValueError("ATR1 sections with data after the records can't be resized")
+        index = self.LBL1.remove_label(label)
+        self._orphaned.add(index)
+        if isinstance(self.text_labels, dict):
+            self.text_labels.pop(label, None)
+        self._entries_changed = True
+
+    def rename_label(self, label, new_label):
+        """Renames a label, keeping its text and attributes"""
+        if self.LBL1.find_label(new_label) is not None:
+            raise ValueError(f"Label already exists: {new_label}")
+        index = self.LBL1.remove_label(label)
+        self.LBL1.add_label(new_label, index)
+        if isinstance(self.text_labels, dict):
+            self.text_labels[new_label] = self.text_labels.pop(label)
+
+    def rebuild(self):
+        """
+        Applies added and removed entries to the sections.
+
+            Texts that no label refers to anymore are dropped along with their attributes, the remaining texts are
+            renumbered and the LBL1 hash table is rebuilt. Runs in linear time, files without added or removed
+            entries are left as they are. Not needed before writing, writers apply the changes to a copy, see write_plan.
+        """
+        if self._entries_changed:
+            keep, new_indexes = self._kept_texts()
+            if new_indexes is not None:
+                self.TXT2.compact(keep)
+                if self.ATR1 is not None:
+                    self.ATR1.compact([index for index in keep if index < self.ATR1.entry_count])
+                for label in self.LBL1.labels:
+                    label.string_index = new_indexes[label.string_index]
+                if self.LBL1.index is not None:
+                    self.LBL1.build_index()
+            for section, (table_size, data) in self._resized_entry_sections(keep).items():
+                section.table_size = table_size
+                section.bytes = data
+            self._orphaned.clear()
+            self._entries_changed = False
+
+        if self.LBL1 is not None and self.LBL1.rehash_pending:
+            self.LBL1.rehash()
+
+    def write_plan(self):
+        """Returns the WritePlan of the file, with added and removed entries applied without changing the file"""
+        plan = WritePlan()
+        keep, plan.text_indexes = self._kept_texts() if self._entries_changed else (None, None)
+        if self.LBL1 is not None:
+            if self.LBL1.rehash_pending:
+                plan.labels, offset_table = self.LBL1.hashed_layout()
+            else:
+                plan.labels, offset_table = self.LBL1.labels, self.LBL1.offset_table
+            plan.bucket_counts = [str_count for str_count, _ in offset_table]
+        if self.TXT2 is not None:
+            plan.texts = keep if keep is not None else range(self.TXT2.offset_count)
+        if self.ATR1 is not None:
+            if plan.text_indexes is not None:
+                plan.attributes = self.ATR1.compacted_body([index for index in keep if index < self.ATR1.entry_count])
+            else:
+                plan.attributes = self.ATR1.body
+        if keep is not None:
+            plan.sections = self._resized_entry_sections(keep)
+        return plan
+
+    def _kept_texts(self):
+        """Returns the indexes of the texts that some label still refers to and a map to their new indexes, None if no text is dropped"""
+        referenced = {label.string_index for label in self.LBL1.labels}
+        dropped = {index for index in self._orphaned if index not in referenced}
+        keep = [index for index in range(self.TXT2.offset_count) if index not in dropped]
+        return keep, {old: new for new, old in enumerate(keep)} if dropped else None
+
+    def _resized_entry_sections(self, keep):
+        """Returns the (table_size, bytes) of the sections in ENTRY_SECTIONS with the entries at the indexes in keep, new texts get entries filled with zeros"""
+        codec = self.header.codec
+        resized = {}
+        for section in self.sections:
+            size = ENTRY_SECTIONS.get(section.signature)
+            if size is None:
+                continue
+            body = section.bytes[16:16 + section.table_size]
+            count = section.table_size // size
+            empty = bytes(size)
+            body = b''.join(body[i * size:(i + 1) * size] if i < count else empty for i in keep)
+            data = codec.section_header.pack(section.encoded_signature, len(body)) + body + b'\xAB' * ((16 - len(body) % 16) % 16)
+            resized[section] = (len(body), data)
+        return resized
+
+    def to_bytes(self, incremental=True):
+        """Returns the file in the MSBT format as bytes, see MSBTWriter for incremental"""
+        return bytes(MSBTWriter.build(self, incremental))
+
+    def write_to(self, target, offset=0, incremental=True):
+        """
+        Writes the file in the MSBT format to a binary stream or into a writable buffer, returning the amount of bytes written.
+
+            target: An object with a write method, such as an open file or a socket file, or a writable bytes-like object
+            offset: The offset in the buffer to write the file at, not used for streams
+
+        Nothing is written to disk, and buffers are filled in place without building the file separately first.
+        """
+        if hasattr(target, 'write'):
+            buffer = MSBTWriter.build(self, incremental)
+            target.write(buffer)
+            return len(buffer)
+        return MSBTWriter.build_into(self, target, offset, incremental)
+
+    def map_text(self, function):
+        """
+        Replaces the string of every text component with function(string), leaving text commands as they are.
+
+            function: A function that takes the string of a text component and returns the new string
+
+        Returns the list of labels whose text changed.
+        """
+        return self._map_runs(function)
+
+    def sub(self, pattern, repl, count=0, flags=0):
+        """
+        Replaces the matches of a regex in every text component like re.sub, leaving text commands as they are.
+
+            pattern: A regex string or compiled regex, matched against each text component separately
+            repl: A replacement string or function, see re.sub
+            count: The maximum amount of replacements in each text component, 0 replaces all of them
+
+        Texts that were never decoded are first checked for the longest literal of the regex in their original bytes,
+        so texts that can't match are skipped without being decoded. Returns the list of labels whose text changed.
+        """
+        regex = re.compile(pattern, flags)
+        return self._map_runs(lambda string: regex.sub(repl, string, count), self._raw_prefilter(regex))
+
+    def _raw_prefilter(self, regex):
+        """Returns a compiled bytes regex that the encoded text of every match of regex contains, or None if there isn't one"""
+        for literal in required_literals(regex):
+            # case-insensitive patterns can match other bytes than the literal, unless it has no letters with a case
+            if regex.flags & re.IGNORECASE and literal.lower() != literal.upper():
+                continue
+            return re.compile(re.escape(self.header.codec.encode(literal)))
+        return None
+
+    def _map_runs(self, function, prefilter=None):
+        """Runs function over the text components of every text, see map_text"""
+        texts = self.TXT2.texts
+        changed = []
+        done = set()
+
+        # texts are visited in label order, texts without labels aren't changed
+        for label in self.LBL1.labels:
+            index = label.string_index
+            if index in done:
+                continue # shared by several labels
+            done.add(index)
+
+            # texts that were never decoded are still the same as their bytes in the file
+            if prefilter is not None and self.TXT2.matches_raw(index) and prefilter.search(self.TXT2.get_raw(index)) is None:
+                continue
+
+            text = texts[index]
+            components = None
+            for position, component in enumerate(text):
+                if component.type == 'text':
+                    string = function(component.data)
+                    if string != component.data:
+                        if components is None:
+                            components = list(text)
+                        components[position] = TextComponent(string)
+            if components is not None:
+                texts[index] = components
+                changed.append(label.data)
+        return changed
+
     def __str__(self):
         return f"""
 header: {self.header}
@@ -117,4 +458,111 @@ TXT2: {self.TXT2}
 
 ATR1: {self.ATR1}
 
-    """
\ No newline at end of file
+    """
+
+def _read_source(source):
+    """Returns the data of a msbt file from a path, a file-like object or a bytes-like object"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    if hasattr(source, 'read'):
+        return source.read()
+    return source
+
+def _find_sections(data):
+    """Returns the codec of the file and the offsets of its LBL1 and TXT2 sections, None for sections that don't exist"""
+    header = MSBTHeader(data)
+    codec = header.codec
+    sections = {}
+    offset = 0x20 # start after msbt header
+    for _ in range(header.section_count):
+        signature, table_size = codec.section_header.unpack_from(data, offset)
+        sections.setdefault(signature, offset)
+        offset += table_size + 16 + (16 - (table_size % 16)) % 16
+    return codec, sections.get(b'LBL1'), sections.get(b'TXT2')
+
+def _iter_text_offsets(data, codec, lbl1_offset, txt2_offset):
+    """Yields (label, text offset) for every entry, in the order of the LBL1 hash table, reading straight from the tables"""
+    if txt2_offset is None:
+        return
+    txt2_start = txt2_offset + 16
+    u32 = codec.u32
+
+    if lbl1_offset is None:
+        # files without labels are read in text order
+        text_count, = u32.unpack_from(data, txt2_start)
+        for index in range(text_count):
+            yield None, txt2_start + u32.unpack_from(data, txt2_start + 4 + 4 * index)[0]
+        return
+
+    lbl1_start = lbl1_offset + 16
+    bucket_count, = u32.unpack_from(data, lbl1_start)
+    for bucket in range(bucket_count):
+        str_count, str_offset = codec.u32_pair.unpack_from(data, lbl1_start + 4 + 8 * bucket)
+        offset = lbl1_start + str_offset
+        for _ in range(str_count):
+            str_len = data[offset]
+            label = str(data[offset + 1:offset + 1 + str_len], 'ascii')
+            index, = u32.unpack_from(data, offset + 1 + str_len)
+            offset += 5 + str_len
+
+            yield label, txt2_start + u32.unpack_from(data, txt2_start + 4 + 4 * index)[0]
+
+def iter_entries(source):
+    """
+    Yields a (label, text) pair for every entry in a msbt file, in the order of the LBL1 hash table.
+
+        source: A path, a file-like object or a bytes-like object containing the file
+
+    Entries are decoded one at a time straight from the LBL1 and TXT2 tables without creating a MSBTFile,
+    so memory use doesn't grow with the amount of entries and stopping early skips decoding the rest of the file.
+    """
+    data = _read_source(source)
+    codec, lbl1_offset, txt2_offset = _find_sections(data)
+    for label, text_offset in _iter_text_offsets(data, codec, lbl1_offset, txt2_offset):
+        yield label, parse_text_string(data, text_offset, codec)
+
+def iter_text_runs(source):
+    """
+    Yields a (label, run) pair for every plain text run in a msbt file, skipping text commands.
+
+        source: A path, a file-like object or a bytes-like object containing the file
+
+    This is the fastest way to search the text of a file, as no components or text commands are created.
+    """
+    data = _read_source(source)
+    codec, lbl1_offset, txt2_offset = _find_sections(data)
+    for label, text_offset in _iter_text_offsets(data, codec, lbl1_offset, txt2_offset):
+        for run in parse_text_runs(data, text_offset, codec):
+            yield label, run
+
+class TextLabels(MutableMapping):
+    """
+    A lazy map between labels and texts, used as MSBTFile.text_labels when the file is opened in lazy mode.
+
+        Labels are looked up through the LBL1 hash table and texts are only decoded once they are looked up.
+        Setting the text of a new label adds an entry and deleting a label removes it, see add_entry and remove_entry.
+    """
+    def __init__(self, msbt_file):
+        self.msbt = msbt_file
+
+    def __getitem__(self, label):
+        return self.msbt.get_text(label)
+
+    def __setitem__(self, label, text):
+        if label in self:
+            self.msbt.set_text(label, text)
+        else:
+            self.msbt.add_entry(label, text)
+
+    def __delitem__(self, label):
+        self.msbt.remove_entry(label)
+
+    def __iter__(self):
+        return (label.data for label in self.msbt.LBL1.labels)
+
+    def __len__(self):
+        return len(self.msbt.LBL1.labels)
+
+    def __contains__(self, label):
+        return self.msbt.LBL1.find_label(label) is not None
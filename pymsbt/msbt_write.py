@@ -1,248 +1,271 @@
-import struct
+import logging
+import os
+import tempfile
+
+from .classes import TextList
+from . import instrument
+
+logger = logging.getLogger(__name__)
+
+def _align(offset):
+    """Returns offset rounded up to the next multiple of 16"""
+    return (offset + 15) & ~15
+
+def _write_atomic(filepath, data):
+    """Writes data to a temporary file next to filepath, then renames it into place"""
+    filepath = os.path.abspath(filepath)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix=os.path.basename(filepath) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        # mkstemp creates the file as private, give it the permissions a normally created file would have
+        if os.path.exists(filepath):
+            mode = os.stat(filepath).st_mode & 0o777
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, filepath)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def encode_text_string(components, codec):
+    """Encodes the components of a text to bytes with a Codec, including text commands and the terminator"""
+    parts = []
+    for component in components:
+        if component.type == 'command':
+            parts.append(encode_text_command(component.data, codec))
+        else:
+            parts.append(codec.encode(component.data))
+    parts.append(codec.terminator)
+    return b''.join(parts)
+
+def encode_text_command(command, codec):
+    """Encodes a text command to bytes with a Codec"""
+    return codec.command.pack(command.tag, command.group, command.type, len(command.payload)) + command.payload
 
 class MSBTWriter:
-    def __init__(self, msbt_file, filepath=None):
+    def __init__(self, msbt_file, filepath=None, incremental=True):
         """
         Writes to a file in the MSBT format using the specified MSBTFile
 
             msbt_file: A MSBTFile instance
             filepath (optional): The path to write the ouput file to, defaults to the same filepath as the msbt file.
+            incremental: Copy texts that were never decoded byte for byte from the original file instead of encoding them again.
+                Texts that were decoded are always encoded, so edits made to their components in place are kept. Set it to False to encode every text.
+
+        The whole file is built in memory first, then written to a temporary file that is renamed into place,
+        so an error while writing never leaves a truncated file behind. Added and removed entries are applied to a
+        copy of the layout, see MSBTFile.write_plan, so writing never changes the MSBTFile.
         """
         self.msbt = msbt_file
         self.filepath = filepath or self.msbt.filepath
-        self.stream = open(self.filepath, 'wb')
-
-        self.label_index = 0
-        self.sec_offset = 0
-
-        self._write_sections()
-        self._write_header()
-
-    def _pack_into_stream(self, format, offset, *args):
-        """Packs a struct format into the class' file stream"""
-        packed = struct.pack(format, *args)
-        self.stream.seek(offset)
-        self.stream.write(packed)
-
-    def _write_header(self):
-        """Writes the MSBT header to the file"""
-        header = struct.pack(
-            '<8s H H H H H I 10s',
-            self.msbt.header.magic.encode('ascii'), #8s
-            self.msbt.header.byte_order, # H
-            0, # H
-            self.msbt.header.version, #H
-            self.msbt.header.section_count, #H
-            0, # H
-            self.stream.tell(), #I - file size
-            b'\x00' * 10 # 10s
-        )
-        self.stream.seek(0)
-        self.stream.write(header)
+        if self.filepath is None:
+            raise ValueError("No filepath to write to, the MSBTFile wasn't read from a path. Use MSBTFile.to_bytes or MSBTFile.write_to instead")
+        self.incremental = incremental
+        # precompiled packers for the byte order and text encoding of the file
+        self.codec = self.msbt.header.codec
+
+        self.buffer = self._build()
+        self._write_file()
+
+    @classmethod
+    def _detached(cls, msbt_file, incremental):
+        """Returns a writer that doesn't write a file"""
+        writer = cls.__new__(cls)
+        writer.msbt = msbt_file
+        writer.filepath = msbt_file.filepath
+        writer.incremental = incremental
+        writer.codec = msbt_file.header.codec
+        return writer
+
+    @classmethod
+    def build(cls, msbt_file, incremental=True):
+        """Returns the contents of msbt_file in the MSBT format as a bytearray, without writing a file"""
+        return cls._detached(msbt_file, incremental)._build()
+
+    @classmethod
+    def build_into(cls, msbt_file, buffer, offset=0, incremental=True):
+        """
+        Packs the contents of msbt_file in the MSBT format straight into a writable buffer, returning the amount of bytes written.
 
-    def _fill_bytes(self, offset, remainder):
-        """Fills a section of bytes with 0xAB to allign by 16 bytes, leaving a padding of 3 0x00 bytes"""
+            buffer: A writable bytes-like object, such as a bytearray, a memoryview or a writable mmap
+            offset: The offset in buffer to write the file at
 
-        #calculate next offset to allign by 16
-        next_offset = offset
-        while True:
-            if next_offset % 16 == 0:
-                break
-            else:
-                next_offset += 1
-
-        #fill with filler bytes until next section
-        fill_length = next_offset - offset
-        self.stream.seek(self.sec_offset)
-        padding = 0
-        for i in range(3 - remainder):
-            # write padding of 3 0x00 bytes if they don't overlap onto the next section
-            if not (self.stream.tell() > next_offset):
-                self.stream.write(b'\x00')
-                padding += 1
-            else:
-                return # end early if they do overlap to the next section
-        self.stream.write(b'\xAB' * (fill_length - padding))
-
-    def _calculate_table_size(self, sec_start_offset, end_offset):
-        table_size = (end_offset + 3) - (sec_start_offset + 16) # end offset + 3(padding) - section start offset + 16(header)
-        total_offset = sec_start_offset + 16 + table_size # total offset of entire file to end of section
-        byte_remainder = total_offset % 16  # must allign to 16 bytes, remainder amt of bytes that aren't alligned to 16.
-
-        if (byte_remainder <= 3):
-            return (table_size - byte_remainder), byte_remainder
-        elif (byte_remainder >= 13):
-            byte_remainder_sub = (16 - byte_remainder)
-            return (table_size) - byte_remainder_sub, 0
-        else:
-            return table_size, 0
-
-    def _write_sections(self):
-        """Writes the MSBT sections to the file"""
-        offset = 0x20
-        for i in range(self.msbt.header.section_count):
-            section = self.msbt.sections[i]
-            table_size = section.table_size
-            signature = section.signature
-
-            self.next_section_offset = offset + (table_size + 16 + (16 - (table_size % 16)) % 16)
-            if signature == "LBL1":
-                print("Writing Labels section...")
-
-                self._write_labels_section(offset)
-            #elif signature == "ATR1":
-            #    print("Writing Attributes section...")
-            #
-            #    self.write_attributes_section(offset, table_size)
-            #    self._fill_bytes(self.sec_offset, next_section_offset)
-            elif signature == "TXT2":
-                print("Writing Text section...")
-
-                self._write_text_section(offset)
+        Raises a ValueError if the file doesn't fit in the buffer, before anything is written.
+        """
+        writer = cls._detached(msbt_file, incremental)
+        layout, file_size = writer._layout()
+        view = memoryview(buffer).cast('B')
+        if offset < 0 or offset + file_size > len(view):
+            raise ValueError(f"A buffer of {len(view)} bytes is too small to write {file_size} bytes at offset {offset}")
+        writer._pack(view[offset:offset + file_size], layout, file_size)
+        return file_size
+
+    def _build(self):
+        """Computes the layout of every section, then packs the whole file into one preallocated bytearray"""
+        layout, file_size = self._layout()
+        buffer = bytearray(file_size)
+        self._pack(buffer, layout, file_size)
+        return buffer
+
+    def _layout(self):
+        """First pass: encodes the variable length parts and computes the offset of every section, returns the layout and the file size"""
+        self.plan = self.msbt.write_plan() # added and removed entries applied
+        layout = []
+        offset = 0x20 # start after msbt header
+        for section in self.msbt.sections:
+            with instrument.measure('layout', section.signature, self.filepath) as event:
+                if section.signature == "LBL1":
+                    table_size = self._layout_labels_section()
+                    contents = None
+                    event.entries = len(self.plan.labels)
+                elif section.signature == "TXT2":
+                    contents = self._layout_text_section()
+                    table_size = contents[0]
+                    event.entries = len(contents[1])
+                elif section.signature == "ATR1":
+                    # written straight from the file data unless a record was changed
+                    contents = self.plan.attributes
+                    table_size = len(contents)
+                    event.entries, = self.codec.u32.unpack_from(contents, 0)
+                else:
+                    # copied bytes for unsupported sections, already aligned to 16 bytes
+                    table_size, contents = self.plan.sections.get(section, (section.table_size, section.bytes))
+                event.bytes = table_size
+
+            layout.append((section, offset, table_size, contents))
+            if section.signature in ("LBL1", "TXT2", "ATR1"):
+                offset = _align(offset + 16 + table_size)
             else:
-                print(f"Unknown section: {signature}")
+                offset = _align(offset + len(contents))
+
+        return layout, offset
+
+    def _pack(self, buffer, layout, file_size):
+        """Second pass: fills the buffer, every byte of the file is written"""
+        for section, section_offset, table_size, contents in layout:
+            with instrument.measure('pack', section.signature, self.filepath) as event:
+                event.bytes = table_size
+                if section.signature == "LBL1":
+                    logger.debug("Writing Labels section...")
+                    self._write_labels_section(buffer, section_offset, table_size)
+                elif section.signature == "TXT2":
+                    logger.debug("Writing Text section...")
+                    self._write_text_section(buffer, section_offset, contents)
+                elif section.signature == "ATR1":
+                    logger.debug("Writing Attributes section...")
+                    self.codec.section_header.pack_into(buffer, section_offset, b'ATR1', table_size)
+                    buffer[section_offset + 16:section_offset + 16 + table_size] = contents
+                else:
+                    logger.debug("Unknown section: %s", section.signature)
+                    buffer[section_offset:section_offset + len(contents)] = contents
+                    continue
+
+                # fill with 0xAB bytes to allign the next section by 16 bytes
+                end = section_offset + 16 + table_size
+                buffer[end:_align(end)] = b'\xAB' * (_align(end) - end)
+
+        self._write_header(buffer, len(self.msbt.sections), file_size)
+
+    def _write_header(self, buffer, section_count, file_size):
+        """Writes the MSBT header to the buffer"""
+        self.codec.header.pack_into(
+            buffer, 0,
+            self.msbt.header.magic.encode('ascii'),
+            self.codec.byte_order.to_bytes(2, 'little'),
+            0,
+            self.codec.encoding,
+            self.msbt.header.version,
+            section_count,
+            0,
+            file_size
+        )
 
-                # write copied bytes for unsupported sections
-                self.stream.seek(offset)
-                self.stream.write(section.bytes)
+    def _write_file(self):
+        """Writes the buffer to a temporary file next to the output, then renames it into place"""
+        with instrument.measure('write', 'file', self.filepath) as event:
+            event.bytes = len(self.buffer)
+            self._write_temp_file()
 
-            # Move to the next section (aligned to 16 bytes)
-            offset = self.next_section_offset
+    def _write_temp_file(self):
+        _write_atomic(self.filepath, self.buffer)
 
 
     # LABELS
-    def _write_labels_section(self, section_offset):
-        """Writes the MSBT LBL1 section to the file"""
+    def _layout_labels_section(self):
+        """Returns the table size of the LBL1 section"""
+        return 4 + 8 * len(self.plan.bucket_counts) + sum(5 + len(label.data) for label in self.plan.labels)
+
+    def _write_labels_section(self, buffer, section_offset, table_size):
+        """Writes the MSBT LBL1 section to the buffer"""
+        self.codec.section_header.pack_into(buffer, section_offset, b'LBL1', table_size)
+
         # Section starts after the 16-byte header
-        offset = section_offset + 16
-        # Get the number of entries in the offset table
-        self._pack_into_stream("<I", offset, self.msbt.LBL1.offset_count)
-
-        offset += 4
-        offset_lbl = 0
-
-        for i in range(self.msbt.LBL1.offset_count):
-            str_count, str_offset = self.msbt.LBL1.offset_table[i]
-            self._pack_into_stream("<II", offset, str_count, str_offset)
-            offset += 8
-
-            #print(f"Wrote Label {i}: StringCount={str_count}, StringOffset={str_offset}")
-
-            self.sec_offset = self._write_label_string(section_offset + 16 + str_offset, str_count)
-
-        #calculate table size and create header
-        table_size, r = self._calculate_table_size(section_offset, self.sec_offset)
-        self._pack_into_stream("<4sI", section_offset, b'LBL1', table_size)
-
-        self._fill_bytes(self.sec_offset, r)
-
-    def _write_label_string(self, label_offset, string_count):
-        """Writes the LBL1 label strings to the file"""
-        offset = label_offset
-        for i in range(string_count):
-            label = self.msbt.LBL1.labels[self.label_index]
-            # Get the length of the string
-            str_len = len(label.data)
-            self._pack_into_stream("<B", offset, str_len)
-            offset += 1 
-            
-            # write the null-terminated string
-            self._pack_into_stream(f'<{str_len}s', offset, label.data.encode('ascii'))
-            offset += str_len
-
-            index = label.string_index
-            #index = int.from_bytes(index, byteorder='little')
-            self._pack_into_stream(f'<I', offset, index) #write index
-            offset += 4 # move past index
-
-            self.label_index += 1
-        return offset - 3
-    
+        start = section_offset + 16
+        offset_count = len(self.plan.bucket_counts)
+        u32 = self.codec.u32
+        u32.pack_into(buffer, start, offset_count)
+        text_indexes = self.plan.text_indexes
+
+        # label strings are stored after the offset table, grouped in the order of the table
+        table_offset = start + 4
+        str_offset = 4 + 8 * offset_count
+        labels = iter(self.plan.labels)
+        for str_count in self.plan.bucket_counts:
+            self.codec.u32_pair.pack_into(buffer, table_offset, str_count, str_offset)
+            table_offset += 8
+
+            offset = start + str_offset
+            for _ in range(str_count):
+                label = next(labels)
+                encoded = label.data.encode('ascii')
+                str_len = len(encoded)
+
+                buffer[offset] = str_len
+                buffer[offset + 1:offset + 1 + str_len] = encoded
+                u32.pack_into(buffer, offset + 1 + str_len, label.string_index if text_indexes is None else text_indexes[label.string_index])
+                offset += 5 + str_len
+
+            str_offset = offset - start
+
 
     ## TEXT
-    def _write_text_section(self, section_offset):
-        """Writes the MSBT TXT2 section to the file"""
-        offset = section_offset + 20 # skip past header and to-be-written offset count
-        offset_count = self.msbt.TXT2.offset_count
-        txt_offsets = []
-
-        offset += 4 * offset_count # move past offsets to write texts
-        for i in range(offset_count):
-            txt_offsets.append(offset - (section_offset + 16))
-            self._write_text_string(offset, i)
-            offset = self.sec_offset + 2
-
-        #after finished writing texts, create offsets
-        offset = section_offset + 16 # skip section header
-
-        self._pack_into_stream("<I", offset, offset_count)
-        offset += 4
-
-        print(self.msbt.TXT2.offset_table)
-        print(txt_offsets)
-
-        # write each string in the text section
-        for i in range(offset_count):
-            text_offset = txt_offsets[i]
-            self._pack_into_stream("<I", offset, text_offset)
-            offset += 4
-
-        #calculate table size and create header
-        table_size, r = self._calculate_table_size(section_offset, self.sec_offset)
-        print(table_size, r)
-        self._pack_into_stream("<4sI", section_offset, b'TXT2', table_size)
-
-        self._fill_bytes(self.sec_offset, r)
-
-    def _write_text_string(self, text_offset, index):
-        """Writes the TXT2 text strings to the file, writing text commands if necessary"""
-        components = self.msbt.TXT2.texts[index]
-        offset = text_offset
-        for component in components:
-
-            if component.type == 'command':
-                command = component.data
-                offset = self._write_text_command(offset, command)
-                self.sec_offset = offset
-                continue
-
-            for char in component.data:
-                self._pack_into_stream("<H", offset, ord(char))
-                offset += 2
-            self._pack_into_stream("<H", offset, 0x0000)
-
-            self.sec_offset = offset
-
-    def _write_text_command(self, start_offset, command):
-        """Writes a text command to the file"""
-        offset = start_offset
-        
-        self._pack_into_stream(
-            '<HHHH',
-            offset,
-            int(command.magic, 16),
-            command.group,
-            command.type,
-            command.data_size
-        )
-        offset += 8
-        if command.data:
-            data = command.data.replace('0x', '')
-            self._pack_into_stream(f'<{command.data_size}s', offset, bytes.fromhex(data))
-        offset += command.data_size
-        return offset
-
-    
-    ## ATTRIBUTES
-    #def write_attributes_section(self, section_offset, table_size):
-    #    offset = section_offset + 16  # skip section header
-    #
-    #    attr_count, attr_data_size = self.msbt.attr_header_data
-    #    self._pack_into_stream("<II", offset, attr_count, attr_data_size)
-    #    offset += 8
-        
-        #for i in range(attr_count):
-        #    # Read each attribute entry (4-byte offset from beginning)
-        #    attr_offset, = struct.unpack_from("<I", self.data, offset)
-        #    self.attributes.append(attr_offset)
-        #    offset += 4
\ No newline at end of file
+    def _layout_text_section(self):
+        """Encodes every changed text and returns the table size of the TXT2 section and the encoded texts"""
+        txt2 = self.msbt.TXT2
+        if self.incremental and isinstance(txt2.texts, TextList):
+            # texts that were never decoded are copied from the original file data
+            texts = [
+                txt2.get_raw(i) if txt2.matches_raw(i) else encode_text_string(txt2.texts[i], self.codec)
+                for i in self.plan.texts
+            ]
+        else:
+            texts = [encode_text_string(txt2.texts[i], self.codec) for i in self.plan.texts]
+        table_size = 4 + 4 * len(texts) + sum(len(text) for text in texts)
+        return table_size, texts
+
+    def _write_text_section(self, buffer, section_offset, contents):
+        """Writes the MSBT TXT2 section to the buffer"""
+        table_size, texts = contents
+        self.codec.section_header.pack_into(buffer, section_offset, b'TXT2', table_size)
+
+        # skip section header
+        start = section_offset + 16
+        u32 = self.codec.u32
+        u32.pack_into(buffer, start, len(texts))
+
+        # texts are stored after the offset table
+        table_offset = start + 4
+        text_offset = 4 + 4 * len(texts)
+        for text in texts:
+            u32.pack_into(buffer, table_offset, text_offset)
+            table_offset += 4
+
+            offset = start + text_offset
+            buffer[offset:offset + len(text)] = text
+            text_offset += len(text)
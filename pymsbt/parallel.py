@@ -0,0 +1,99 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .classes import TextList, parse_text_string
+from .codec import get_codec
+
+# the fewest texts per chunk, below this the cost of handing out chunks outweighs decoding them in parallel
+MIN_CHUNK_SIZE = 1024
+
+def free_threaded():
+    """Whether the interpreter runs without the GIL, so that threads decode texts in parallel"""
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+def _decode_states(data, base, offsets, byte_order, encoding):
+    """
+    Decodes texts in a worker process and returns them as states, see TXT2Section.get_state.
+
+        data: The bytes of the part of the file that holds the texts, starting at base
+        offsets: The offsets of the texts in data
+    """
+    codec = get_codec(byte_order, encoding)
+    states = []
+    for offset in offsets:
+        state = []
+        for component in parse_text_string(data, offset, codec):
+            if component.type == 'text':
+                state.append(component.data)
+            else:
+                # command offsets are kept relative to the whole file, like when decoding in place
+                command = component.data
+                state.append((command.tag, command.group, command.type, command.payload, command.start_offset + base, command.end_offset + base))
+        states.append(state)
+    return states
+
+def decode_texts(section, workers=None, chunk_size=None, executor=None):
+    """
+    Decodes every text of a TXT2Section on a pool of workers, in chunks of consecutive texts.
+
+        workers (optional): The number of workers, defaults to the number of cores
+        chunk_size (optional): The number of texts per chunk, defaults to splitting the texts into 4 chunks per worker
+        executor (optional): An executor to run the chunks on, to reuse a pool across files.
+            Defaults to a thread pool on free-threaded python and a process pool otherwise.
+
+    The texts end up exactly as if they were decoded one by one. Threads decode straight from the file data. Worker
+    processes are only sent the bytes of their chunk and send the texts back as plain states, which are turned into
+    components here, so processes only pay off for files with tens of thousands of texts on several cores.
+    Small files, files restored from a ParseCache and sections without a TextList are decoded serially.
+    """
+    if not isinstance(section.texts, TextList):
+        return
+    count = section.offset_count
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(MIN_CHUNK_SIZE, -(-count // (workers * 4)))
+    serial = (workers == 1 and executor is None) or count <= chunk_size
+    # texts that were added after parsing have no offset in the file data
+    if serial or section._cached_texts is not None or None in section.offset_table:
+        for index in range(count):
+            section.get_text(index)
+        return
+
+    chunks = [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+    threads = executor is None and free_threaded()
+    if executor is None:
+        executor_class = ThreadPoolExecutor if threads else ProcessPoolExecutor
+        with executor_class(min(workers, len(chunks))) as executor:
+            _decode_chunks(section, chunks, executor, threads)
+    else:
+        _decode_chunks(section, chunks, executor, isinstance(executor, ThreadPoolExecutor))
+
+def _decode_chunks(section, chunks, executor, threads):
+    if threads:
+        for future in [executor.submit(section.decode_range, start, end) for start, end in chunks]:
+            future.result()
+        return
+
+    # every chunk gets the bytes from its first text up to the first text of the next chunk
+    base = section.section_offset + 16
+    offsets = section.offset_table
+    sequential = section._is_sequential()
+    data = section.data
+    futures = []
+    for start, end in chunks:
+        chunk_offsets = offsets[start:end]
+        chunk_start = base + min(chunk_offsets)
+        chunk_end = base + offsets[end] if sequential and end < section.offset_count else len(data)
+        futures.append(executor.submit(
+            _decode_states, bytes(data[chunk_start:chunk_end]), chunk_start, [base + offset - chunk_start for offset in chunk_offsets],
+            section.codec.byte_order, section.codec.encoding
+        ))
+
+    # the states are turned into components the same way as states restored from a ParseCache,
+    # texts replaced with set_raw were decoded from the file data by the workers and are decoded from their bytes instead
+    raw = section.raw
+    for (start, _), future in zip(chunks, futures):
+        section.texts.fill(start, [None if index in raw else section.text_from_state(state) for index, state in enumerate(future.result(), start)])
+    for index in raw:
+        section.get_text(index)
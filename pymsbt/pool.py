@@ -0,0 +1,178 @@
+import os
+import threading
+from collections import OrderedDict
+
+from .msbt import MSBTFile
+
+# measured memory of a parsed entry besides its text: the label, the text list and the component objects
+ENTRY_OVERHEAD = 400
+# decoded texts take about this many times the size of the encoded TXT2 section
+TEXT_FACTOR = 4
+
+def estimate_footprint(msbt):
+    """
+    Returns an estimate of the memory used by a MSBTFile in bytes, once every text is decoded.
+
+        Files opened in lazy mode use less until their texts are accessed, so this is an upper bound for them.
+    """
+    text_bytes = sum(section.table_size for section in msbt.sections if section.signature == 'TXT2')
+    entries = msbt.TXT2.offset_count if msbt.TXT2 is not None else 0
+    return len(msbt.data) + ENTRY_OVERHEAD * entries + TEXT_FACTOR * text_bytes
+
+class PoolStats:
+    """
+    Statistics of a MSBTPool.
+
+        hits: Lookups of files that were in the pool
+        misses: Lookups that loaded a file
+        waits: Lookups that waited for another thread that was already loading the same file
+        evictions: Files removed to stay within the byte budget
+        failures: Loads that raised an exception
+        files: The number of files in the pool
+        bytes: The estimated footprint of the files in the pool
+    """
+    def __init__(self, hits=0, misses=0, waits=0, evictions=0, failures=0, files=0, bytes=0):
+        self.hits = hits
+        self.misses = misses
+        self.waits = waits
+        self.evictions = evictions
+        self.failures = failures
+        self.files = files
+        self.bytes = bytes
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses + self.waits
+        return (self.hits + self.waits) / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (f"(hits: {self.hits}, misses: {self.misses}, waits: {self.waits}, evictions: {self.evictions}, "
+                f"failures: {self.failures}, files: {self.files}, bytes: {self.bytes})")
+    def __repr__(self):
+        return self.__str__()
+
+class _Load:
+    """A load in progress, that other threads asking for the same file wait for"""
+    __slots__ = ('done', 'msbt', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.msbt = None
+        self.error = None
+
+class MSBTPool:
+    """
+    A thread-safe pool of parsed msbt files for long-running services that look up texts across a lot of files.
+
+        max_bytes: The maximum estimated footprint of the files in the pool, see estimate_footprint.
+            The least recently used files are evicted when it's exceeded.
+        lazy: Open files in lazy mode, so loading a file only reads its labels and texts are decoded when looked up
+        loader (optional): A function that takes a path and returns a MSBTFile, such as ParseCache.load.
+            Defaults to opening the file with MSBTFile.
+        sizer (optional): A function that returns the footprint of a MSBTFile, defaults to estimate_footprint
+
+    Files are shared between threads and must be treated as read-only. When several threads ask for a file that
+    isn't loaded, it's only parsed once and the other threads wait for it. Failed loads aren't cached.
+    """
+    def __init__(self, max_bytes=512 * 1024 * 1024, lazy=True, loader=None, sizer=None):
+        self.max_bytes = max_bytes
+        self.lazy = lazy
+        self.loader = loader or self._open
+        self.sizer = sizer or estimate_footprint
+        self._files = OrderedDict() # path: (msbt, footprint), least recently used first
+        self._loads = {}
+        self._lock = threading.Lock()
+        self._stats = PoolStats()
+
+    def _open(self, path):
+        return MSBTFile(path, lazy=self.lazy)
+
+    def get(self, path):
+        """Returns the MSBTFile of path, loading it if it isn't in the pool"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None:
+                self._files.move_to_end(path)
+                self._stats.hits += 1
+                return entry[0]
+
+            load = self._loads.get(path)
+            loading = load is None
+            if loading:
+                load = self._loads[path] = _Load()
+                self._stats.misses += 1
+            else:
+                self._stats.waits += 1
+        if not loading:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.msbt
+
+        try:
+            msbt = self.loader(path)
+            # labels are looked up through a dict, so lookups don't parse anything while other threads read the file
+            msbt.build_label_index()
+            footprint = self.sizer(msbt)
+        except BaseException as e:
+            load.error = e
+            with self._lock:
+                del self._loads[path]
+                self._stats.failures += 1
+            load.done.set()
+            raise
+
+        load.msbt = msbt
+        with self._lock:
+            del self._loads[path]
+            self._files[path] = (msbt, footprint)
+            self._stats.bytes += footprint
+            self._evict()
+        load.done.set()
+        return msbt
+
+    def _evict(self):
+        # the file that was just added is kept even if it's bigger than the whole budget
+        while self._stats.bytes > self.max_bytes and len(self._files) > 1:
+            _, (_, footprint) = self._files.popitem(last=False)
+            self._stats.bytes -= footprint
+            self._stats.evictions += 1
+
+    def get_text(self, path, label):
+        """Returns the text of a label in the file at path, raising a KeyError if the label doesn't exist"""
+        return self.get(path).text_labels[label]
+
+    def discard(self, path):
+        """Removes a file from the pool, such as after it changed on disk. Returns whether it was in the pool."""
+        with self._lock:
+            entry = self._files.pop(os.path.abspath(path), None)
+            if entry is None:
+                return False
+            self._stats.bytes -= entry[1]
+            return True
+
+    def clear(self):
+        """Removes every file from the pool"""
+        with self._lock:
+            self._files.clear()
+            self._stats.bytes = 0
+
+    def stats(self):
+        """Returns a snapshot of the PoolStats"""
+        with self._lock:
+            stats = self._stats
+            return PoolStats(stats.hits, stats.misses, stats.waits, stats.evictions, stats.failures, len(self._files), stats.bytes)
+
+    def __contains__(self, path):
+        with self._lock:
+            return os.path.abspath(path) in self._files
+
+    def __len__(self):
+        with self._lock:
+            return len(self._files)
+
+    def __str__(self):
+        return f"(max_bytes: {self.max_bytes}, stats: {self.stats()})"
+    def __repr__(self):
+        return self.__str__()
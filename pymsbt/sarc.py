@@ -0,0 +1,293 @@
+import mmap
+import os
+import struct
+
+from .msbt import MSBTFile, _read_source
+from .msbt_write import MSBTWriter, _write_atomic
+
+SARC_MAGIC = b'SARC'
+ZSTD_MAGIC = b'\x28\xB5\x2F\xFD'
+
+# hash key used by every known archive
+HASH_KEY = 0x65
+
+# alignment of the data of members added to an archive
+DEFAULT_ALIGNMENT = 0x80
+
+def sarc_hash(name, key=HASH_KEY):
+    """Returns the SFAT hash of a member name"""
+    value = 0
+    for char in name.encode('utf-8'):
+        value = (value * key + char) & 0xFFFFFFFF
+    return value
+
+def _alignment(offset):
+    """Returns the largest power of two (up to 0x2000) that offset is a multiple of"""
+    if offset == 0:
+        return 0x2000
+    return min(offset & -offset, 0x2000)
+
+def _align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+def _zstd():
+    """Returns the zstd (decompress, compress) functions, from the standard library on python 3.14+ or the zstandard package"""
+    try:
+        from compression import zstd
+        return zstd.decompress, lambda data, level: zstd.compress(data, level)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compressed archives need the zstandard package, install it with: pip install pymsbt[zstd]") from None
+    return (lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+            lambda data, level: zstandard.ZstdCompressor(level=level).compress(data))
+
+class SARCMember:
+    """
+    A file in a SARC archive.
+
+        name: The path of the file in the archive, None for files that are only known by their hash
+        name_hash: The SFAT hash of the name
+        start: The offset of the data of the file in the archive data
+        end: The offset of the end of the data
+        alignment: The alignment the data is kept at when repacking
+    """
+    __slots__ = ('name', 'name_hash', 'attributes', 'start', 'end', 'alignment')
+
+    def __init__(self, name, name_hash, attributes, start, end, alignment):
+        self.name = name
+        self.name_hash = name_hash
+        self.attributes = attributes
+        self.start = start
+        self.end = end
+        self.alignment = alignment
+
+    @property
+    def key(self):
+        """The name of the member, or its hash as a hex string if it doesn't have one"""
+        return self.name if self.name is not None else f'{self.name_hash:08x}'
+
+    def __str__(self):
+        return f"(name: {self.key}, offset: {self.start}, size: {self.end - self.start})"
+    def __repr__(self):
+        return self.__str__()
+
+class SARCArchive:
+    """
+    A SARC archive, read in place without extracting its files.
+
+        source: A path, a file-like object or a bytes-like object containing the archive, zstd compressed or not
+
+        filepath: The path of the archive, None if it wasn't opened from a path
+        compressed: Whether the archive is zstd compressed
+        members: A map between member names and SARCMembers, in the order of the SFAT table
+        data: A memoryview of the uncompressed archive
+
+    Uncompressed archives opened from a path are memory mapped, so members are only read from disk when they are accessed.
+    Compressed archives are decompressed into memory once. Members are returned as memoryview slices of the archive data and
+    msbt members are parsed straight from them, so MSBTFiles opened from an archive must not be used after the archive is closed.
+    """
+    def __init__(self, source):
+        self.filepath = source if isinstance(source, (str, os.PathLike)) else None
+        self._mmap = None
+        self._replaced = {}
+        self._added = []
+
+        if self.filepath is not None:
+            with open(self.filepath, 'rb') as f:
+                if os.fstat(f.fileno()).st_size > 0:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = memoryview(self._mmap) if self._mmap is not None else memoryview(b'')
+        else:
+            data = memoryview(_read_source(source))
+
+        self.compressed = data[:4] == ZSTD_MAGIC
+        if self.compressed:
+            decompress, _ = _zstd()
+            decompressed = decompress(data)
+            data.release()
+            self._close_mmap()
+            data = memoryview(decompressed)
+        self.data = data
+
+        self._parse()
+
+    def _parse(self):
+        """Parses the SARC header and the SFAT and SFNT tables. Ran automatically upon creation of a SARCArchive class"""
+        data = self.data
+        if data[:4] != SARC_MAGIC:
+            raise ValueError("Invalid SARC file: bad magic")
+        self.endian = '<' if data[6:8] == b'\xFF\xFE' else '>'
+        endian = self.endian
+
+        _, header_size, _, _, self.data_offset, self.version = struct.unpack_from(endian + '4sH2sIIH', data, 0)
+
+        # SFAT: hash key and one node per file, sorted by hash
+        magic, sfat_size, node_count, self.hash_key = struct.unpack_from(endian + '4sHHI', data, header_size)
+        if magic != b'SFAT':
+            raise ValueError("Invalid SARC file: missing SFAT table")
+        nodes_offset = header_size + sfat_size
+        nodes = [struct.unpack_from(endian + 'IIII', data, nodes_offset + 16 * index) for index in range(node_count)]
+
+        # SFNT: null terminated names, aligned to 4 bytes
+        sfnt_offset = nodes_offset + 16 * node_count
+        magic, sfnt_size = struct.unpack_from(endian + '4sH', data, sfnt_offset)
+        if magic != b'SFNT':
+            raise ValueError("Invalid SARC file: missing SFNT table")
+        names_offset = sfnt_offset + sfnt_size
+
+        self.members = {}
+        for name_hash, attributes, start, end in nodes:
+            name = None
+            if attributes:
+                name_start = names_offset + (attributes & 0xFFFFFF) * 4
+                name_end = name_start
+                while data[name_end]:
+                    name_end += 1
+                name = str(data[name_start:name_end], 'utf-8')
+            start += self.data_offset
+            end += self.data_offset
+            member = SARCMember(name, name_hash, attributes >> 24, start, end, _alignment(start))
+            self.members[member.key] = member
+
+    def names(self):
+        """Returns the names of every member"""
+        return list(self.members)
+
+    def msbt_names(self):
+        """Returns the names of the msbt members"""
+        return [name for name in self.members if name.endswith('.msbt')]
+
+    def read(self, name):
+        """Returns the data of a member, as a memoryview of the archive data unless it was replaced"""
+        if name in self._replaced:
+            return self._replaced[name]
+        member = self.members[name]
+        return self.data[member.start:member.end]
+
+    def open_msbt(self, name, lazy=False, attribute_layout=None):
+        """Returns a MSBTFile parsed in place from a member, see MSBTFile for lazy and attribute_layout"""
+        return MSBTFile._from_data(name, self.read(name), lazy, attribute_layout=attribute_layout)
+
+    def iter_msbt(self, lazy=False, attribute_layout=None):
+        """Yields a (name, MSBTFile) pair for every msbt member"""
+        for name in self.msbt_names():
+            yield name, self.open_msbt(name, lazy, attribute_layout)
+
+    def replace(self, name, data):
+        """
+        Replaces the data of a member when repacking, or adds a new member.
+
+            data: A bytes-like object or a MSBTFile, which is built with MSBTWriter.build
+        """
+        if isinstance(data, MSBTFile):
+            data = MSBTWriter.build(data)
+        self._replaced[name] = bytes(data)
+        if name not in self.members:
+            self.members[name] = SARCMember(name, sarc_hash(name, self.hash_key), 1, 0, 0, DEFAULT_ALIGNMENT)
+            self._added.append(self.members[name])
+
+    def repack(self, filepath=None, compress=None, level=3):
+        """
+        Returns the contents of the archive with the replaced members as a bytearray, writing them to filepath if given.
+
+            compress (optional): Whether to zstd compress the archive, defaults to whether the archive was compressed
+            level: The zstd compression level
+
+        Members that weren't replaced are copied from the archive data, keeping their alignment.
+        """
+        endian = self.endian
+        # nodes are sorted by hash, data keeps the order of the original archive with new members at the end
+        nodes = sorted(self.members.values(), key=lambda member: member.name_hash)
+        added = set(self._added)
+        data_order = sorted((member for member in self.members.values() if member not in added), key=lambda member: member.start) + self._added
+
+        names = bytearray()
+        name_offsets = {}
+        for member in nodes:
+            if member.name is not None:
+                name_offsets[member.key] = len(names)
+                names += member.name.encode('utf-8') + b'\x00'
+                names += b'\x00' * (-len(names) % 4)
+
+        header_size = 0x14
+        nodes_offset = header_size + 0x0C
+        names_offset = nodes_offset + 16 * len(nodes) + 8
+        if not added and names_offset + len(names) <= self.data_offset:
+            # keep the padding before the data of the original archive
+            data_offset = self.data_offset
+        else:
+            data_offset = _align(names_offset + len(names), _alignment(self.data_offset))
+
+        # lay out the member data
+        positions = {}
+        offset = data_offset
+        for member in data_order:
+            offset = _align(offset, member.alignment)
+            size = len(self.read(member.key))
+            positions[member.key] = (offset, offset + size)
+            offset += size
+        file_size = offset
+
+        buffer = bytearray(file_size)
+        bom = b'\xFF\xFE' if endian == '<' else b'\xFE\xFF'
+        struct.pack_into(endian + '4sH2sIIHH', buffer, 0, SARC_MAGIC, header_size, bom, file_size, data_offset, self.version, 0)
+        struct.pack_into(endian + '4sHHI', buffer, header_size, b'SFAT', 0x0C, len(nodes), self.hash_key)
+        for index, member in enumerate(nodes):
+            start, end = positions[member.key]
+            attributes = (member.attributes << 24 | name_offsets[member.key] // 4) if member.name is not None else 0
+            struct.pack_into(endian + 'IIII', buffer, nodes_offset + 16 * index, member.name_hash, attributes, start - data_offset, end - data_offset)
+        struct.pack_into(endian + '4sHH', buffer, names_offset - 8, b'SFNT', 8, 0)
+        buffer[names_offset:names_offset + len(names)] = names
+        for member in data_order:
+            start, end = positions[member.key]
+            buffer[start:end] = self.read(member.key)
+
+        if compress is None:
+            compress = self.compressed
+        if compress:
+            _, compress_data = _zstd()
+            buffer = bytearray(compress_data(bytes(buffer), level))
+
+        if filepath is not None:
+            _write_atomic(filepath, buffer)
+        return buffer
+
+    def _close_mmap(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass # still referenced by members or MSBTFiles, closed once they are garbage collected
+            self._mmap = None
+
+    def close(self):
+        """Releases the memory map of the archive"""
+        try:
+            self.data.release()
+        except BufferError:
+            pass
+        self._close_mmap()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def __str__(self):
+        return f"(SARC: members: {len(self.members)}, compressed: {self.compressed})"
+    def __repr__(self):
+        return self.__str__()
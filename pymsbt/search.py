@@ -0,0 +1,261 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from array import array
+
+from .batch import find_msbt_files
+from .classes import parse_text_runs
+from .literals import required_literals
+from .msbt import _find_sections, _iter_text_offsets
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of the index database changes
+INDEX_FORMAT = 1
+
+# stands in for the text commands between the text runs of an indexed text
+COMMAND_MARK = '\ufffc'
+
+# the most trigrams of a query that are looked up, the regex confirms the rest
+_MAX_QUERY_TRIGRAMS = 32
+
+def _trigrams(text):
+    """Returns the set of lowercase trigrams of text"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SearchHit:
+    """
+    A text that matches a query.
+
+        path: The absolute path of the msbt file
+        label: The label of the text, None in files without a LBL1 section
+        text: The plain text runs of the text, with COMMAND_MARK in place of the text commands between them
+        start, end: The span of the first match in text
+    """
+    __slots__ = ('path', 'label', 'text', 'start', 'end')
+
+    def __init__(self, path, label, text, start, end):
+        self.path = path
+        self.label = label
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def __str__(self):
+        return f"({self.path}: {self.label}: {self.text!r})"
+    def __repr__(self):
+        return self.__str__()
+
+class IndexStats:
+    """Statistics of an update of a SearchIndex"""
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.removed = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.entries = 0 # texts indexed in added and updated files
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"(added: {self.added}, updated: {self.updated}, removed: {self.removed}, unchanged: {self.unchanged}, "
+                f"failed: {self.failed}, entries: {self.entries}, seconds: {self.seconds:.3f})")
+    def __repr__(self):
+        return self.__str__()
+
+class SearchIndex:
+    """
+    An on-disk trigram index of the text of a corpus of msbt files, stored in a sqlite database.
+
+        path: The path of the database file, it's created if it doesn't exist
+
+    update adds the files of a directory or glob to the index, only reading files whose modification time or size
+    changed and only parsing them again if their contents changed. search looks up the trigrams of the literals of
+    a regex to find candidate texts, and only runs the regex on those.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        connection = self.connection
+        connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        row = connection.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is not None and row[0] != str(INDEX_FORMAT):
+            # indexes of older versions are built again from scratch
+            with connection:
+                connection.execute('DROP TABLE IF EXISTS trigrams')
+                connection.execute('DROP TABLE IF EXISTS entries')
+                connection.execute('DROP TABLE IF EXISTS files')
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('format', ?)", (str(INDEX_FORMAT),))
+            connection.execute('CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, '
+                               'mtime REAL NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL)')
+            # entries are numbered by their position in the file, in the order of the LBL1 hash table
+            connection.execute('CREATE TABLE IF NOT EXISTS entries (file_id INTEGER NOT NULL, position INTEGER NOT NULL, label TEXT, '
+                               'text TEXT NOT NULL, PRIMARY KEY (file_id, position)) WITHOUT ROWID')
+            # one row per trigram and file, with the positions of the entries that contain it as a packed array
+            connection.execute('CREATE TABLE IF NOT EXISTS trigrams (gram TEXT NOT NULL, file_id INTEGER NOT NULL, positions BLOB NOT NULL, '
+                               'PRIMARY KEY (gram, file_id)) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams (file_id)')
+
+    def update(self, source):
+        """
+        Indexes the msbt files in source and returns the IndexStats of the update.
+
+            source: A directory or glob pattern of msbt files, see find_msbt_files
+
+        Indexed files that no longer exist are removed from the index. Files that can't be parsed are logged and skipped.
+        """
+        stats = IndexStats()
+        start = time.perf_counter()
+        known = {path: (file_id, mtime, size, digest) for file_id, path, mtime, size, digest
+                 in self.connection.execute('SELECT id, path, mtime, size, hash FROM files')}
+
+        for path, _ in find_msbt_files(source):
+            path = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+                row = known.get(path)
+                if row is not None and row[1] == stat.st_mtime and row[2] == stat.st_size:
+                    stats.unchanged += 1
+                    continue
+
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                with self.connection:
+                    if row is not None and row[3] == digest:
+                        # touched but not changed
+                        self.connection.execute('UPDATE files SET mtime = ?, size = ? WHERE id = ?', (stat.st_mtime, stat.st_size, row[0]))
+                        stats.unchanged += 1
+                        continue
+                    if row is not None:
+                        self._remove_file(row[0])
+                    stats.entries += self._add_file(path, stat, digest, data)
+                if row is not None:
+                    stats.updated += 1
+                else:
+                    stats.added += 1
+            except Exception as e:
+                logger.warning("Couldn't index %s: %s: %s", path, type(e).__name__, e)
+                stats.failed += 1
+
+        with self.connection:
+            for path, row in known.items():
+                if not os.path.exists(path):
+                    self._remove_file(row[0])
+                    stats.removed += 1
+
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def _add_file(self, path, stat, digest, data):
+        """Adds the texts of a file to the index, returning the amount of texts"""
+        file_id = self.connection.execute('INSERT OR REPLACE INTO files (path, mtime, size, hash) VALUES (?, ?, ?, ?)',
+                                          (path, stat.st_mtime, stat.st_size, digest)).lastrowid
+        codec, lbl1_offset, txt2_offset = _find_sections(data)
+        entries = []
+        postings = {}
+        for position, (label, text_offset) in enumerate(_iter_text_offsets(data, codec, lbl1_offset, txt2_offset)):
+            text = COMMAND_MARK.join(parse_text_runs(data, text_offset, codec))
+            entries.append((file_id, position, label, text))
+            for gram in _trigrams(text):
+                positions = postings.get(gram)
+                if positions is None:
+                    positions = postings[gram] = array('I')
+                positions.append(position)
+
+        self.connection.executemany('INSERT INTO entries (file_id, position, label, text) VALUES (?, ?, ?, ?)', entries)
+        self.connection.executemany('INSERT INTO trigrams (gram, file_id, positions) VALUES (?, ?, ?)',
+                                    [(gram, file_id, postings[gram].tobytes()) for gram in sorted(postings)])
+        return len(entries)
+
+    def _remove_file(self, file_id):
+        self.connection.execute('DELETE FROM trigrams WHERE file_id = ?', (file_id,))
+        self.connection.execute('DELETE FROM entries WHERE file_id = ?', (file_id,))
+        self.connection.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def search(self, pattern, flags=0, limit=None):
+        """
+        Returns a list of SearchHits for the texts that match a regex, ordered by file and label order.
+
+            pattern: A regex string or compiled regex, matched against SearchHit.text
+            flags: Regex flags such as re.IGNORECASE
+            limit (optional): The maximum amount of hits
+        """
+        regex = re.compile(pattern, flags)
+
+        # candidates are the texts that contain every trigram of the literals of the regex
+        grams = set()
+        for literal in required_literals(regex):
+            grams |= _trigrams(literal)
+        grams = sorted(grams)[:_MAX_QUERY_TRIGRAMS]
+
+        if grams:
+            rows = self._candidates(grams)
+        else:
+            # nothing to narrow the search down with, run the regex on every text
+            rows = self.connection.execute('SELECT files.path, entries.label, entries.text FROM entries '
+                                           'JOIN files ON files.id = entries.file_id ORDER BY files.path, entries.position')
+
+        hits = []
+        for path, label, text in rows:
+            match = regex.search(text)
+            if match is not None:
+                hits.append(SearchHit(path, label, text, match.start(), match.end()))
+                if limit is not None and len(hits) >= limit:
+                    break
+        return hits
+
+    def _candidates(self, grams):
+        """Yields (path, label, text) for the entries that contain every trigram in grams"""
+        candidates = None
+        for gram in grams:
+            found = {}
+            for file_id, positions in self.connection.execute('SELECT file_id, positions FROM trigrams WHERE gram = ?', (gram,)):
+                if candidates is None or file_id in candidates:
+                    positions = set(array('I', positions))
+                    if candidates is not None:
+                        positions &= candidates[file_id]
+                    if positions:
+                        found[file_id] = positions
+            candidates = found
+            if not candidates:
+                return
+
+        # the candidates are fetched with one query, joined through a temporary table
+        with self.connection:
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS candidates (file_id INTEGER NOT NULL, position INTEGER NOT NULL, '
+                                    'PRIMARY KEY (file_id, position)) WITHOUT ROWID')
+            self.connection.execute('DELETE FROM candidates')
+            self.connection.executemany('INSERT INTO candidates (file_id, position) VALUES (?, ?)',
+                                        ((file_id, position) for file_id, positions in candidates.items() for position in positions))
+        cursor = self.connection.execute('SELECT files.path, entries.label, entries.text FROM candidates '
+                                         'JOIN entries ON entries.file_id = candidates.file_id AND entries.position = candidates.position '
+                                         'JOIN files ON files.id = candidates.file_id ORDER BY files.path, entries.position')
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def files(self):
+        """Returns the paths of the indexed files"""
+        return [path for path, in self.connection.execute('SELECT path FROM files ORDER BY path')]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
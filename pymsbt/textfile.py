@@ -0,0 +1,231 @@
+import re
+
+from .classes import TextComponent, TextCommand
+from .codec import LITTLE_ENDIAN, BIG_ENDIAN, UTF8, UTF16, UTF32
+from .msbt import MSBTFile
+from .msbt_write import encode_text_string
+
+# text sources end in this suffix, the built msbt file has the same name with .msbt instead
+SOURCE_SUFFIX = '.msbt.txt'
+
+_BYTE_ORDERS = {'little': LITTLE_ENDIAN, 'big': BIG_ENDIAN}
+_ENCODINGS = {'utf-8': UTF8, 'utf-16': UTF16, 'utf-32': UTF32}
+
+# a line with only a label in square brackets starts an entry
+_ENTRY_HEADER = re.compile(r'^\[([^\[\]\n]*)\][ \t]*$', re.MULTILINE)
+# escapes, text commands, and braces or backslashes that aren't part of either
+_TOKEN = re.compile(r'\\(.)|\{(/?)(\d+):(\d+)(?::([0-9A-Fa-f]*))?\}|[{}\\]', re.DOTALL)
+_ESCAPES = {'\\': '\\', '{': '{', '}': '}', '[': '[', 'r': '\r'}
+
+def _line(text, position):
+    """Returns the line number of a position in text, only counted for errors"""
+    return text.count('\n', 0, position) + 1
+
+def format_command(command):
+    """
+    Returns the source form of a TextCommand.
+
+        {group:type:payload} for 0x0E tags and {/group:type:payload} for 0x0F tags, with the payload in hex.
+        The payload is left out when it's empty, e.g. {0:3:ffff0000} or {/0:3}.
+    """
+    end = '/' if command.tag == 0x0F else ''
+    payload = ':' + command.payload.hex() if command.payload else ''
+    return f"{{{end}{command.group}:{command.type}{payload}}}"
+
+def format_text(components):
+    """Returns the source form of the components of a text"""
+    parts = []
+    for component in components:
+        if component.type == 'command':
+            parts.append(format_command(component.data))
+        else:
+            parts.append(component.data.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}').replace('\r', '\\r'))
+    # lines that start with [ would be read as the start of an entry
+    return re.sub(r'^\[', r'\\[', ''.join(parts), flags=re.MULTILINE)
+
+def parse_text(text):
+    """Returns the components of a text in source form, raising a ValueError if it's malformed"""
+    try:
+        return _parse_text(text)
+    except ValueError as e:
+        message, position = e.args
+        raise ValueError(f"{message} at character {position}") from None
+
+def _parse_text(text):
+    """parse_text, with the message and the position of the error as the arguments of the ValueError"""
+    if '{' not in text and '}' not in text and '\\' not in text:
+        return [TextComponent(text)] if text else []
+    components = []
+    run = []
+    position = 0
+    for match in _TOKEN.finditer(text):
+        run.append(text[position:match.start()])
+        position = match.end()
+        escaped, end, group, type, payload = match.groups()
+        if escaped is not None:
+            if escaped not in _ESCAPES:
+                raise ValueError(f"Unknown escape '\\{escaped}'", match.start())
+            run.append(_ESCAPES[escaped])
+        elif group is not None:
+            group, type = int(group), int(type)
+            if group > 0xFFFF or type > 0xFFFF or len(payload or '') % 2:
+                raise ValueError(f"Invalid text command '{match.group()}'", match.start())
+            if ''.join(run):
+                components.append(TextComponent(''.join(run)))
+            run = []
+            command = TextCommand.from_state((0x0F if end else 0x0E, group, type, bytes.fromhex(payload or ''), None, None))
+            components.append(TextComponent(command, 'command'))
+        else:
+            raise ValueError(f"Unescaped '{match.group()}'", match.start())
+    run.append(text[position:])
+    if ''.join(run):
+        components.append(TextComponent(''.join(run)))
+    return components
+
+class TextSource:
+    """
+    A human-editable text source of a msbt file.
+
+        entries: A list of (label, components) pairs
+        base (optional): The path of a msbt file that the entries are applied to, relative to the source file.
+            Its labels, attributes and other sections are kept, and labels that aren't in the source keep their text.
+        byte_order, encoding, version: The format of the built file when there's no base
+        path: The path of the source file, None if it wasn't read from a file
+
+    A source file starts with settings lines such as 'encoding = utf-16' and '#' comments, followed by the entries.
+    Every entry starts with its label in square brackets on its own line, and its text is every line until the next
+    entry. Text commands are written as {group:type:payload}, see format_command, and backslashes, braces and carriage
+    returns in the text are escaped as \\\\, \\{, \\} and \\r.
+
+        # Attachment.msbt
+        base = ../../base/ActorMsg/Attachment.msbt
+
+        [Item_Enemy_223_Adjective]
+        {0:3:ffff0000}Spiky{/0:3}
+        second line
+    """
+    def __init__(self, entries=None, base=None, byte_order=LITTLE_ENDIAN, encoding=UTF16, version=3, path=None):
+        self.entries = entries if entries is not None else []
+        self.base = base
+        self.byte_order = byte_order
+        self.encoding = encoding
+        self.version = version
+        self.path = path
+
+    @classmethod
+    def parse(cls, text, path=None):
+        """Parses the contents of a source file, raising a ValueError with the line number if it's malformed"""
+        source = cls(path=path)
+        name = path or '<text>'
+        headers = list(_ENTRY_HEADER.finditer(text))
+
+        # settings before the first entry
+        preamble = text[:headers[0].start()] if headers else text
+        for number, line in enumerate(preamble.split('\n'), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, separator, value = (part.strip() for part in line.partition('='))
+            try:
+                if not separator:
+                    raise ValueError(f"Expected 'key = value' or an entry, got {line!r}")
+                source._set(key, value)
+            except ValueError as e:
+                raise ValueError(f"{name}:{number}: {e}") from None
+
+        seen = set()
+        for i, header in enumerate(headers):
+            label = header.group(1)
+            if label in seen:
+                raise ValueError(f"{name}:{_line(text, header.start())}: Duplicate label {label}")
+            seen.add(label)
+
+            # the text ends with the newline before the next entry
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+            body = text[header.end() + 1:end]
+            if body.endswith('\n'):
+                body = body[:-1]
+            try:
+                source.entries.append((label, _parse_text(body)))
+            except ValueError as e:
+                message, position = e.args
+                error_line = _line(text, header.end() + 1 + position)
+                raise ValueError(f"{name}:{error_line}: {label}: {message}") from None
+        return source
+
+    @classmethod
+    def from_bytes(cls, data, path=None):
+        """Parses the contents of a source file as UTF-8, with any kind of line endings"""
+        text = str(data, 'utf-8-sig', 'surrogatepass')
+        return cls.parse(text.replace('\r\n', '\n').replace('\r', '\n'), path)
+
+    def _set(self, key, value):
+        if key == 'base':
+            self.base = value
+        elif key == 'byte_order' and value in _BYTE_ORDERS:
+            self.byte_order = _BYTE_ORDERS[value]
+        elif key == 'encoding' and value in _ENCODINGS:
+            self.encoding = _ENCODINGS[value]
+        elif key == 'version' and value.isdigit():
+            self.version = int(value)
+        else:
+            raise ValueError(f"Invalid setting {key} = {value}")
+
+    def format(self):
+        """Returns the contents of the source file"""
+        byte_order = next(name for name, value in _BYTE_ORDERS.items() if value == self.byte_order)
+        encoding = next(name for name, value in _ENCODINGS.items() if value == self.encoding)
+        lines = [f"byte_order = {byte_order}", f"encoding = {encoding}", f"version = {self.version}"]
+        if self.base is not None:
+            lines.append(f"base = {self.base}")
+        lines.append('')
+        for label, components in self.entries:
+            lines.append(f"[{label}]")
+            lines.append(format_text(components))
+        return '\n'.join(lines) + '\n'
+
+    def to_msbt(self, base=None):
+        """
+        Returns a MSBTFile with the entries of the source.
+
+            base (optional): The MSBTFile of self.base, which is edited in place. A new file is created if it's not given.
+
+        Texts that are the same as in the base are left untouched, the rest are encoded once and stored as raw bytes.
+        """
+        msbt = base if base is not None else MSBTFile.new(self.byte_order, self.encoding, self.version)
+        txt2 = msbt.TXT2
+        codec = msbt.header.codec
+        if msbt.LBL1.index is None:
+            msbt.build_label_index()
+        for label, components in self.entries:
+            index = msbt.LBL1.find_label(label)
+            if index is None:
+                msbt.add_entry(label, components)
+                continue
+            encoded = encode_text_string(components, codec)
+            if not txt2.matches_raw(index) or encoded != txt2.get_raw(index):
+                txt2.set_raw(index, encoded)
+        return msbt
+
+    @classmethod
+    def from_msbt(cls, msbt, base=None):
+        """Creates a TextSource of every entry of a MSBTFile, in text order"""
+        header = msbt.header
+        labels = sorted(msbt.LBL1.labels, key=lambda label: label.string_index)
+        entries = [(label.data, msbt.TXT2.get_text(label.string_index)) for label in labels]
+        return cls(entries, base, header.byte_order, header.encoding, header.version)
+
+    def __str__(self):
+        return f"(path: {self.path}, base: {self.base}, entries: {len(self.entries)})"
+    def __repr__(self):
+        return self.__str__()
+
+def read_text_file(path):
+    """Reads a TextSource from a source file"""
+    with open(path, 'rb') as f:
+        return TextSource.from_bytes(f.read(), path)
+
+def write_text_file(msbt, path, base=None):
+    """Writes the entries of a MSBTFile to a source file, see TextSource.from_msbt"""
+    with open(path, 'w', encoding='utf-8', errors='surrogatepass', newline='\n') as f:
+        f.write(TextSource.from_msbt(msbt, base).format())
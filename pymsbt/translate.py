@@ -0,0 +1,181 @@
+import asyncio
+import sqlite3
+import time
+
+from .classes import TextComponent
+
+class TranslationMemory:
+    """
+    A persistent map between source strings and their transformed strings, stored in a sqlite database.
+
+        path: The path of the database file, it's created if it doesn't exist. Defaults to an in-memory database.
+        namespace: Keeps the strings of different transforms apart in the same database, such as the target language
+
+    Strings are saved as soon as they are added, so an interrupted run only has to transform the strings it didn't get to.
+    """
+    def __init__(self, path=':memory:', namespace=''):
+        self.path = path
+        self.namespace = namespace
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS memory (namespace TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, '
+            'PRIMARY KEY (namespace, source)) WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    def get_many(self, sources):
+        """Returns a map between the sources that are in the memory and their transformed strings"""
+        sources = list(sources)
+        found = {}
+        # stay below the sqlite limit of variables in a query
+        for start in range(0, len(sources), 500):
+            chunk = sources[start:start + 500]
+            rows = self.connection.execute(
+                f'SELECT source, target FROM memory WHERE namespace = ? AND source IN ({",".join("?" * len(chunk))})',
+                [self.namespace, *chunk]
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, pairs):
+        """Adds (source, target) pairs to the memory, replacing existing ones"""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO memory (namespace, source, target) VALUES (?, ?, ?)',
+                [(self.namespace, source, target) for source, target in pairs]
+            )
+
+    def get(self, source):
+        """Returns the transformed string of source, or None if it isn't in the memory"""
+        return self.get_many([source]).get(source)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM memory WHERE namespace = ?', (self.namespace,)).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class TransformStats:
+    """
+    Statistics of a TextTransform run.
+
+        runs: The number of text runs that were found
+        unique: The number of distinct strings among them
+        cached: The number of distinct strings that were already in the translation memory
+        requested: The number of strings sent to the callback
+        batches: The number of calls to the callback
+        changed_texts: The number of texts that were changed
+        seconds: The wall clock time of the run
+    """
+    def __init__(self):
+        self.runs = 0
+        self.unique = 0
+        self.cached = 0
+        self.requested = 0
+        self.batches = 0
+        self.changed_texts = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"(runs: {self.runs}, unique: {self.unique}, cached: {self.cached}, requested: {self.requested}, "
+                f"batches: {self.batches}, changed_texts: {self.changed_texts}, seconds: {self.seconds:.2f})")
+    def __repr__(self):
+        return self.__str__()
+
+def _is_translatable(run):
+    """Runs with only whitespace, such as line breaks between text commands, are left as they are"""
+    return bool(run.strip())
+
+class TextTransform:
+    """
+    Runs every plain text run in msbt files through an async callback, such as a translator api.
+
+        callback: An async function that takes a list of strings and returns a list of transformed strings in the same order
+        memory (optional): A TranslationMemory that strings are looked up in before calling the callback, and saved to after
+        batch_size: The maximum amount of strings passed to one call of the callback
+        concurrency: The maximum amount of calls of the callback running at once
+
+    Identical strings are only transformed once, across all files. Text commands are left untouched, only the text
+    between them is changed, and texts without a changed run are left as they are.
+    """
+    def __init__(self, callback, memory=None, batch_size=64, concurrency=4):
+        if batch_size < 1 or concurrency < 1:
+            raise ValueError("batch_size and concurrency must be at least 1")
+        self.callback = callback
+        self.memory = memory
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.stats = TransformStats()
+
+    async def run(self, msbt_files):
+        """Transforms the texts of a MSBTFile or a list of MSBTFiles in place, returning the TransformStats of the run"""
+        if not isinstance(msbt_files, (list, tuple)):
+            msbt_files = [msbt_files]
+        self.stats = stats = TransformStats()
+        start = time.perf_counter()
+
+        # collect the distinct runs of every file
+        sources = {}
+        for msbt in msbt_files:
+            for text in msbt.TXT2.texts:
+                for component in text:
+                    if component.type == 'text' and _is_translatable(component.data):
+                        stats.runs += 1
+                        sources[component.data] = None
+        stats.unique = len(sources)
+
+        if self.memory is not None:
+            found = self.memory.get_many(sources)
+            sources.update(found)
+            stats.cached = len(found)
+
+        missing = [source for source, target in sources.items() if target is None]
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def transform_batch(batch):
+            async with semaphore:
+                targets = await self.callback(batch)
+            targets = list(targets)
+            if len(targets) != len(batch):
+                raise ValueError(f"The transform callback returned {len(targets)} strings for a batch of {len(batch)}")
+            stats.batches += 1
+            stats.requested += len(batch)
+            pairs = list(zip(batch, targets))
+            sources.update(pairs)
+            if self.memory is not None:
+                self.memory.put_many(pairs)
+
+        await asyncio.gather(*(transform_batch(batch) for batch in batches))
+
+        # replace the runs, leaving text commands and unchanged texts as they are
+        for msbt in msbt_files:
+            texts = msbt.TXT2.texts
+            for index in range(len(texts)):
+                text = texts[index]
+                changed = False
+                components = []
+                for component in text:
+                    if component.type == 'text' and component.data in sources:
+                        target = sources[component.data]
+                        if target != component.data:
+                            component = TextComponent(target)
+                            changed = True
+                    components.append(component)
+                if changed:
+                    texts[index] = components
+                    stats.changed_texts += 1
+
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+def transform_texts(msbt_files, callback, memory=None, batch_size=64, concurrency=4):
+    """Runs a TextTransform from synchronous code, see TextTransform for the arguments"""
+    return asyncio.run(TextTransform(callback, memory, batch_size, concurrency).run(msbt_files))
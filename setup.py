@@ -13,4 +13,10 @@ setup(
     install_requires=[
         #none
     ],
+    extras_require={
+        'zstd': ['zstandard'], # zstd compressed SARC archives
+    },
+    entry_points={
+        'console_scripts': ['pymsbt=pymsbt.__main__:main'],
+    },
 )
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# run against the checkout, the benchmarks package has the generator of synthetic files
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SyntheticMSBT
+
+@pytest.fixture
+def synthetic():
+    """Returns a function that generates the bytes of a synthetic msbt file, see SyntheticMSBT for the settings"""
+    def generate(label_count=200, **settings):
+        return SyntheticMSBT(label_count, **settings).generate()
+    return generate
@@ -0,0 +1,119 @@
+import copy
+import pickle
+import struct
+
+import pytest
+
+from pymsbt.classes import AttributeLayout, TextComponent
+from pymsbt.msbt import MSBTFile
+
+LAYOUT = AttributeLayout([('speaker', 'B'), ('window', 'B'), ('flags', 'H')])
+
+def records(msbt):
+    section = msbt.ATR1
+    return [bytes(section.get_record(i)) for i in range(section.entry_count)]
+
+@pytest.mark.parametrize('big_endian', [False, True], ids=['little', 'big'])
+def test_read(synthetic, big_endian):
+    data = synthetic(big_endian=big_endian)
+    msbt = MSBTFile.from_bytes(data, attribute_layout=LAYOUT)
+    endian = '>' if big_endian else '<'
+    assert msbt.ATR1.entry_size == 4 and len(msbt.ATR1) == len(msbt.TXT2.texts)
+    # the records are read in place
+    assert msbt.ATR1.records.obj is data
+
+    for label in msbt.LBL1.labels[:20]:
+        record = msbt.get_attributes(label.data)
+        raw = bytes(record.raw)
+        speaker, window, flags = struct.unpack(endian + 'BBH', raw)
+        assert record.index == label.string_index
+        assert (record.speaker, record.window, record.flags) == (speaker, window, flags)
+        assert record.values() == {'speaker': speaker, 'window': window, 'flags': flags}
+        assert str(record) == f"(index: {record.index}, {record.values()})"
+
+def test_layout_byte_order(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(), attribute_layout=AttributeLayout([('flags', 'H'), ('value', 'H')], byte_order='>'))
+    record = msbt.ATR1[0]
+    assert (record.flags, record.value) == struct.unpack('>HH', bytes(record.raw))
+
+def test_without_layout(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic())
+    record = msbt.ATR1[-1]
+    assert record.index == len(msbt.ATR1) - 1
+    assert str(record) == f"(index: {record.index}, raw: 0x{bytes(record.raw).hex()})"
+    with pytest.raises(AttributeError):
+        record.speaker
+
+def test_invalid_layout(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(), attribute_layout=AttributeLayout([('speaker', 'I'), ('window', 'I')]))
+    with pytest.raises(ValueError):
+        msbt.ATR1.get(0)
+    with pytest.raises(AttributeError):
+        MSBTFile.from_bytes(synthetic(), attribute_layout=LAYOUT).ATR1[0].unknown
+
+@pytest.mark.parametrize('big_endian', [False, True], ids=['little', 'big'])
+@pytest.mark.parametrize('incremental', [True, False])
+def test_write_unchanged(synthetic, big_endian, incremental):
+    data = synthetic(big_endian=big_endian)
+    msbt = MSBTFile.from_bytes(data, attribute_layout=LAYOUT)
+    msbt.get_attributes(msbt.LBL1.labels[0].data).flags # reading doesn't copy the records
+    assert not msbt.ATR1.dirty
+    assert msbt.to_bytes(incremental=incremental) == data
+
+@pytest.mark.parametrize('big_endian', [False, True], ids=['little', 'big'])
+def test_write_edited(synthetic, big_endian):
+    data = synthetic(big_endian=big_endian)
+    msbt = MSBTFile.from_bytes(data, attribute_layout=LAYOUT)
+    before = records(msbt)
+    label = msbt.LBL1.labels[3].data
+    record = msbt.get_attributes(label)
+    record.speaker = 7
+    record.flags = 0x1234
+    assert msbt.ATR1.dirty
+    # the file data isn't changed
+    assert MSBTFile.from_bytes(data).ATR1.get_record(record.index) == before[record.index]
+
+    written = MSBTFile.from_bytes(msbt.to_bytes(), attribute_layout=LAYOUT)
+    edited = written.get_attributes(label)
+    assert (edited.speaker, edited.window, edited.flags) == (7, before[record.index][1], 0x1234)
+    assert bytes(edited.raw) == struct.pack(('>' if big_endian else '<') + 'BBH', 7, before[record.index][1], 0x1234)
+    expected = list(before)
+    expected[record.index] = bytes(edited.raw)
+    assert records(written) == expected
+
+def test_add_and_remove_records(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(), attribute_layout=LAYOUT)
+    before = records(msbt)
+    msbt.add_entry('Added', [TextComponent('added')], attributes=b'\x01\x02\x03\x04')
+    msbt.add_entry('Zeros', [TextComponent('zeros')])
+    with pytest.raises(ValueError):
+        msbt.add_entry('Short', [TextComponent('short')], attributes=b'\x01')
+    removed = msbt.LBL1.labels[0]
+    msbt.remove_entry(removed.data)
+
+    written = MSBTFile.from_bytes(msbt.to_bytes(), attribute_layout=LAYOUT)
+    expected = [record for i, record in enumerate(before) if i != removed.string_index] + [b'\x01\x02\x03\x04', bytes(4)]
+    assert records(written) == expected
+    assert bytes(written.get_attributes('Added').raw) == b'\x01\x02\x03\x04'
+
+@pytest.mark.parametrize('clone', [lambda msbt: pickle.loads(pickle.dumps(msbt)), copy.deepcopy], ids=['pickle', 'deepcopy'])
+@pytest.mark.parametrize('edit', ['none', 'field', 'append'])
+def test_copy(synthetic, clone, edit):
+    data = synthetic(big_endian=True)
+    msbt = MSBTFile.from_bytes(data, attribute_layout=LAYOUT)
+    if edit == 'field':
+        msbt.ATR1[0].flags = 0xBEEF
+    elif edit == 'append':
+        msbt.add_entry('Added', [TextComponent('added')], attributes=b'\x01\x02\x03\x04')
+    speaker = msbt.ATR1[1].speaker
+    copied = clone(msbt)
+    assert records(copied) == records(msbt)
+    assert copied.to_bytes() == msbt.to_bytes()
+
+    # edits of the copy don't change the original
+    copied.ATR1[1].speaker = speaker ^ 0xFF
+    assert copied.ATR1[1].speaker == speaker ^ 0xFF
+    assert msbt.ATR1[1].speaker == speaker
+    copied.add_entry('Copied', [TextComponent('copied')], attributes=b'\x05\x06\x07\x08')
+    assert bytes(copied.get_attributes('Copied').raw) == b'\x05\x06\x07\x08'
+    assert len(copied.ATR1) == len(msbt.ATR1) + 1
@@ -0,0 +1,72 @@
+import os
+import threading
+
+import pytest
+
+from pymsbt.batch import MSBTBatch
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile
+
+def write_tree(tmp_path, synthetic, count):
+    source = tmp_path / 'msbt'
+    (source / 'sub').mkdir(parents=True)
+    for i in range(count):
+        with open(source / 'sub' / f'{i}.msbt', 'wb') as f:
+            f.write(synthetic(20, seed=i))
+    return str(source)
+
+def edit_in_place(msbt):
+    msbt.text_labels[msbt.LBL1.labels[0].data].append(TextComponent(' edited'))
+    return msbt.TXT2.offset_count
+
+def set_first_text(msbt):
+    msbt.set_text(msbt.LBL1.labels[0].data, [TextComponent('first')])
+    # the texts that will be copied instead of encoded when writing
+    return sum(msbt.TXT2.matches_raw(index) for index in range(msbt.TXT2.offset_count))
+
+def unpicklable_value(msbt):
+    if msbt.filepath.endswith('1.msbt'):
+        return threading.Lock()
+    return 1
+
+def crash(msbt):
+    if msbt.filepath.endswith('2.msbt'):
+        os._exit(1)
+    return 1
+
+def test_in_place_edits_are_written(tmp_path, synthetic):
+    source = write_tree(tmp_path, synthetic, 3)
+    results = MSBTBatch(source, edit_in_place, output=str(tmp_path / 'out'), workers=2).run()
+    assert all(result.ok for result in results) and [result.value for result in results] == [20] * 3
+    for result in results:
+        written = MSBTFile(result.output)
+        # the appended run is read back merged with the run before it
+        assert written.text_labels[written.LBL1.labels[0].data][-1].data.endswith(' edited')
+
+def test_written_files_copy_untouched_texts(tmp_path, synthetic):
+    source = write_tree(tmp_path, synthetic, 2)
+    results = MSBTBatch(source, set_first_text, output=str(tmp_path / 'out'), workers=1).run()
+    assert [result.value for result in results] == [19, 19]
+    for result in results:
+        written = MSBTFile(result.output)
+        assert written.text_labels[written.LBL1.labels[0].data][0].data == 'first'
+
+def test_unpicklable_value(tmp_path, synthetic):
+    source = write_tree(tmp_path, synthetic, 3)
+    batch = MSBTBatch(source, unpicklable_value, workers=2)
+    results = batch.run()
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].path.endswith('1.msbt')
+    assert batch.stats.failed == 1
+
+@pytest.mark.parametrize('max_in_flight', [2, 4, 8])
+def test_worker_crash(tmp_path, synthetic, max_in_flight):
+    source = write_tree(tmp_path, synthetic, 8)
+    batch = MSBTBatch(source, crash, workers=2, max_in_flight=max_in_flight)
+    results = batch.run()
+    assert [result.path for result in results] == [path for path, _ in batch.files]
+    # the files that were in flight with the crashing one are run again, only the file that crashed fails
+    assert [result.ok for result in results] == [True, True, False, True, True, True, True, True]
+    assert 'BrokenProcessPool' in results[2].error
+    assert [result.value for result in results if result.ok] == [1] * 7
+    assert batch.stats.failed == 1
@@ -0,0 +1,49 @@
+import os
+import pickle
+
+from pymsbt.cache import ParseCache
+from pymsbt.msbt import MSBTFile
+
+def write_file(tmp_path, name, data):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def test_warm_load(synthetic, tmp_path):
+    path = write_file(tmp_path, 'a.msbt', synthetic())
+    cache = ParseCache(str(tmp_path / 'cache'))
+    cold = cache.load(path)
+    for lazy in (False, True):
+        warm = cache.load(path, lazy=lazy)
+        assert warm.TXT2.get_state() == cold.TXT2.get_state()
+        assert warm.to_bytes() == MSBTFile(path).to_bytes()
+    assert (cache.hits, cache.misses) == (2, 1)
+
+class Exploit:
+    def __reduce__(self):
+        return (os.system, ('touch exploited',))
+
+def test_entries_cant_run_code(synthetic, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = write_file(tmp_path, 'a.msbt', synthetic())
+    cache = ParseCache(str(tmp_path / 'cache'))
+    entry_path = cache._entry_path(open(path, 'rb').read())
+    with open(entry_path, 'wb') as f:
+        pickle.dump({'TXT2': Exploit()}, f)
+
+    cache.load(path)
+    assert not os.path.exists(tmp_path / 'exploited')
+    assert cache.misses == 1
+
+def test_evict(synthetic, tmp_path):
+    paths = [write_file(tmp_path, f'{seed}.msbt', synthetic(seed=seed)) for seed in range(6)]
+    cache = ParseCache(str(tmp_path / 'cache'), max_size=None)
+    cache.load(paths[0])
+    entry_size = cache.size()
+
+    cache = ParseCache(str(tmp_path / 'cache'), max_size=int(entry_size * 3.5))
+    for path in paths:
+        cache.load(path)
+    assert cache.size() <= cache.max_size
+    assert len(os.listdir(tmp_path / 'cache')) >= 2
@@ -0,0 +1,67 @@
+import copy
+import itertools
+import pickle
+
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.codec import BIG_ENDIAN, LITTLE_ENDIAN, UTF8, UTF16, UTF32, get_codec
+from pymsbt.msbt import MSBTFile, iter_entries
+
+FORMATS = list(itertools.product([False, True], [UTF8, UTF16, UTF32]))
+IDS = [f"{'big' if big_endian else 'little'}-{encoding}" for big_endian, encoding in FORMATS]
+
+@pytest.mark.parametrize('big_endian, encoding', FORMATS, ids=IDS)
+@pytest.mark.parametrize('lazy', [False, True])
+def test_round_trip(synthetic, big_endian, encoding, lazy):
+    data = synthetic(big_endian=big_endian, encoding=encoding)
+    msbt = MSBTFile.from_bytes(data, lazy=lazy)
+    assert msbt.header.byte_order == (BIG_ENDIAN if big_endian else LITTLE_ENDIAN)
+    assert msbt.header.encoding == encoding
+    assert msbt.to_bytes() == data
+    assert msbt.to_bytes(incremental=False) == data
+
+@pytest.mark.parametrize('big_endian, encoding', FORMATS, ids=IDS)
+def test_edit_round_trip(synthetic, big_endian, encoding):
+    msbt = MSBTFile.from_bytes(synthetic(big_endian=big_endian, encoding=encoding))
+    label = msbt.LBL1.labels[0].data
+    command = next(c for text in msbt.TXT2.texts for c in text if c.type == 'command')
+    msbt.set_text(label, [TextComponent('Ünïcode 😀 '), command, TextComponent('end')])
+
+    written = MSBTFile.from_bytes(msbt.to_bytes())
+    text = written.text_labels[label]
+    assert [c.data for c in text if c.type == 'text'] == ['Ünïcode 😀 ', 'end']
+    assert (text[1].data.tag, text[1].data.group, text[1].data.type, text[1].data.payload) == (command.data.tag, command.data.group, command.data.type, command.data.payload)
+    assert [str(c) for c in written.TXT2.texts[1:]] == [str(c) for c in msbt.TXT2.texts[1:]]
+
+def test_byte_order_values(synthetic):
+    # the byte order mark as read in little endian, like before the codec layer
+    assert MSBTFile.from_bytes(synthetic()).header.byte_order == 0xFEFF
+    assert MSBTFile.from_bytes(synthetic(big_endian=True)).header.byte_order == 0xFFFE
+
+@pytest.mark.parametrize('byte_order', [LITTLE_ENDIAN, BIG_ENDIAN])
+@pytest.mark.parametrize('encoding', [UTF8, UTF16, UTF32])
+def test_new(byte_order, encoding):
+    msbt = MSBTFile.new(byte_order, encoding)
+    msbt.add_entry('Label', [TextComponent('text')])
+    data = msbt.to_bytes()
+    assert data[8:10] == (b'\xFF\xFE' if byte_order == LITTLE_ENDIAN else b'\xFE\xFF')
+    assert [(label, ''.join(c.data for c in text)) for label, text in iter_entries(data)] == [('Label', 'text')]
+
+@pytest.mark.parametrize('big_endian, encoding', FORMATS, ids=IDS)
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.parametrize('clone', [lambda msbt: pickle.loads(pickle.dumps(msbt)), copy.deepcopy], ids=['pickle', 'deepcopy'])
+def test_copy(synthetic, big_endian, encoding, lazy, clone):
+    data = synthetic(big_endian=big_endian, encoding=encoding, extra_sections=('TSY1',))
+    msbt = MSBTFile.from_bytes(data, lazy=lazy)
+    msbt.TXT2.texts[1] # one text decoded in lazy files
+    copied = clone(msbt)
+    assert copied.header.codec is get_codec(msbt.header.byte_order, encoding)
+    assert copied.to_bytes() == data
+
+    # the copy is edited independently and its texts can still be filled
+    label = msbt.LBL1.labels[0].data
+    copied.set_text(label, [TextComponent('copied')])
+    copied.TXT2.decode_range(0, len(copied.TXT2.texts))
+    assert copied.get_text(label)[0].data == 'copied'
+    assert msbt.to_bytes() == data
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from pymsbt.classes import TextCommand, TextComponent
+from pymsbt.codec import BIG_ENDIAN, UTF8
+from pymsbt.diff import ChangeSet, diff, port
+from pymsbt.msbt import MSBTFile
+from pymsbt.textfile import format_text
+
+def texts(msbt):
+    return {label.data: format_text(msbt.TXT2.get_text(label.string_index)) for label in msbt.LBL1.labels}
+
+@pytest.fixture
+def versions(synthetic):
+    """The data of an old and a new version of a file, and the labels that were added, removed and changed"""
+    old_data = synthetic(60)
+    msbt = MSBTFile.from_bytes(old_data)
+    labels = [label.data for label in msbt.LBL1.labels]
+    changed = labels[0]
+    msbt.set_text(changed, [TextComponent('changed text')])
+
+    # a text where only the payload of a command changes
+    command_only = next(label for label in labels[1:] if any(c.type == 'command' and c.data.payload for c in msbt.get_text(label)))
+    components = []
+    for component in msbt.get_text(command_only):
+        if component.type == 'command' and component.data.payload:
+            command = component.data
+            payload = bytes([command.payload[0] ^ 0xFF]) + command.payload[1:]
+            component = TextComponent(TextCommand.from_state((command.tag, command.group, command.type, payload, None, None)), 'command')
+        components.append(component)
+    msbt.set_text(command_only, components)
+
+    msbt.remove_entry(labels[-1])
+    msbt.add_entry('Added_Label', [TextComponent('added text')])
+    return old_data, msbt.to_bytes(), {'added': {'Added_Label'}, 'removed': {labels[-1]}, 'changed': {changed, command_only}}
+
+@pytest.fixture
+def translation(versions):
+    """A translation of the old version, with the text of one unchanged label missing"""
+    msbt = MSBTFile.from_bytes(versions[0])
+    msbt.map_text(lambda string: 'T:' + string)
+    missing = msbt.LBL1.labels[10].data
+    msbt.remove_entry(missing)
+    return MSBTFile.from_bytes(msbt.to_bytes(), lazy=True), missing
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_diff(versions, lazy):
+    old_data, new_data, expected = versions
+    old, new = MSBTFile.from_bytes(old_data, lazy=lazy), MSBTFile.from_bytes(new_data, lazy=lazy)
+    changes = diff(old, new)
+    assert (changes.added, changes.removed, changes.changed) == (expected['added'], expected['removed'], expected['changed'])
+    assert changes.unchanged == len(new.LBL1.labels) - 3
+    assert changes
+
+    assert not diff(old, MSBTFile.from_bytes(old_data))
+    if lazy:
+        # nothing was decoded
+        assert not any(new.TXT2.texts.is_loaded(index) for index in range(new.TXT2.offset_count))
+
+def test_change_set_dict(versions):
+    old_data, new_data, _ = versions
+    changes = diff(MSBTFile.from_bytes(old_data), MSBTFile.from_bytes(new_data))
+    data = json.loads(json.dumps(changes.to_dict()))
+    assert data['changed'] == sorted(changes.changed)
+    loaded = ChangeSet.from_dict(data)
+    assert (loaded.added, loaded.removed, loaded.changed, loaded.unchanged) == (changes.added, changes.removed, changes.changed, changes.unchanged)
+    assert str(loaded) == str(changes)
+
+@pytest.mark.parametrize('keep_changed', [False, True])
+def test_port(versions, translation, keep_changed):
+    old_data, new_data, expected = versions
+    translation, missing = translation
+    new = MSBTFile.from_bytes(new_data, lazy=True)
+    changes = diff(MSBTFile.from_bytes(old_data, lazy=True), new)
+    ported, untranslated = port(changes, translation, new, keep_changed=keep_changed)
+
+    assert sorted(untranslated) == sorted(expected['added'] | expected['changed'] | {missing})
+    new_texts, translated_texts = texts(new), texts(translation)
+    written = MSBTFile.from_bytes(ported.to_bytes())
+    for label, text in texts(written).items():
+        if label in expected['added'] or label == missing or label in expected['changed'] and not keep_changed:
+            assert text == new_texts[label]
+        else:
+            assert text == translated_texts[label]
+    # the new version isn't changed
+    assert new.to_bytes() == new_data
+
+    # unchanged texts are copied as encoded bytes
+    for label in ported.LBL1.labels:
+        if label.data not in untranslated:
+            assert label.string_index in ported.TXT2.raw
+            assert not ported.TXT2.texts.is_loaded(label.string_index)
+
+def test_port_other_codec(versions, translation):
+    old_data, new_data, expected = versions
+    translation, missing = translation
+    # the translation in a different byte order and encoding, such as from another platform
+    converted = MSBTFile.new(BIG_ENDIAN, UTF8)
+    for label, text in sorted((label.data, translation.get_text(label.data)) for label in translation.LBL1.labels):
+        converted.add_entry(label, text)
+    converted = MSBTFile.from_bytes(converted.to_bytes())
+
+    new = MSBTFile.from_bytes(new_data)
+    ported, untranslated = port(diff(MSBTFile.from_bytes(old_data), new), converted, new)
+    assert ported.header.codec is new.header.codec
+    assert sorted(untranslated) == sorted(expected['added'] | expected['changed'] | {missing})
+    translated_texts = texts(translation)
+    written = texts(MSBTFile.from_bytes(ported.to_bytes()))
+    for label in set(written) - set(untranslated):
+        assert written[label] == translated_texts[label]
@@ -0,0 +1,84 @@
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile
+
+def text_of(msbt, label):
+    return ''.join(component.data for component in msbt.text_labels[label] if component.type == 'text')
+
+@pytest.fixture
+def edited(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(300), lazy=True)
+    labels = [label.data for label in msbt.LBL1.labels]
+    msbt.add_entry('Custom_Name', [TextComponent('Custom Sword')], attributes=b'\x01\x02\x03\x04')
+    msbt.remove_entry(labels[0])
+    msbt.remove_entry(labels[1])
+    msbt.rename_label(labels[2], 'Renamed_Label')
+    return msbt, labels
+
+def test_add_remove_entry(edited):
+    msbt, labels = edited
+    written = MSBTFile.from_bytes(msbt.to_bytes(), lazy=True)
+
+    assert written.LBL1.find_label(labels[0]) is None and written.LBL1.find_label(labels[1]) is None
+    assert written.LBL1.find_label(labels[2]) is None
+    assert text_of(written, 'Custom_Name') == 'Custom Sword'
+    assert bytes(written.get_attributes('Custom_Name').raw) == b'\x01\x02\x03\x04'
+    assert text_of(written, 'Renamed_Label') == text_of(msbt, 'Renamed_Label')
+    for label in labels[3:]:
+        assert text_of(written, label) == text_of(msbt, label)
+        assert bytes(written.get_attributes(label).raw) == bytes(msbt.get_attributes(label).raw)
+
+    # the texts of the removed labels are dropped, along with their attributes and TSY1 entries
+    assert written.TXT2.offset_count == msbt.TXT2.offset_count - 2
+    assert written.ATR1.entry_count == written.TXT2.offset_count
+    tsy1 = next(section for section in written.sections if section.signature == 'TSY1')
+    assert tsy1.table_size == 4 * written.TXT2.offset_count
+
+def test_writing_doesnt_change_the_file(edited):
+    msbt, _ = edited
+    before = (msbt.TXT2.offset_count, msbt.ATR1.entry_count, list(msbt.LBL1.offset_table),
+              [(label.data, label.string_index) for label in msbt.LBL1.labels],
+              [(section.table_size, bytes(section.bytes or b'')) for section in msbt.sections])
+    data = msbt.to_bytes()
+    assert msbt.to_bytes() == data
+    after = (msbt.TXT2.offset_count, msbt.ATR1.entry_count, list(msbt.LBL1.offset_table),
+             [(label.data, label.string_index) for label in msbt.LBL1.labels],
+             [(section.table_size, bytes(section.bytes or b'')) for section in msbt.sections])
+    assert after == before
+
+    # applying the changes to the file gives the same output
+    msbt.rebuild()
+    assert msbt.to_bytes() == data
+
+def test_remove_shared_text(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(50), lazy=True)
+    first = msbt.LBL1.labels[0]
+    msbt.LBL1.add_label('Shared', first.string_index)
+    msbt.remove_entry(first.data)
+    written = MSBTFile.from_bytes(msbt.to_bytes(), lazy=True)
+    assert written.TXT2.offset_count == msbt.TXT2.offset_count
+    assert text_of(written, 'Shared') == text_of(msbt, 'Shared')
+
+def test_add_entry_errors(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(50))
+    with pytest.raises(ValueError):
+        msbt.add_entry(msbt.LBL1.labels[0].data, [TextComponent('duplicate')])
+    with pytest.raises(KeyError):
+        msbt.remove_entry('Missing_Label')
+
+def test_plain_list_texts(synthetic):
+    # texts replaced with a plain list, like code written before TextList
+    msbt = MSBTFile.from_bytes(synthetic(50))
+    msbt.TXT2.texts = list(msbt.TXT2.texts)
+    labels = [label.data for label in msbt.LBL1.labels]
+    msbt.add_entry('Custom_Name', [TextComponent('Custom Sword')])
+    msbt.add_entry('Custom_Description', [TextComponent('A sword')])
+    msbt.remove_entry(labels[0])
+    assert isinstance(msbt.TXT2.texts, list) and len(msbt.TXT2.texts) == msbt.TXT2.offset_count
+
+    written = MSBTFile.from_bytes(msbt.to_bytes())
+    assert text_of(written, 'Custom_Name') == 'Custom Sword'
+    assert text_of(written, 'Custom_Description') == 'A sword'
+    for label in labels[1:]:
+        assert text_of(written, label) == text_of(msbt, label)
@@ -0,0 +1,49 @@
+import threading
+
+from pymsbt.instrument import add_hook, instrumented, remove_hook
+from pymsbt.msbt import MSBTFile
+
+def test_events(synthetic):
+    data = synthetic()
+    events = []
+    with instrumented(events.append, allocations=True):
+        msbt = MSBTFile.from_bytes(data)
+        msbt.to_bytes()
+    sections = {(event.operation, event.section) for event in events}
+    assert {('parse', 'file'), ('parse', 'TXT2'), ('layout', 'TXT2'), ('pack', 'LBL1')} <= sections
+    parse = next(event for event in events if (event.operation, event.section) == ('parse', 'TXT2'))
+    assert parse.entries == 200 and parse.peak is not None
+
+    events.clear()
+    MSBTFile.from_bytes(data)
+    assert events == []
+
+def test_threads(synthetic):
+    data = synthetic(50)
+    errors = []
+    counts = {}
+    lock = threading.Lock()
+
+    def count(event):
+        with lock:
+            name = threading.current_thread().name
+            counts[name] = counts.get(name, 0) + 1
+
+    def work():
+        try:
+            for _ in range(20):
+                callback = lambda event: None
+                add_hook(callback)
+                MSBTFile.from_bytes(data).to_bytes()
+                remove_hook(callback)
+        except Exception as e:
+            errors.append(e)
+
+    with instrumented(count):
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert errors == []
+    assert len(counts) == 8
@@ -0,0 +1,50 @@
+import io
+import itertools
+
+import pytest
+
+import pymsbt.msbt
+from pymsbt.codec import UTF8, UTF16, UTF32
+from pymsbt.msbt import MSBTFile, iter_entries, iter_text_runs
+from pymsbt.textfile import format_text
+
+SOURCES = {
+    'bytes': lambda data, path: data,
+    'memoryview': lambda data, path: memoryview(data),
+    'file': lambda data, path: io.BytesIO(data),
+    'path': lambda data, path: path,
+}
+
+@pytest.mark.parametrize('big_endian', [False, True], ids=['little', 'big'])
+@pytest.mark.parametrize('encoding', [UTF8, UTF16, UTF32])
+@pytest.mark.parametrize('source', list(SOURCES))
+def test_iter_entries(synthetic, tmp_path, big_endian, encoding, source):
+    data = synthetic(big_endian=big_endian, encoding=encoding)
+    path = tmp_path / 'Attachment.msbt'
+    path.write_bytes(data)
+    text_labels = MSBTFile.from_bytes(data).text_labels
+
+    entries = [(label, format_text(text)) for label, text in iter_entries(SOURCES[source](data, path))]
+    assert len(entries) == len(text_labels)
+    assert dict(entries) == {label: format_text(text) for label, text in text_labels.items()}
+
+    runs = {}
+    for label, run in iter_text_runs(SOURCES[source](data, path)):
+        runs.setdefault(label, []).append(run)
+    expected = {label: [c.data for c in text if c.type == 'text'] for label, text in text_labels.items()}
+    assert runs == {label: text for label, text in expected.items() if text}
+
+def test_early_exit(synthetic, monkeypatch):
+    data = synthetic()
+    decoded = []
+    parse_text_string = pymsbt.msbt.parse_text_string
+    def counting_parse(data, offset, codec):
+        decoded.append(offset)
+        return parse_text_string(data, offset, codec)
+    monkeypatch.setattr(pymsbt.msbt, 'parse_text_string', counting_parse)
+
+    # only the entries that were asked for are decoded
+    first = [(label, format_text(text)) for label, text in itertools.islice(iter_entries(data), 3)]
+    assert len(first) == len(decoded) == 3
+    text_labels = MSBTFile.from_bytes(data).text_labels
+    assert first == [(label, format_text(text_labels[label])) for label, _ in first]
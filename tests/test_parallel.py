@@ -0,0 +1,26 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile
+from pymsbt.parallel import decode_texts
+
+@pytest.mark.parametrize('executor_class', [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_decode_texts(synthetic, executor_class):
+    data = synthetic(3000)
+    expected = MSBTFile.from_bytes(data).TXT2.get_state()
+
+    msbt = MSBTFile.from_bytes(data, lazy=True)
+    msbt.TXT2.texts[3] = [TextComponent('set')]
+    msbt.TXT2.set_raw(4, msbt.TXT2.get_raw(10))
+    with executor_class(2) as executor:
+        decode_texts(msbt.TXT2, 2, chunk_size=700, executor=executor)
+
+    assert msbt.TXT2._cached_texts is None
+    texts = msbt.TXT2.get_state()[2]
+    assert texts[3] == ['set']
+    # command offsets of a replaced text are relative to its own bytes
+    assert [part for part in texts[4] if isinstance(part, str)] == [part for part in expected[2][10] if isinstance(part, str)]
+    assert texts[:3] == expected[2][:3] and texts[5:] == expected[2][5:]
+    assert all(msbt.TXT2.texts.is_loaded(index) for index in range(msbt.TXT2.offset_count))
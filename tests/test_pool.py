@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile
+from pymsbt.pool import MSBTPool, estimate_footprint
+
+class StubLoader:
+    """Returns a new MSBTFile for every path, optionally waiting for release or raising error"""
+    def __init__(self, error=None):
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = []
+
+    def __call__(self, path):
+        self.calls.append(path)
+        self.release.wait()
+        if self.error is not None:
+            raise self.error
+        msbt = MSBTFile.new()
+        msbt.add_entry('Label', [TextComponent(os.path.basename(path))])
+        return msbt
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def get_concurrently(pool, path, count):
+    """Calls pool.get from count threads, returning what each one got or raised"""
+    results = [None] * count
+    def get(index):
+        try:
+            results[index] = pool.get(path)
+        except Exception as e:
+            results[index] = e
+    threads = [threading.Thread(target=get, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_single_flight():
+    loader = StubLoader()
+    loader.release.clear()
+    pool = MSBTPool(loader=loader)
+    threads, results = get_concurrently(pool, 'a.msbt', 8)
+    # every thread asked for the file before the load finished
+    wait_for(lambda: pool.stats().waits == 7)
+    loader.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(loader.calls) == 1
+    assert all(result is results[0] for result in results)
+    assert pool.get_text('a.msbt', 'Label')[0].data == 'a.msbt'
+    stats = pool.stats()
+    assert (stats.misses, stats.waits, stats.hits, stats.failures, stats.files) == (1, 7, 1, 0, 1)
+    assert stats.hit_rate == 8 / 9
+
+def test_failed_load():
+    loader = StubLoader(error=OSError('unreadable'))
+    loader.release.clear()
+    pool = MSBTPool(loader=loader)
+    threads, results = get_concurrently(pool, 'a.msbt', 4)
+    wait_for(lambda: pool.stats().waits == 3)
+    loader.release.set()
+    for thread in threads:
+        thread.join()
+
+    # every waiter gets the error of the load, and the failure isn't cached
+    assert all(isinstance(result, OSError) for result in results)
+    assert len(loader.calls) == 1
+    assert 'a.msbt' not in pool and pool.stats().failures == 1
+    loader.error = None
+    assert pool.get_text('a.msbt', 'Label')[0].data == 'a.msbt'
+    assert len(loader.calls) == 2
+
+def test_lru_eviction():
+    pool = MSBTPool(max_bytes=250, loader=StubLoader(), sizer=lambda msbt: 100)
+    a, b = pool.get('a.msbt'), pool.get('b.msbt')
+    assert pool.get('a.msbt') is a # a is now the most recently used
+    pool.get('c.msbt')
+
+    assert 'a.msbt' in pool and 'b.msbt' not in pool and 'c.msbt' in pool
+    stats = pool.stats()
+    assert (stats.evictions, stats.files, stats.bytes) == (1, 2, 200)
+    assert pool.get('b.msbt') is not b
+
+    # a file bigger than the budget is kept until the next one is loaded
+    big = MSBTPool(max_bytes=50, loader=StubLoader(), sizer=lambda msbt: 100)
+    big.get('a.msbt')
+    assert len(big) == 1
+    big.get('b.msbt')
+    assert 'a.msbt' not in big and 'b.msbt' in big
+
+def test_discard_and_clear():
+    loader = StubLoader()
+    pool = MSBTPool(loader=loader, sizer=lambda msbt: 100)
+    a = pool.get('a.msbt')
+    pool.get('b.msbt')
+
+    assert pool.discard('a.msbt') is True
+    assert pool.discard('a.msbt') is False
+    assert (len(pool), pool.stats().bytes) == (1, 100)
+    assert pool.get('a.msbt') is not a
+    assert pool.stats().misses == 3
+
+    pool.clear()
+    assert (len(pool), pool.stats().bytes) == (0, 0)
+
+def test_files(synthetic, tmp_path):
+    path = tmp_path / 'Attachment.msbt'
+    path.write_bytes(synthetic(50))
+    pool = MSBTPool()
+    msbt = pool.get(str(path))
+    assert msbt.lazy
+    # paths are made absolute, so relative paths find the same file
+    assert pool.get(os.path.relpath(path)) is msbt
+    label = msbt.LBL1.labels[0].data
+    assert pool.get_text(str(path), label) is msbt.get_text(label)
+    with pytest.raises(KeyError):
+        pool.get_text(str(path), 'Missing_Label')
+    assert pool.stats().bytes == estimate_footprint(msbt) > len(msbt.data)
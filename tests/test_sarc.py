@@ -0,0 +1,84 @@
+import struct
+
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.sarc import HASH_KEY, SARC_MAGIC, SARCArchive, sarc_hash
+
+def empty_archive(endian='<'):
+    """Returns the bytes of a SARC archive without members"""
+    bom = b'\xFF\xFE' if endian == '<' else b'\xFE\xFF'
+    data = bytearray(0x28)
+    struct.pack_into(endian + '4sH2sIIHH', data, 0, SARC_MAGIC, 0x14, bom, len(data), len(data), 0x100, 0)
+    struct.pack_into(endian + '4sHHI', data, 0x14, b'SFAT', 0x0C, 0, HASH_KEY)
+    struct.pack_into(endian + '4sHH', data, 0x20, b'SFNT', 8, 0)
+    return bytes(data)
+
+def make_archive(members, endian='<', compress=False):
+    archive = SARCArchive(empty_archive(endian))
+    for name, data in members.items():
+        archive.replace(name, data)
+    return archive.repack(compress=compress)
+
+@pytest.fixture
+def members(synthetic):
+    return {
+        'ActorMsg/Attachment.msbt': synthetic(label_count=50, seed=1),
+        'ActorMsg/Enemy.msbt': synthetic(label_count=80, seed=2, big_endian=True),
+        'Layout/Font.bin': b'\x01\x02\x03',
+    }
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+def test_read_members(members, endian):
+    with SARCArchive(make_archive(members, endian)) as archive:
+        assert archive.endian == endian
+        assert sorted(archive.names()) == sorted(members)
+        assert sorted(archive.msbt_names()) == sorted(name for name in members if name.endswith('.msbt'))
+        for name, data in members.items():
+            assert bytes(archive.read(name)) == data
+            assert archive.members[name].name_hash == sarc_hash(name)
+        for name, msbt in archive.iter_msbt():
+            assert msbt.to_bytes() == members[name]
+
+def test_repack_unchanged(members):
+    data = make_archive(members)
+    with SARCArchive(data) as archive:
+        assert archive.repack() == data
+
+def test_replace_msbt(members, tmp_path):
+    name = 'ActorMsg/Attachment.msbt'
+    path = tmp_path / 'Msg_USen.product.sarc'
+    with SARCArchive(make_archive(members)) as archive:
+        msbt = archive.open_msbt(name)
+        label = msbt.LBL1.labels[0].data
+        msbt.set_text(label, [TextComponent('Replaced')])
+        archive.replace(name, msbt)
+        archive.replace('ActorMsg/New.msbt', members['ActorMsg/Enemy.msbt'])
+        archive.repack(path)
+
+    with SARCArchive(path) as archive:
+        assert len(archive) == len(members) + 1
+        assert archive.open_msbt(name).get_text(label)[0].data == 'Replaced'
+        for other in ('ActorMsg/Enemy.msbt', 'Layout/Font.bin'):
+            assert bytes(archive.read(other)) == members[other]
+        assert bytes(archive.read('ActorMsg/New.msbt')) == members['ActorMsg/Enemy.msbt']
+        # members keep the alignment of msbt data
+        assert all(member.start % 0x80 == 0 for member in archive.members.values())
+
+def test_compressed_round_trip(members, tmp_path):
+    pytest.importorskip('zstandard')
+    path = tmp_path / 'Msg_USen.product.sarc.zs'
+    data = make_archive(members, compress=True)
+    with SARCArchive(data) as archive:
+        assert archive.compressed
+        archive.replace('Layout/Font.bin', b'\x04\x05')
+        archive.repack(path)
+
+    with SARCArchive(path) as archive:
+        assert archive.compressed
+        assert bytes(archive.read('Layout/Font.bin')) == b'\x04\x05'
+        assert bytes(archive.read('ActorMsg/Enemy.msbt')) == members['ActorMsg/Enemy.msbt']
+
+def test_invalid_archive():
+    with pytest.raises(ValueError):
+        SARCArchive(b'MSGStdBn' + bytes(0x20))
@@ -0,0 +1,53 @@
+import pathlib
+import re
+
+import pytest
+
+from pymsbt import literals
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile, iter_text_runs
+from pymsbt.search import COMMAND_MARK, SearchIndex
+
+@pytest.fixture
+def corpus(tmp_path, synthetic):
+    directory = tmp_path / 'msbt'
+    directory.mkdir()
+    for seed in range(3):
+        msbt = MSBTFile.from_bytes(synthetic(100, seed=seed), lazy=True)
+        msbt.set_text(msbt.LBL1.labels[seed].data, [TextComponent('the Master Sword')])
+        msbt.set_text(msbt.LBL1.labels[seed + 10].data, [TextComponent('a Hylian shield')])
+        with open(directory / f'{seed}.msbt', 'wb') as f:
+            msbt.write_to(f)
+    return str(directory)
+
+def brute_force(directory, regex):
+    hits = []
+    for path in sorted(str(path) for path in pathlib.Path(directory).glob('*.msbt')):
+        texts = {}
+        for label, run in iter_text_runs(path):
+            texts.setdefault(label, []).append(run)
+        for label, runs in texts.items():
+            if regex.search(COMMAND_MARK.join(runs)):
+                hits.append((path, label))
+    return sorted(hits)
+
+@pytest.mark.parametrize('pattern, flags', [
+    (r'Master Sword|Hylian Shield', 0),
+    (r'hylian shield', re.IGNORECASE),
+    (r'(?i:HYLIAN) shield', 0),
+    (r'\bSword\b', 0),
+    (r'ab', 0),
+])
+def test_search(tmp_path, corpus, pattern, flags):
+    with SearchIndex(str(tmp_path / 'index.sqlite')) as index:
+        index.update(corpus)
+        hits = index.search(pattern, flags)
+        regex = re.compile(pattern, flags)
+        assert sorted((hit.path, hit.label) for hit in hits) == brute_force(corpus, regex)
+        assert [hit.path for hit in hits] == sorted(hit.path for hit in hits)
+        if hits:
+            assert len(index.search(pattern, flags, limit=1)) == 1
+
+def test_without_parser(monkeypatch):
+    monkeypatch.setattr(literals, '_parser', None)
+    assert literals.required_literals('Master Sword') == []
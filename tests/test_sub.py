@@ -0,0 +1,53 @@
+import re
+
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.literals import required_literals
+from pymsbt.msbt import MSBTFile
+
+@pytest.fixture
+def msbt(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(50), lazy=True)
+    labels = msbt.LBL1.labels
+    msbt.set_text(labels[0].data, [TextComponent('Found 5 Rupees')])
+    msbt.set_text(labels[1].data, [TextComponent('found 1 RUPEE')])
+    # written and read again, so the texts are only in the file data
+    return MSBTFile.from_bytes(msbt.to_bytes(), lazy=True)
+
+def texts(msbt, *indexes):
+    return [''.join(c.data for c in msbt.text_labels[msbt.LBL1.labels[i].data] if c.type == 'text') for i in indexes]
+
+def test_required_literals():
+    assert required_literals(r'Master (Sword|Shield)') == ['Master ', 'S'] # the common prefix of the alternatives is required too
+    assert set(required_literals(r'a+bc?d')) == {'a', 'b', 'd'}
+    assert required_literals(r'(?:Rupee)?s') == ['s']
+
+def test_required_literals_inline_flags():
+    assert required_literals(r'Found (?i:rupees?)') == ['Found ']
+    assert required_literals(r'(?i:rupee)') == []
+    assert required_literals(r'(?i)rupee') == ['rupee']
+    assert required_literals(r'rupee', re.IGNORECASE) == ['rupee']
+    assert required_literals(r'(?-i:Rupee)', re.IGNORECASE) == ['Rupee']
+
+def test_sub(msbt):
+    changed = msbt.sub(r'\bRupees?\b', 'Gems')
+    assert changed == [msbt.LBL1.labels[0].data]
+    assert texts(msbt, 0, 1) == ['Found 5 Gems', 'found 1 RUPEE']
+
+@pytest.mark.parametrize('pattern, flags', [(r'(?i:rupees?)', 0), (r'(?i)rupees?', 0), (r'rupees?', re.IGNORECASE), (r'f(?i:OUND \d RUPEE)', 0)])
+def test_sub_ignorecase(msbt, pattern, flags):
+    changed = msbt.sub(pattern, 'Gems', flags=flags)
+    if pattern.startswith('f'):
+        assert changed == [msbt.LBL1.labels[1].data]
+        assert texts(msbt, 1) == ['Gems']
+    else:
+        assert set(changed) == {msbt.LBL1.labels[0].data, msbt.LBL1.labels[1].data}
+        assert texts(msbt, 0, 1) == ['Found 5 Gems', 'found 1 Gems']
+
+def test_map_text_leaves_commands(msbt):
+    before = [component.data for component in msbt.TXT2.get_text(5) if component.type == 'command']
+    msbt.map_text(str.upper)
+    after = msbt.TXT2.get_text(5)
+    assert [component.data for component in after if component.type == 'command'] == before
+    assert all(component.data == component.data.upper() for component in after if component.type == 'text')
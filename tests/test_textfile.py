@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from pymsbt.build import MSBTBuild, export_sources, find_sources
+from pymsbt.classes import TextComponent
+from pymsbt.codec import BIG_ENDIAN, UTF8
+from pymsbt.msbt import MSBTFile
+from pymsbt.textfile import SOURCE_SUFFIX, TextSource, format_text, parse_text, read_text_file, write_text_file
+
+def source_texts(msbt):
+    return {label.data: format_text(msbt.TXT2.get_text(label.string_index)) for label in msbt.LBL1.labels}
+
+@pytest.mark.parametrize('settings', [{}, {'big_endian': True, 'encoding': UTF8}], ids=['little-utf-16', 'big-utf-8'])
+def test_source_round_trip(synthetic, settings):
+    msbt = MSBTFile.from_bytes(synthetic(**settings))
+    source = TextSource.parse(TextSource.from_msbt(msbt).format())
+    assert (source.byte_order, source.encoding) == (msbt.header.byte_order, msbt.header.encoding)
+
+    # without a base, a new file is built from the entries
+    built = MSBTFile.from_bytes(source.to_msbt().to_bytes())
+    assert (built.header.byte_order, built.header.encoding) == (msbt.header.byte_order, msbt.header.encoding)
+    assert source_texts(built) == source_texts(msbt)
+
+def test_source_round_trip_with_base(synthetic):
+    data = synthetic()
+    source = TextSource.parse(TextSource.from_msbt(MSBTFile.from_bytes(data)).format())
+    # texts that are the same as in the base are left untouched
+    assert source.to_msbt(MSBTFile.from_bytes(data, lazy=True)).to_bytes() == data
+
+def test_escapes():
+    text = [TextComponent('a {b} \\ c\r\n[not a label]')]
+    formatted = format_text(text)
+    source = TextSource.parse(f"[Label]\n{formatted}\n[Other]\n")
+    assert [(label, format_text(components)) for label, components in source.entries] == [('Label', formatted), ('Other', '')]
+    assert source.entries[0][1][0].data == text[0].data
+
+def test_commands():
+    components = parse_text('{0:3:ffff0000}Red{/0:3}')
+    assert [c.type for c in components] == ['command', 'text', 'command']
+    assert (components[0].data.tag, components[0].data.payload) == (0x0E, bytes.fromhex('ffff0000'))
+    assert (components[2].data.tag, components[2].data.payload) == (0x0F, b'')
+    assert format_text(components) == '{0:3:ffff0000}Red{/0:3}'
+
+@pytest.mark.parametrize('text, line', [
+    ('encoding = utf-7\n[Label]\ntext\n', 1),
+    ('[Label]\ntext\n[Label]\ntext\n', 3),
+    ('[Label]\nfirst line\nunescaped { brace\n', 3),
+    ('[Label]\n{0:3:fff}\n', 2),
+])
+def test_parse_errors(text, line):
+    with pytest.raises(ValueError, match=f'^<text>:{line}: '):
+        TextSource.parse(text)
+
+def test_text_file(synthetic, tmp_path):
+    msbt = MSBTFile.from_bytes(synthetic(big_endian=True))
+    path = tmp_path / ('Attachment' + SOURCE_SUFFIX)
+    write_text_file(msbt, path)
+    source = read_text_file(path)
+    assert source.byte_order == BIG_ENDIAN
+    assert source_texts(source.to_msbt()) == source_texts(msbt)
+
+@pytest.fixture
+def tree(synthetic, tmp_path):
+    """A directory of msbt files, their exported sources and the build output directory"""
+    files = tmp_path / 'base'
+    for seed, name in enumerate(['ActorMsg/Attachment.msbt', 'ActorMsg/Enemy.msbt', 'EventFlowMsg/Npc.msbt']):
+        path = files / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(synthetic(label_count=50, seed=seed))
+    assert export_sources(str(files), str(tmp_path / 'source')) == 3
+    return files, tmp_path / 'source', tmp_path / 'output'
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_build(tree, workers):
+    files, source, output = tree
+    build = MSBTBuild(str(source), str(output), workers=workers)
+    stats = build.update()
+    assert (stats.built, stats.failed) == (3, 0)
+    for _, relpath in find_sources(str(source)):
+        name = relpath[:-len(SOURCE_SUFFIX)] + '.msbt'
+        assert (output / name).read_bytes() == (files / name).read_bytes()
+
+    # nothing changed, nothing is built
+    stats = MSBTBuild(str(source), str(output), workers=workers).update()
+    assert (stats.built, stats.unchanged) == (0, 3)
+
+def test_build_edited_source(tree):
+    files, source, output = tree
+    MSBTBuild(str(source), str(output), workers=1).update()
+
+    path = source / 'ActorMsg' / ('Enemy' + SOURCE_SUFFIX)
+    text_source = read_text_file(str(path))
+    label = text_source.entries[0][0]
+    text_source.entries[0] = (label, [TextComponent('Edited text')])
+    path.write_text(text_source.format(), encoding='utf-8')
+    os.remove(source / 'EventFlowMsg' / ('Npc' + SOURCE_SUFFIX))
+
+    stats = MSBTBuild(str(source), str(output), workers=1).update()
+    assert (stats.built, stats.unchanged, stats.removed) == (1, 1, 1)
+    assert not (output / 'EventFlowMsg' / 'Npc.msbt').exists()
+
+    built = MSBTFile(str(output / 'ActorMsg' / 'Enemy.msbt'))
+    base = MSBTFile(str(files / 'ActorMsg' / 'Enemy.msbt'))
+    assert built.get_text(label)[0].data == 'Edited text'
+    # the base file is kept as is, the other labels keep their text
+    assert base.get_text(label)[0].data != 'Edited text'
+    expected = source_texts(base)
+    expected[label] = 'Edited text'
+    assert source_texts(built) == expected
+
+def test_build_error(tree):
+    _, source, output = tree
+    path = source / 'ActorMsg' / ('Enemy' + SOURCE_SUFFIX)
+    path.write_text(path.read_text(encoding='utf-8') + '[Broken]\n{0:3:fff}\n', encoding='utf-8')
+
+    build = MSBTBuild(str(source), str(output), workers=1)
+    stats = build.update()
+    assert (stats.built, stats.failed) == (2, 1)
+    failed = [result for result in build.results if not result.ok]
+    assert len(failed) == 1 and failed[0].error.startswith('ValueError')
+    # failed outputs are built again on the next update
+    assert MSBTBuild(str(source), str(output), workers=1).update().failed == 1
@@ -0,0 +1,57 @@
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile
+
+def strings(texts):
+    return [''.join(component.data for component in text if component.type == 'text') for text in texts]
+
+@pytest.fixture(params=[False, True], ids=['eager', 'lazy'])
+def msbt(synthetic, request):
+    return MSBTFile.from_bytes(synthetic(20, tag_density=0), lazy=request.param)
+
+def test_list_api(msbt):
+    texts = msbt.TXT2.texts
+    expected = list(texts)
+    assert texts == expected and texts[2:5] == expected[2:5]
+
+    new = [TextComponent('new')]
+    texts.append(new)
+    texts.insert(0, [TextComponent('first')])
+    texts.insert(-1, [TextComponent('before last')])
+    del texts[3]
+    texts[1:3] = [[TextComponent('a')], [TextComponent('b')], [TextComponent('c')]]
+    popped = texts.pop(5)
+    texts.extend([[TextComponent('x')]])
+    expected = [[TextComponent('first')], *expected]
+    expected.append(new)
+    expected.insert(-1, [TextComponent('before last')])
+    del expected[3]
+    expected[1:3] = [[TextComponent('a')], [TextComponent('b')], [TextComponent('c')]]
+    assert strings([popped]) == strings([expected.pop(5)])
+    expected.append([TextComponent('x')])
+
+    assert strings(texts) == strings(expected)
+    assert len(texts) == msbt.TXT2.offset_count == len(expected)
+    assert strings(MSBTFile.from_bytes(msbt.to_bytes()).TXT2.texts) == strings(expected)
+
+def test_extended_slice(msbt):
+    texts = msbt.TXT2.texts
+    with pytest.raises(ValueError):
+        texts[::2] = [[TextComponent('too few')]]
+    texts[::5] = [[TextComponent(str(i))] for i in range(4)]
+    assert strings(texts[::5]) == ['0', '1', '2', '3']
+
+def test_lazy_text_labels(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(20), lazy=True)
+    labels = [label.data for label in msbt.LBL1.labels]
+    msbt.text_labels[labels[0]] = [TextComponent('changed')]
+    msbt.text_labels['New_Label'] = [TextComponent('added')]
+    del msbt.text_labels[labels[1]]
+    with pytest.raises(KeyError):
+        del msbt.text_labels['Missing_Label']
+
+    written = MSBTFile.from_bytes(msbt.to_bytes(), lazy=True)
+    assert strings([written.text_labels[labels[0]], written.text_labels['New_Label']]) == ['changed', 'added']
+    assert labels[1] not in written.text_labels
+    assert len(written.text_labels) == 20
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from pymsbt.msbt import MSBTFile
+from pymsbt.translate import TextTransform, TranslationMemory, transform_texts
+
+class StubTranslator:
+    """An async callback that wraps every string in brackets, recording its calls"""
+    def __init__(self, delay=0.001):
+        self.delay = delay
+        self.batches = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, batch):
+        self.batches.append(list(batch))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return [f'<{string}>' for string in batch]
+
+    @property
+    def requested(self):
+        return [string for batch in self.batches for string in batch]
+
+def components(msbt):
+    """Returns the text runs of every text and the tag, group, type and payload of its commands"""
+    texts = []
+    for text in msbt.TXT2.texts:
+        texts.append([component.data if component.type == 'text' else component.data.get_state()[:4] for component in text])
+    return texts
+
+def expected(texts):
+    return [[f'<{run}>' if isinstance(run, str) and run.strip() else run for run in text] for text in texts]
+
+@pytest.fixture
+def files(synthetic):
+    # the same file twice, so every string is found in both
+    data = synthetic(100)
+    return data, [MSBTFile.from_bytes(data), MSBTFile.from_bytes(data)]
+
+def test_transform(files):
+    _, msbt_files = files
+    before = components(msbt_files[0])
+    translator = StubTranslator()
+    stats = transform_texts(msbt_files, translator, batch_size=16, concurrency=3)
+
+    # every distinct string is requested once, across both files
+    requested = translator.requested
+    assert len(requested) == len(set(requested)) == stats.unique == stats.requested
+    assert stats.runs == 2 * sum(isinstance(run, str) and bool(run.strip()) for text in before for run in text)
+    assert stats.batches == len(translator.batches) == -(-stats.unique // 16)
+    assert all(len(batch) <= 16 for batch in translator.batches)
+    assert translator.max_running == 3
+
+    # runs are replaced, and text commands are written back with the same tag, group, type and payload
+    for msbt in msbt_files:
+        written = MSBTFile.from_bytes(msbt.to_bytes())
+        assert components(written) == expected(before)
+    assert stats.changed_texts == 2 * sum(any(isinstance(run, str) and run.strip() for run in text) for text in before)
+
+def test_memory(files, tmp_path):
+    data, msbt_files = files
+    path = str(tmp_path / 'memory.sqlite')
+    with TranslationMemory(path, namespace='brackets') as memory:
+        translator = StubTranslator()
+        first = transform_texts(msbt_files, translator, memory=memory)
+        assert len(memory) == first.unique
+        source = translator.requested[0]
+        assert memory.get(source) == f'<{source}>'
+
+    # a second run gets every string from the memory
+    with TranslationMemory(path, namespace='brackets') as memory:
+        msbt = MSBTFile.from_bytes(data)
+        before = components(msbt)
+        translator = StubTranslator()
+        stats = transform_texts(msbt, translator, memory=memory)
+        assert (stats.cached, stats.requested, stats.batches) == (first.unique, 0, 0)
+        assert translator.batches == []
+        assert components(msbt) == expected(before)
+
+    # other namespaces don't see the strings
+    with TranslationMemory(path, namespace='other') as memory:
+        assert len(memory) == 0
+        assert memory.get(source) is None
+
+def test_memory_strings():
+    with TranslationMemory() as memory:
+        memory.put_many([('Sword', 'Schwert'), ('Shield', 'Schild')])
+        memory.put_many([('Sword', 'Klinge')])
+        assert memory.get('Sword') == 'Klinge'
+        assert memory.get('Bow') is None
+        assert memory.get_many(['Shield', 'Bow'] + [f'missing {i}' for i in range(1000)]) == {'Shield': 'Schild'}
+
+def test_wrong_number_of_strings(files):
+    _, msbt_files = files
+    async def drop_last(batch):
+        return batch[:-1]
+    with pytest.raises(ValueError, match='returned'):
+        transform_texts(msbt_files, drop_last)
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        TextTransform(StubTranslator(), batch_size=0)
+    with pytest.raises(ValueError):
+        TextTransform(StubTranslator(), concurrency=0)
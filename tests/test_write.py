@@ -0,0 +1,80 @@
+import io
+import os
+
+import pytest
+
+from pymsbt.classes import TextComponent
+from pymsbt.msbt import MSBTFile
+from pymsbt.msbt_write import MSBTWriter
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_unchanged_round_trip(synthetic, lazy):
+    data = synthetic()
+    msbt = MSBTFile.from_bytes(data, lazy=lazy)
+    assert msbt.to_bytes() == data
+    assert msbt.to_bytes(incremental=False) == data
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_in_place_edit_is_written(synthetic, lazy):
+    msbt = MSBTFile.from_bytes(synthetic(), lazy=lazy)
+    label = msbt.LBL1.labels[7].data
+    msbt.text_labels[label][:] = [TextComponent('edited in place')]
+    msbt.get_texts([msbt.LBL1.labels[8].data])[0].append(TextComponent(' appended'))
+
+    written = MSBTFile.from_bytes(msbt.to_bytes())
+    assert [component.data for component in written.text_labels[label]] == ['edited in place']
+    assert written.text_labels[msbt.LBL1.labels[8].data][-1].data.endswith(' appended')
+
+def test_in_place_component_edit_is_written(synthetic, tmp_path):
+    msbt = MSBTFile.from_bytes(synthetic(tag_density=0), lazy=True)
+    label = msbt.LBL1.labels[3].data
+    msbt.text_labels[label][0].data = 'ZZZEDITED'
+
+    path = str(tmp_path / 'edited.msbt')
+    MSBTWriter(msbt, path)
+    assert MSBTFile(path).text_labels[label][0].data == 'ZZZEDITED'
+
+def test_set_text_is_written(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(), lazy=True)
+    label = msbt.LBL1.labels[0].data
+    msbt.set_text(label, [TextComponent('changed')])
+
+    written = MSBTFile.from_bytes(msbt.to_bytes())
+    assert [component.data for component in written.text_labels[label]] == ['changed']
+    changed = msbt.get_text_index(label)
+    for index in range(msbt.TXT2.offset_count):
+        if index != changed:
+            assert written.TXT2.get_raw(index) == msbt.TXT2.get_raw(index)
+
+def test_lazy_write_copies_untouched_texts(synthetic):
+    msbt = MSBTFile.from_bytes(synthetic(), lazy=True)
+    msbt.set_text(msbt.LBL1.labels[0].data, [TextComponent('changed')])
+    msbt.get_text(msbt.LBL1.labels[1].data)
+    copied = [index for index in range(msbt.TXT2.offset_count) if msbt.TXT2.matches_raw(index)]
+    assert len(copied) == msbt.TXT2.offset_count - 2
+
+class NamedStream(io.BytesIO):
+    """A stream with a name that isn't a file path, like sys.stdin.buffer or a socket file"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+def test_from_file_path(synthetic, tmp_path):
+    path = tmp_path / 'Attachment.msbt'
+    path.write_bytes(synthetic())
+    with open(path, 'rb') as f:
+        msbt = MSBTFile.from_file(f)
+    assert msbt.filepath == str(path)
+    msbt.set_text(msbt.LBL1.labels[0].data, [TextComponent('changed')])
+    MSBTWriter(msbt)
+    assert MSBTFile(str(path)).get_text(msbt.LBL1.labels[0].data)[0].data == 'changed'
+
+@pytest.mark.parametrize('name', [None, '<stdin>', 3], ids=['unnamed', 'stdin', 'socket'])
+def test_from_stream_isnt_written_to_a_path(synthetic, tmp_path, monkeypatch, name):
+    monkeypatch.chdir(tmp_path)
+    data = synthetic()
+    msbt = MSBTFile.from_file(io.BytesIO(data) if name is None else NamedStream(data, name))
+    assert msbt.filepath is None
+    with pytest.raises(ValueError):
+        MSBTWriter(msbt)
+    assert os.listdir(tmp_path) == []